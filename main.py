@@ -1,25 +1,41 @@
 # app.py
+import os
 import streamlit as st
 import pandas as pd
 # Add this import at the top of app.py
 from scripts.visualization_utils import make_water_loss_viz
-from scripts.data_ingestion import connect_mongo, insert_subjects
+from scripts.data_ingestion import insert_subjects
+from scripts.mongo_client import get_db, health_check
 from scripts.mongo_ml_pipeline import (
-    connect_to_mongo,
     retrieve_subject_data,
     parse_record_to_features,
 )
-from scripts.model_inference import load_model_and_preproc, preprocess_and_predict
+from scripts.model_registry import get_model_and_preproc, get_model_version
+from scripts.batch_scoring import get_precomputed_prediction
+from scripts.prediction_cache import COLL_PREDICTION_CACHE, cached_preprocess_and_predict, get_prediction_cache
+from scripts.inference_client import InferenceClient
+from scripts.subject_browser import browse_subjects, ensure_browse_indexes, page_frame
+from scripts import metrics
+
+# DeepRNN serving mode: eager | scripted | quantized | onnx (see scripts/model_export.py)
+MODEL_MODE = os.environ.get("HYDRA_MODEL_MODE", "eager")
+# optional shared inference server (python -m scripts.inference_server); unset = score in this process
+INFERENCE_URL = os.environ.get("HYDRA_INFERENCE_URL")
+inference_client = InferenceClient(INFERENCE_URL) if INFERENCE_URL else None
 
 st.set_page_config(page_title="HYDRA ML Dashboard", page_icon="💧", layout="centered")
 st.title("💧 HYDRA - Hydration Loss Prediction System")
 
-# MongoDB connection
-client, db = connect_mongo()
+# MongoDB connection: one pooled client per process, shared by all sessions and reruns
+db = get_db()
 hydration_col = db["hydration_data"]
 
+health = health_check()
+if not health["ok"]:
+    st.error(f"❌ MongoDB is unreachable: {health['error']}")
+
 # Tabs
-tabs = st.tabs(["➕ Insert Subject", "📋 Retrieve Subject", "🤖 AI Prediction"])
+tabs = st.tabs(["➕ Insert Subject", "📋 Retrieve Subject", "🤖 AI Prediction", "🔎 Browse Subjects"])
 
 # --- TAB 1: INSERT SUBJECT ---
 with tabs[0]:
@@ -91,9 +107,25 @@ with tabs[2]:
             record = retrieve_subject_data(hydration_col, int(sub_id_pred))
             df_input = parse_record_to_features(record)
 
-            # Load model and preprocessor
-            model, preproc, feat_per_step, seq_len, device = load_model_and_preproc()
-            prediction = preprocess_and_predict(df_input, model, preproc, feat_per_step, seq_len, device)
+            # Use the batch job's result for the current model if there is one (python -m scripts.batch_scoring)
+            if inference_client is not None:
+                model_version = inference_client.health()["model_version"]
+            else:
+                model_version = get_model_version(mode=MODEL_MODE)
+            precomputed = get_precomputed_prediction(db, int(sub_id_pred), model_version)
+            if precomputed is not None:
+                prediction = precomputed["predicted_loss_kg"]
+            elif inference_client is not None:
+                # the server's warm model, batched together with other clients' requests
+                prediction = inference_client.predict(df_input.iloc[0].to_dict())
+            else:
+                # Model and preprocessor are loaded once per process (reloaded only if the artifacts change);
+                # identical feature vectors are answered from the prediction cache
+                model, preproc, feat_per_step, seq_len, device = get_model_and_preproc(mode=MODEL_MODE)
+                prediction = cached_preprocess_and_predict(
+                    df_input, model, preproc, feat_per_step, seq_len, device,
+                    model_version=model_version, collection=db[COLL_PREDICTION_CACHE],
+                )
 
             st.success(f"🎯 Predicted TARGET_True_Water_Loss_kg: **{prediction:.6f} kg**")
 
@@ -109,11 +141,11 @@ with tabs[2]:
                 age=age,
                 gender=gender,
                 image_path="assets/bodywater_by_age.jpg",   # ✅ path variable for your body image
-                save_path="assets/hydration_viz.png"      # ✅ output visualization path
+                save_path=None                             # ✅ rendered in memory, no shared output file
             )
 
             # Display visualization
-            st.image(viz_res["viz_path"], use_container_width=True)
+            st.image(viz_res["png_bytes"], use_container_width=True)
 
             # Display alert/safety message
             if viz_res["warning_>2pct"]:
@@ -133,8 +165,83 @@ with tabs[2]:
             # Optional: Show input features used for prediction
             with st.expander("🧩 Show Extracted Features"):
                 st.dataframe(df_input)
+                st.caption(f"Prediction cache: {get_prediction_cache().stats()}")
+
+            # Per-stage latency (HYDRA_METRICS=1, see scripts/metrics.py)
+            if metrics.is_enabled():
+                with st.expander("⏱️ Stage latency"):
+                    st.json(metrics.snapshot())
 
         except Exception as e:
             st.error(f"❌ Prediction failed: {e}")
 
-client.close()
+# --- TAB 4: BROWSE SUBJECTS ---
+def _browse_next(cursor):
+    st.session_state["browse_cursors"].append(cursor)
+
+def _browse_prev():
+    st.session_state["browse_cursors"].pop()
+
+def _browse_page(filters, page_size, cursor):
+    """One page of subjects, with the served model's batch predictions when there is a model."""
+    ensure_browse_indexes(db)
+    try:
+        if inference_client is not None:
+            version = inference_client.health()["model_version"]
+        else:
+            version = get_model_version(mode=MODEL_MODE)
+    except Exception:
+        version = None  # no model: browse without predictions
+    return browse_subjects(db, **filters, model_version=version, after=cursor, page_size=page_size)
+
+with tabs[3]:
+    st.subheader("🔎 Browse Subjects")
+
+    col1, col2, col3 = st.columns(3)
+    browse_gender = col1.selectbox("Gender", ["any", "male", "female", "trans"], key="browse_gender")
+    browse_risk = col2.selectbox("Predicted risk", ["any", "warning", "normal"], key="browse_risk")
+    browse_page_size = col3.selectbox("Rows per page", [20, 50, 100], index=1, key="browse_page_size")
+    browse_age = st.slider("Age", 0, 100, (0, 100), key="browse_age")
+    browse_weight = st.slider("Initial Weight (kg)", 0, 200, (0, 200), key="browse_weight")
+
+    # full slider range = no filter, so subjects without the field are not excluded
+    filters = dict(
+        gender=None if browse_gender == "any" else browse_gender,
+        age=None if browse_age == (0, 100) else browse_age,
+        weight=None if browse_weight == (0, 200) else browse_weight,
+        risk=None if browse_risk == "any" else browse_risk,
+    )
+    # keyset pagination: a stack of Subject_ID cursors, reset whenever the filters change
+    if st.session_state.get("browse_filters") != (filters, browse_page_size):
+        st.session_state["browse_filters"] = (filters, browse_page_size)
+        st.session_state["browse_cursors"] = [None]
+    cursors = st.session_state["browse_cursors"]
+
+    # Streamlit reruns every tab on each interaction: query only after "Browse" is pressed, and then only
+    # when the filters or the page change, so clicks in the other tabs reuse the stored page
+    if st.button("🔎 Browse", key="browse_run"):
+        st.session_state["browse_active"] = True
+        st.session_state["browse_page"] = None  # pressed again: refresh the current page
+    page_key = (filters, browse_page_size, cursors[-1])
+
+    if not st.session_state.get("browse_active"):
+        st.caption("Set the filters and press Browse.")
+    else:
+        try:
+            stored = st.session_state.get("browse_page")
+            if stored is None or stored[0] != page_key:
+                stored = (page_key, _browse_page(filters, browse_page_size, cursors[-1]))
+                st.session_state["browse_page"] = stored
+            page = stored[1]
+            if page["rows"]:
+                st.dataframe(page_frame(page), hide_index=True, use_container_width=True)
+            else:
+                st.info("No matching subjects.")
+
+            prev_col, page_col, next_col = st.columns([1, 2, 1])
+            prev_col.button("⬅️ Previous", disabled=len(cursors) == 1, on_click=_browse_prev, key="browse_prev")
+            page_col.caption(f"Page {len(cursors)}")
+            next_col.button("Next ➡️", disabled=page["next_after"] is None, on_click=_browse_next,
+                            args=(page["next_after"],), key="browse_next")
+        except Exception as e:
+            st.error(f"❌ Error: {e}")
@@ -0,0 +1,237 @@
+# scripts/artifact_bundle.py
+"""
+Single-file, memory-mapped DeepRNN artifact bundle.
+
+Loading the regular artifacts means torch.load on the checkpoint and
+pickle.load on the sklearn preprocessor: slow to start and an unsafe
+deserialization surface. A bundle holds the same model as plain aligned
+arrays and is opened with one read-only np.memmap; every weight and
+preprocessing constant is a zero-copy view into it, so worker processes
+share one physical copy through the page cache and start in milliseconds.
+
+Layout (little endian):
+    bytes 0-7     magic b"HYDRABDL"
+    bytes 8-11    format version (uint32)
+    bytes 12-19   header length (uint64)
+    header        JSON: model config, preprocessor metadata, array table
+                  {name: dtype, shape, offset}, content version
+    arrays        raw C-contiguous data, each starting on a 64-byte boundary
+
+Weights are stored the way the NumPy engine uses them (float32, W^T,
+combined RNN biases), preprocessing constants as float64, exactly as
+the compiled preprocessor holds them.
+
+Usage:
+    python -m scripts.artifact_bundle                 # convert model/deeprnn_artifacts -> deep_rnn.bundle
+    python -m scripts.artifact_bundle --check         # parity vs the torch model + load times
+    python -m scripts.artifact_bundle --info
+"""
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import struct
+import time
+from pathlib import Path
+from typing import Any, Dict, Tuple
+
+import numpy as np
+import pandas as pd
+
+from scripts.model_inference import MODEL_CHECKPOINT, PREPROC_PATH, FEATURES, serving_artifact_path, _to_sequences
+from scripts.fast_preprocessor import CompiledPreprocessor, compile_preprocessor
+from scripts.numpy_rnn import NumpyDeepRNN, DEFAULT_CSV, PARITY_ATOL
+
+# ==== FORMAT ====
+MAGIC = b"HYDRABDL"
+FORMAT_VERSION = 1
+ALIGN = 64
+_PREFIX = struct.Struct("<8sIQ")
+BUNDLE_PATH = serving_artifact_path("bundle")
+
+
+def _align(n: int) -> int:
+    return (n + ALIGN - 1) // ALIGN * ALIGN
+
+
+# ==== WRITE ====
+def write_bundle(arrays: Dict[str, np.ndarray], meta: Dict[str, Any], out_path) -> str:
+    """
+    Write arrays + JSON metadata as a bundle; returns its content version.
+    The file is written next to out_path and renamed into place, so
+    processes that still map the old bundle keep a consistent view.
+    """
+    out_path = Path(out_path)
+    arrays = {name: np.ascontiguousarray(a) for name, a in arrays.items()}
+
+    table, offset = {}, 0
+    for name, a in arrays.items():
+        if a.dtype.hasobject:
+            raise ValueError(f"array '{name}' has dtype object; bundles hold plain numeric arrays only")
+        table[name] = {"dtype": a.dtype.newbyteorder("<").str, "shape": list(a.shape), "offset": offset}
+        offset = _align(offset + a.nbytes)
+
+    h = hashlib.sha256(json.dumps({"meta": meta, "arrays": table}, sort_keys=True).encode())
+    for a in arrays.values():
+        h.update(a.astype(a.dtype.newbyteorder("<"), copy=False).tobytes())
+    version = h.hexdigest()[:16]
+
+    header = json.dumps({"format_version": FORMAT_VERSION, "version": version, "meta": meta, "arrays": table}).encode()
+    data_start = _align(_PREFIX.size + len(header))
+    tmp_path = out_path.with_name(out_path.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(_PREFIX.pack(MAGIC, FORMAT_VERSION, len(header)))
+        f.write(header)
+        for name, a in arrays.items():
+            f.seek(data_start + table[name]["offset"])
+            f.write(a.astype(a.dtype.newbyteorder("<"), copy=False).tobytes())
+        f.truncate(data_start + offset)
+    os.replace(tmp_path, out_path)
+    return version
+
+
+def bundle_from_artifacts(model_path=MODEL_CHECKPOINT, preproc_path=PREPROC_PATH, out_path=BUNDLE_PATH) -> str:
+    """
+    Convert the torch checkpoint + pickled preprocessor into a bundle.
+    This is the only step that still runs torch.load / pickle.load.
+    """
+    import torch
+
+    ckpt = torch.load(model_path, map_location="cpu")
+    cfg = dict(ckpt.get("model_config", {}))
+    cfg.setdefault("hidden_size", 128)
+    cfg.setdefault("num_layers", 3)
+    cfg["feat_per_step"] = int(ckpt.get("feat_per_step"))
+    cfg["seq_len"] = int(ckpt.get("seq_len", None) or 4)
+    state_dict = {k: v.detach().cpu().numpy() for k, v in ckpt["model_state_dict"].items()}
+    model = NumpyDeepRNN(state_dict, num_layers=int(cfg["num_layers"]))
+
+    with open(preproc_path, "rb") as f:
+        preproc = compile_preprocessor(pickle.load(f))
+
+    arrays = {}
+    for l, (w_ih_t, w_hh_t, bias) in enumerate(model.layers):
+        arrays[f"rnn.l{l}.w_ih_t"], arrays[f"rnn.l{l}.w_hh_t"], arrays[f"rnn.l{l}.bias"] = w_ih_t, w_hh_t, bias
+    arrays.update({"fc1.w_t": model.fc1_w, "fc1.b": model.fc1_b, "fc2.w_t": model.fc2_w, "fc2.b": model.fc2_b})
+    arrays["pre.num_fill"] = np.asarray(preproc.numeric["fill"], dtype=np.float64)
+    if preproc.numeric["mean"] is not None:
+        arrays["pre.num_mean"] = np.asarray(preproc.numeric["mean"], dtype=np.float64)
+    if preproc.numeric["scale"] is not None:
+        arrays["pre.num_scale"] = np.asarray(preproc.numeric["scale"], dtype=np.float64)
+
+    meta = {
+        "model_config": cfg,
+        "preprocessor": {
+            "block_order": preproc.block_order,
+            "numeric_columns": preproc.numeric_features,
+            # categories are a handful of strings: kept in the JSON header
+            "categorical": [{"column": c["column"], "fill": c["fill"], "handle_unknown": c["handle_unknown"],
+                             "categories": list(c["categories"])} for c in preproc.categorical],
+        },
+        "features": FEATURES,
+    }
+    return write_bundle(arrays, meta, out_path)
+
+
+# ==== READ ====
+def read_header(path) -> Tuple[Dict[str, Any], int]:
+    """(header, data_start) of a bundle file; validates magic and format version."""
+    with open(path, "rb") as f:
+        prefix = f.read(_PREFIX.size)
+        if len(prefix) < _PREFIX.size:
+            raise ValueError(f"{path} is not a HYDRA bundle (file too short)")
+        magic, fmt, header_len = _PREFIX.unpack(prefix)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a HYDRA bundle (bad magic {magic!r})")
+        if fmt != FORMAT_VERSION:
+            raise ValueError(f"{path} has bundle format {fmt}, this reader supports {FORMAT_VERSION}")
+        header = json.loads(f.read(header_len))
+    return header, _align(_PREFIX.size + header_len)
+
+
+def map_arrays(path) -> Tuple[Dict[str, Any], Dict[str, np.ndarray]]:
+    """(header, {name: read-only array view}) backed by one memory map of the file."""
+    header, data_start = read_header(path)
+    mm = np.memmap(path, dtype=np.uint8, mode="r")
+    arrays = {}
+    for name, spec in header["arrays"].items():
+        dtype = np.dtype(spec["dtype"])
+        count = int(np.prod(spec["shape"], dtype=np.int64))
+        start = data_start + spec["offset"]
+        if start + count * dtype.itemsize > len(mm):
+            raise ValueError(f"{path} is truncated (array '{name}' ends past the end of the file)")
+        arrays[name] = np.ndarray(spec["shape"], dtype=dtype, buffer=mm, offset=start)
+    return header, arrays
+
+
+def load_bundle(path=BUNDLE_PATH):
+    """
+    Torch- and pickle-free counterpart of load_model_and_preproc, same
+    return shape: (NumpyDeepRNN, CompiledPreprocessor, feat_per_step, seq_len, "cpu").
+    """
+    path = Path(path)
+    if not path.exists():
+        raise FileNotFoundError(f"Artifact bundle not found: {path} (run `python -m scripts.artifact_bundle`)")
+    header, arrays = map_arrays(path)
+    cfg = header["meta"]["model_config"]
+
+    layers = [(arrays[f"rnn.l{l}.w_ih_t"], arrays[f"rnn.l{l}.w_hh_t"], arrays[f"rnn.l{l}.bias"])
+              for l in range(int(cfg["num_layers"]))]
+    model = NumpyDeepRNN.from_arrays(layers, arrays["fc1.w_t"], arrays["fc1.b"], arrays["fc2.w_t"], arrays["fc2.b"])
+
+    pre = header["meta"]["preprocessor"]
+    numeric = {"columns": pre["numeric_columns"], "fill": arrays["pre.num_fill"],
+               "mean": arrays.get("pre.num_mean"), "scale": arrays.get("pre.num_scale")}
+    preproc = CompiledPreprocessor(numeric, pre["categorical"], pre["block_order"])
+    return model, preproc, int(cfg["feat_per_step"]), int(cfg["seq_len"]), "cpu"
+
+
+def bundle_version(path=BUNDLE_PATH) -> str:
+    """Content version stored in the bundle header (no data is read)."""
+    return read_header(path)[0]["version"]
+
+
+# ==== CHECK ====
+def check_bundle(path=BUNDLE_PATH, csv_path=DEFAULT_CSV) -> Dict[str, float]:
+    """Max abs difference vs the torch model on the CSV rows, and load times of both paths."""
+    from scripts.model_inference import load_model_and_preproc, _forward
+
+    start = time.perf_counter()
+    torch_model, sk_preproc, feat_per_step, seq_len, device = load_model_and_preproc()
+    torch_load_ms = (time.perf_counter() - start) * 1e3
+    start = time.perf_counter()
+    model, preproc, b_feat_per_step, b_seq_len, _ = load_bundle(path)
+    bundle_load_ms = (time.perf_counter() - start) * 1e3
+
+    df = pd.read_csv(csv_path)
+    expected = _forward(torch_model, _to_sequences(sk_preproc.transform(df[FEATURES]), feat_per_step, seq_len), device)
+    got = model.predict_sequences(_to_sequences(preproc.transform(df[FEATURES]), b_feat_per_step, b_seq_len))
+    return {"max_abs_diff": float(np.max(np.abs(expected - got))), "torch_load_ms": torch_load_ms,
+            "bundle_load_ms": bundle_load_ms}
+
+
+# ==== MAIN ====
+def main():
+    parser = argparse.ArgumentParser(description="Build or inspect the memory-mapped DeepRNN artifact bundle.")
+    parser.add_argument("--out", default=str(BUNDLE_PATH))
+    parser.add_argument("--check", action="store_true", help="compare with the torch model instead of converting")
+    parser.add_argument("--info", action="store_true", help="print the bundle header")
+    parser.add_argument("--csv", default=str(DEFAULT_CSV))
+    args = parser.parse_args()
+
+    if args.info:
+        header, data_start = read_header(args.out)
+        print(json.dumps(dict(header, data_start=data_start), indent=2))
+    elif args.check:
+        result = check_bundle(args.out, args.csv)
+        status = "✅" if result["max_abs_diff"] <= PARITY_ATOL else "❌"
+        print(f"{status} Max abs diff torch vs bundle: {result['max_abs_diff']:.3e} (tolerance {PARITY_ATOL:.0e})")
+        print(f"⏱️ Load: torch + pickle {result['torch_load_ms']:.1f} ms, bundle {result['bundle_load_ms']:.2f} ms")
+    else:
+        version = bundle_from_artifacts(out_path=args.out)
+        print(f"📁 Wrote {args.out} (version={version}, {Path(args.out).stat().st_size / 1024:.1f} KiB)")
+
+
+if __name__ == "__main__":
+    main()
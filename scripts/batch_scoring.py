@@ -0,0 +1,200 @@
+# scripts/batch_scoring.py
+"""
+Score the whole hydration_data collection and write the results back.
+
+The Subject_ID range is split into shards that run in a process pool.
+Each worker opens its own MongoDB client, streams its shard through the
+server-side feature pipeline (mongo_ml_pipeline.iter_feature_batches),
+scores every batch with one forward pass and bulk-upserts the results
+into the `predictions` collection, keyed on (Subject_ID, model_version).
+
+The dashboard reads these precomputed results (get_precomputed_prediction)
+and only runs inference on click for subjects that are not scored yet.
+
+Usage:
+    python -m scripts.batch_scoring                    # all cores
+    python -m scripts.batch_scoring --workers 4 --mode onnx
+"""
+import argparse
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pymongo
+from pymongo import UpdateOne
+
+from scripts.metrics import inc, stage
+from scripts.mongo_client import get_client
+from scripts.model_inference import FEATURES, _forward, _to_sequences, predict_batch
+from scripts.mongo_ml_pipeline import (
+    DB_NAME,
+    NUMERIC_FEATURES,
+    FETCH_BATCH_SIZE,
+    iter_feature_batches,
+)
+from scripts.visualization_utils import WARNING_PCT_THRESHOLD
+
+# ==== CONFIGURATION ====
+COLL_HYDRATION = "hydration_data"
+COLL_PREDICTIONS = "predictions"
+# shards per worker: smaller shards keep the pool busy when ID ranges are uneven
+SHARDS_PER_WORKER = 4
+
+
+# ==== PREDICTIONS COLLECTION ====
+def ensure_prediction_indexes(db):
+    """One prediction per subject and model version."""
+    db[COLL_PREDICTIONS].create_index(
+        [("Subject_ID", pymongo.ASCENDING), ("model_version", pymongo.ASCENDING)],
+        unique=True, name="subject_model_unique",
+    )
+
+
+def get_precomputed_prediction(db, subject_id: int, model_version: str) -> Optional[Dict[str, Any]]:
+    """Stored batch result for this subject and model version (None if not scored yet)."""
+    return db[COLL_PREDICTIONS].find_one({"Subject_ID": subject_id, "model_version": model_version}, {"_id": 0})
+
+
+def prediction_documents(subject_ids, initial_weight, predicted, model_version: str, mode: str) -> List[Dict[str, Any]]:
+    """Result documents for one scored batch (percent_loss/warning as in make_water_loss_viz)."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        percent_loss = predicted / initial_weight * 100
+    scored_at = datetime.now(timezone.utc)
+    docs = []
+    for sid, w, pred, pct in zip(subject_ids, initial_weight, predicted, percent_loss):
+        pct = float(pct) if np.isfinite(pct) else None
+        docs.append({
+            "Subject_ID": sid,
+            "model_version": model_version,
+            "model_mode": mode,
+            "predicted_loss_kg": float(pred),
+            "initial_weight_kg": float(w) if np.isfinite(w) else None,
+            "percent_loss": pct,
+            "warning_>2pct": bool(pct is not None and pct > WARNING_PCT_THRESHOLD),
+            "scored_at": scored_at,
+        })
+    return docs
+
+
+def write_predictions(db, docs: List[Dict[str, Any]]):
+    """Bulk upsert keyed on (Subject_ID, model_version); re-running a job overwrites in place."""
+    if not docs:
+        return None
+    ops = [UpdateOne({"Subject_ID": d["Subject_ID"], "model_version": d["model_version"]}, {"$set": d}, upsert=True)
+           for d in docs]
+    return db[COLL_PREDICTIONS].bulk_write(ops, ordered=False)
+
+
+# ==== SCORING ====
+def _score_batch(gender, X, model, preproc, feat_per_step, seq_len, device) -> np.ndarray:
+    if hasattr(preproc, "transform_arrays") and list(preproc.numeric_features) == NUMERIC_FEATURES:
+        # compiled preprocessor: straight from the columnar arrays, no DataFrame
+        with stage("transform"):
+            Xpr = preproc.transform_arrays(X, gender)
+        with stage("tensor"):
+            Xseq = _to_sequences(Xpr, feat_per_step, seq_len)
+        predicted = _forward(model, Xseq, device)
+        inc("predictions", len(X))  # counted after the forward, like predict_batch
+        return predicted.astype(np.float64)
+    df = pd.DataFrame(X, columns=NUMERIC_FEATURES)
+    df.insert(0, "Gender", gender)
+    return predict_batch(df[FEATURES], model, preproc, feat_per_step, seq_len, device, batch_size=len(df))
+
+
+def _init_worker():
+    try:
+        import torch
+        # one intra-op thread per worker; the pool provides the parallelism
+        torch.set_num_threads(1)
+    except ImportError:
+        pass
+
+
+def score_range(mongo_uri: Optional[str], id_range: Tuple[int, int], mode: str = "eager",
+                batch_size: int = FETCH_BATCH_SIZE) -> Dict[str, Any]:
+    """
+    Worker entry point: score Subject_ID in [lo, hi) and write the results.
+    Uses the worker process's shared client (reused across its shards) and
+    loads the model through the per-process registry.
+    """
+    from scripts.model_registry import get_model_and_preproc, get_model_version
+
+    model, preproc, feat_per_step, seq_len, device = get_model_and_preproc(mode=mode)
+    model_version = get_model_version(mode=mode)
+
+    lo, hi = id_range
+    db = get_client(mongo_uri)[DB_NAME]
+    rows = 0
+    for subject_ids, gender, X in iter_feature_batches(db[COLL_HYDRATION],
+                                                       {"Subject_ID": {"$gte": lo, "$lt": hi}}, batch_size):
+        predicted = _score_batch(gender, X, model, preproc, feat_per_step, seq_len, device)
+        initial_weight = X[:, NUMERIC_FEATURES.index("Initial_Weight_kg")]
+        write_predictions(db, prediction_documents(subject_ids, initial_weight, predicted, model_version, mode))
+        rows += len(predicted)
+    return {"range": id_range, "rows": rows, "model_version": model_version}
+
+
+def subject_id_ranges(hydration_col, n_shards: int) -> List[Tuple[int, int]]:
+    """Split [min, max] Subject_ID into n_shards contiguous half-open ranges."""
+    first = hydration_col.find_one({}, {"Subject_ID": 1}, sort=[("Subject_ID", pymongo.ASCENDING)])
+    last = hydration_col.find_one({}, {"Subject_ID": 1}, sort=[("Subject_ID", pymongo.DESCENDING)])
+    if first is None:
+        return []
+    lo, hi = int(first["Subject_ID"]), int(last["Subject_ID"]) + 1
+    n_shards = max(1, min(n_shards, hi - lo))
+    bounds = np.linspace(lo, hi, n_shards + 1).round().astype(int)
+    return [(int(a), int(b)) for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+
+
+def score_collection(mongo_uri: Optional[str] = None, workers: Optional[int] = None, mode: str = "eager",
+                     batch_size: int = FETCH_BATCH_SIZE) -> Dict[str, Any]:
+    """Score every subject with a pool of `workers` processes; returns run stats."""
+    workers = workers or os.cpu_count() or 1
+    db = get_client(mongo_uri)[DB_NAME]
+    ensure_prediction_indexes(db)
+    ranges = subject_id_ranges(db[COLL_HYDRATION], workers * SHARDS_PER_WORKER)
+
+    start = time.perf_counter()
+    if workers == 1:
+        results = [score_range(mongo_uri, r, mode, batch_size) for r in ranges]
+    else:
+        # spawn: workers create their own MongoClient and torch thread pools
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_init_worker) as pool:
+            futures = [pool.submit(score_range, mongo_uri, r, mode, batch_size) for r in ranges]
+            results = [fut.result() for fut in as_completed(futures)]
+    rows = sum(res["rows"] for res in results)
+    versions = {res["model_version"] for res in results}
+    elapsed = time.perf_counter() - start
+    return {
+        "rows": rows,
+        "shards": len(ranges),
+        "workers": workers,
+        "seconds": elapsed,
+        "rows_per_sec": rows / elapsed if elapsed > 0 else 0.0,
+        "model_version": ", ".join(sorted(versions)),
+    }
+
+
+# ==== MAIN ====
+def main():
+    parser = argparse.ArgumentParser(description="Score every subject and write results to the predictions collection.")
+    parser.add_argument("--workers", type=int, default=None, help="process pool size (default: all cores)")
+    parser.add_argument("--batch-size", type=int, default=FETCH_BATCH_SIZE)
+    parser.add_argument("--mode", default=os.environ.get("HYDRA_MODEL_MODE", "eager"),
+                        help="serving mode: eager | scripted | quantized | onnx")
+    parser.add_argument("--mongo-uri", default=None, help="default: HYDRA_MONGO_URI")
+    args = parser.parse_args()
+
+    stats = score_collection(args.mongo_uri, args.workers, args.mode, args.batch_size)
+    print(f"✅ Scored {stats['rows']} subjects in {stats['shards']} shards on {stats['workers']} workers "
+          f"({stats['seconds']:.1f}s, {stats['rows_per_sec']:,.0f} rows/s), model_version={stats['model_version']}")
+
+
+if __name__ == "__main__":
+    main()
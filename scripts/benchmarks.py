@@ -0,0 +1,343 @@
+# scripts/benchmarks.py
+"""
+End-to-end benchmark suite for the HYDRA hot paths.
+
+    ingest      data_ingestion_batch.ingest_csv (CSV -> hydration_data bulk upserts)
+    find_one    single-subject lookup by Subject_ID
+    parse       parse_record_to_features (per record) and parse_records_to_matrix (all records)
+    fetch       fetch_features_frame (server-side flattening; real mongod only)
+    transform   sklearn preprocessor vs compiled NumPy preprocessor
+    forward     preprocess_and_predict on one row and predict_batch on the whole dataset
+    viz         make_water_loss_viz rendering (size independent, measured once)
+
+Every size N gets a dataset of N subjects (the 200-row CSV itself, or
+seeded synthetic subjects fitted to it beyond that) loaded into a
+throwaway database, so results are comparable between runs and releases.
+
+Mongo backends:
+    mongomock   in-process stand-in (pip install mongomock), no server needed
+    mongod      a throwaway mongod (temp dbpath, free port) started and removed by the run
+    uri         an existing server (--uri); uses the HYDRA_bench database and drops it afterwards
+
+Usage:
+    python -m scripts.benchmarks --backend mongomock --sizes 200,2000
+    python -m scripts.benchmarks --backend mongod --sizes 200,100000,1000000 --out bench.json
+    python -m scripts.benchmarks --backend mongomock --compare bench_previous.json --tolerance 0.25
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from scripts.data_ingestion import ensure_indexes
+from scripts.data_ingestion_batch import CSV_PATH, COLL_HYDRATION, ingest_csv
+from scripts.model_inference import FEATURES, preprocess_and_predict, predict_batch
+from scripts.model_registry import get_model_and_preproc
+from scripts.mongo_ml_pipeline import fetch_features_frame, parse_record_to_features, parse_records_to_matrix
+from scripts.synthetic_subjects import fit_subject_model, iter_subject_chunks, write_csv_chunk
+from scripts.visualization_utils import make_water_loss_viz
+
+# ==== CONFIGURATION ====
+BENCH_DB = "HYDRA_bench"
+SIZES = [200, 2000]
+BENCHMARKS = ["ingest", "find_one", "parse", "fetch", "transform", "forward", "viz"]
+# single-record benchmarks sample this many subjects at every size
+SAMPLE_OPS = 500
+# whole-dataset in-memory benchmarks (parse_records_to_matrix) are capped at this many records
+MAX_RECORDS_IN_MEMORY = 200_000
+VIZ_RENDERS = 30
+VIZ_IMAGE_PATH = "assets/bodywater_by_age.jpg"   # the reference figure the dashboard renders
+MONGOD_STARTUP_S = 30.0
+# mongomock scans and upserts in O(n) per operation: beyond this many subjects use a real mongod
+MONGOMOCK_MAX_ROWS = 20_000
+RESULTS_PATH = "benchmark_results.json"
+
+
+# ==== DATASET ====
+def build_dataset_csv(n_rows: int, out_path: Path, source_csv=CSV_PATH, seed: int = 0) -> Path:
+    """
+    Write an n_rows dataset: the first rows of the source CSV when it is big
+    enough, otherwise synthetic subjects fitted to it (scripts/synthetic_subjects.py).
+    """
+    base = pd.read_csv(source_csv)
+    if n_rows <= len(base):
+        base.iloc[:n_rows].to_csv(out_path, index=False)
+        return out_path
+    model = fit_subject_model(source_csv)
+    with open(out_path, "w", newline="") as f:
+        for i, chunk in enumerate(iter_subject_chunks(model, n_rows, seed)):
+            write_csv_chunk(chunk, f, header=i == 0)
+    return out_path
+
+
+# ==== MONGO BACKENDS ====
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@contextlib.contextmanager
+def mongo_backend(backend: str, uri: Optional[str] = None):
+    """Yields (database, server_side_aggregation_supported); everything is cleaned up on exit."""
+    if backend == "mongomock":
+        try:
+            import mongomock
+        except ImportError as e:
+            raise SystemExit("❌ mongomock is not installed (pip install mongomock); "
+                             "use --backend mongod or --backend uri instead") from e
+        # mongomock lacks some aggregation operators the server-side pipeline needs
+        yield mongomock.MongoClient()[BENCH_DB], False
+        return
+
+    from pymongo import MongoClient
+
+    proc = dbpath = None
+    if backend == "mongod":
+        mongod = shutil.which("mongod")
+        if mongod is None:
+            raise SystemExit("❌ mongod not found on PATH; use --backend mongomock or --backend uri")
+        dbpath = tempfile.mkdtemp(prefix="hydra_bench_mongod_")
+        port = _free_port()
+        proc = subprocess.Popen([mongod, "--dbpath", dbpath, "--port", str(port), "--bind_ip", "127.0.0.1", "--quiet"],
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        uri = f"mongodb://127.0.0.1:{port}/"
+    elif backend != "uri" or not uri:
+        raise SystemExit(f"❌ unknown backend {backend!r} (uri backend needs --uri)")
+
+    client = MongoClient(uri, serverSelectionTimeoutMS=int(MONGOD_STARTUP_S * 1000))
+    try:
+        client.admin.command("ping")
+        client.drop_database(BENCH_DB)
+        yield client[BENCH_DB], True
+    finally:
+        with contextlib.suppress(Exception):
+            client.drop_database(BENCH_DB)
+        client.close()
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=30)
+            shutil.rmtree(dbpath, ignore_errors=True)
+
+
+# ==== TIMING ====
+def measure(fn: Callable[[], Any], repeat: int) -> List[float]:
+    """Wall time (s) of `repeat` calls of fn."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def summarize(name: str, size: int, times: List[float], rows_per_call: int = 1, **extra) -> Dict[str, Any]:
+    arr = np.asarray(times)
+    median = float(np.median(arr))
+    result = {
+        "name": name,
+        "size": size,
+        "calls": len(times),
+        "rows_per_call": rows_per_call,
+        "min_s": float(arr.min()),
+        "median_s": median,
+        "mean_s": float(arr.mean()),
+        "p95_s": float(np.percentile(arr, 95)),
+        "rows_per_s": rows_per_call / median if median > 0 else None,
+    }
+    result.update(extra)
+    return result
+
+
+def _print_result(r: Dict[str, Any]):
+    print(f"  {r['name']:<28} n={r['size']:<9} median {r['median_s'] * 1e3:10.3f} ms  "
+          f"p95 {r['p95_s'] * 1e3:10.3f} ms  {r['rows_per_s'] or 0:>14,.0f} rows/s")
+
+
+# ==== BENCHMARKS ====
+def run_size(db, server_side: bool, size: int, workdir: Path, selected: List[str], rng,
+             seed: int = 0) -> List[Dict[str, Any]]:
+    results = []
+
+    def record(r):
+        results.append(r)
+        _print_result(r)
+
+    csv_path = build_dataset_csv(size, workdir / f"subjects_{size}.csv", seed=seed)
+    frame = pd.read_csv(csv_path)[FEATURES]
+    col = db[COLL_HYDRATION]
+    col.drop()  # faster than delete_many at millions of rows; indexes are recreated below
+    ensure_indexes(db, force=True)
+
+    # loading is needed by every Mongo benchmark, so it always runs (and is only reported if selected)
+    start = time.perf_counter()
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        stats = ingest_csv(db, csv_path, checkpoint_path=workdir / "ingest.checkpoint.json", clear_existing=True)
+    if "ingest" in selected:
+        record(summarize("ingest_csv", size, [time.perf_counter() - start], stats["rows"]))
+
+    ids = rng.integers(1, size + 1, min(SAMPLE_OPS, size)).tolist()
+    records = [col.find_one({"Subject_ID": sid}, {"_id": 0}) for sid in ids]
+    if "find_one" in selected:
+        it = iter(ids)
+        record(summarize("find_one", size, measure(lambda: col.find_one({"Subject_ID": next(it)}, {"_id": 0}), len(ids))))
+
+    if "parse" in selected:
+        it = iter(records)
+        record(summarize("parse_record_to_features", size, measure(lambda: parse_record_to_features(next(it)), len(records))))
+        all_records = list(col.find({}, {"_id": 0}).limit(MAX_RECORDS_IN_MEMORY))
+        record(summarize("parse_records_to_matrix", size, measure(lambda: parse_records_to_matrix(all_records), 3),
+                         len(all_records)))
+        del all_records
+
+    if "fetch" in selected and server_side:
+        record(summarize("fetch_features_frame", size, measure(lambda: fetch_features_frame(col), 3), size))
+
+    sklearn_art = get_model_and_preproc(fast_preproc=False)
+    fast_art = get_model_and_preproc(fast_preproc=True)
+    if "transform" in selected:
+        one = frame.iloc[:1]
+        for label, preproc in (("sklearn", sklearn_art[1]), ("compiled", fast_art[1])):
+            record(summarize(f"transform_{label}_1row", size, measure(lambda: preproc.transform(one), SAMPLE_OPS)))
+            record(summarize(f"transform_{label}", size, measure(lambda: preproc.transform(frame), 3), size))
+
+    if "forward" in selected:
+        rows = [frame.iloc[i:i + 1] for i in rng.integers(0, size, min(SAMPLE_OPS, size))]
+        it = iter(rows)
+        record(summarize("forward_single", size, measure(lambda: preprocess_and_predict(next(it), *fast_art), len(rows))))
+        record(summarize("forward_batched", size, measure(lambda: predict_batch(frame, *fast_art), 3), size))
+    return results
+
+
+def run_viz(image_path: str = VIZ_IMAGE_PATH) -> List[Dict[str, Any]]:
+    # a missing image renders the "Image not found" placeholder, which is not the figure the dashboard times
+    if not os.path.exists(image_path):
+        raise FileNotFoundError(f"viz benchmark image not found: {image_path}")
+    make_water_loss_viz(70.0, 1.0, 30, "male", image_path=image_path, save_path=None)  # template build is a one-off
+    r = summarize("make_water_loss_viz", 1,
+                  measure(lambda: make_water_loss_viz(70.0, 1.2, 30, "male", image_path=image_path, save_path=None),
+                          VIZ_RENDERS))
+    _print_result(r)
+    return [r]
+
+
+# ==== REPORTING ====
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment() -> Dict[str, Any]:
+    import pymongo
+    import sklearn
+    env = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "git_commit": _git_commit(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "sklearn": sklearn.__version__,
+        "pymongo": pymongo.version,
+    }
+    try:
+        import torch
+        env["torch"] = torch.__version__
+        env["torch_threads"] = torch.get_num_threads()
+    except ImportError:
+        env["torch"] = None
+    return env
+
+
+def compare(results: List[Dict[str, Any]], baseline_path: str, tolerance: float) -> List[str]:
+    """
+    Names of benchmarks whose median got slower than baseline by more than
+    tolerance (0.2 = 20%). Results are only compared with baseline results
+    of the same backend: mongomock and mongod timings are not comparable.
+    """
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = {(r["name"], r["size"], r.get("backend")): r for r in json.load(f)["results"]}
+    regressions = []
+    compared = 0
+    print(f"\n📊 Compared with {baseline_path} (tolerance {tolerance:.0%}):")
+    for r in results:
+        old = baseline.get((r["name"], r["size"], r["backend"]))
+        if old is None or not old["median_s"]:
+            continue
+        compared += 1
+        ratio = r["median_s"] / old["median_s"]
+        flag = "❌" if ratio > 1 + tolerance else "✅"
+        print(f"  {flag} {r['name']:<28} n={r['size']:<9} {ratio:6.2f}x baseline median")
+        if ratio > 1 + tolerance:
+            regressions.append(f"{r['name']}@{r['size']}")
+    if not compared:
+        backends = sorted({str(key[2]) for key in baseline})
+        print(f"  ⚠️ Nothing to compare: the baseline was run on {', '.join(backends)}")
+    return regressions
+
+
+# ==== MAIN ====
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the ingestion, retrieval, parsing, inference and viz paths.")
+    parser.add_argument("--backend", choices=["mongomock", "mongod", "uri"], default="mongomock")
+    parser.add_argument("--uri", default=None, help="server for --backend uri")
+    parser.add_argument("--sizes", default=",".join(map(str, SIZES)), help="comma-separated subject counts")
+    parser.add_argument("--only", default=",".join(BENCHMARKS), help=f"subset of {','.join(BENCHMARKS)}")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=RESULTS_PATH, help="JSON results file")
+    parser.add_argument("--compare", default=None, help="baseline results file to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed median slowdown vs baseline")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    selected = [b.strip() for b in args.only.split(",") if b.strip()]
+    unknown = set(selected) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmarks: {sorted(unknown)}")
+    rng = np.random.default_rng(args.seed)
+    if args.backend == "mongomock" and max(sizes) > MONGOMOCK_MAX_ROWS:
+        print(f"⚠️ mongomock is quadratic in collection size; sizes above {MONGOMOCK_MAX_ROWS:,} "
+              "will take very long (use --backend mongod).")
+
+    results: List[Dict[str, Any]] = []
+    with tempfile.TemporaryDirectory(prefix="hydra_bench_") as tmp, mongo_backend(args.backend, args.uri) as (db, server_side):
+        if "fetch" in selected and not server_side:
+            print("ℹ️ Skipping 'fetch': the server-side pipeline needs a real mongod.")
+        for size in sizes:
+            print(f"\n⏱️ {size:,} subjects ({args.backend})")
+            results += run_size(db, server_side, size, Path(tmp), selected, rng, args.seed)
+        if "viz" in selected:
+            print("\n⏱️ Visualization")
+            results += run_viz()
+
+    for r in results:
+        r["backend"] = args.backend
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump({"environment": environment(), "results": results}, f, indent=2)
+    print(f"\n✅ {len(results)} results written to {args.out}")
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.tolerance)
+        if regressions:
+            print(f"❌ Regressions: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
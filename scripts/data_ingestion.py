@@ -8,19 +8,28 @@ Author: Yasir Ahmad
 """
 
 import pymongo
-from pymongo import MongoClient
+from pymongo import ReplaceOne
+from pymongo.errors import OperationFailure
+
+from scripts.mongo_client import get_client, close_client
 
 # ==== CONFIGURATION ====
-MONGO_URI = "mongodb://localhost:27017/"
 DB_NAME = "HYDRA"
 COLL_HYDRATION = "hydration_data"
 COLL_METADATA = "metadata"
 
+# (client id, db name) pairs whose indexes were already ensured in this process
+_INDEXED = set()
+
 
 # ==== CONNECT FUNCTION ====
-def connect_mongo(uri=MONGO_URI, db_name=DB_NAME):
-    """Establish MongoDB connection."""
-    client = MongoClient(uri)
+def connect_mongo(uri=None, db_name=DB_NAME):
+    """
+    MongoDB connection on the shared process-wide client (scripts/mongo_client.py).
+    uri defaults to HYDRA_MONGO_URI. Do not close the returned
+    client; use close_client() when a CLI run is done.
+    """
+    client = get_client(uri)
     db = client[db_name]
     print(f"✅ Connected to MongoDB database '{db_name}'\n")
     return client, db
@@ -107,16 +116,73 @@ def collect_subject_data():
     return subjects
 
 
+# ==== INDEXES ====
+def ensure_indexes(db, force=False):
+    """
+    Unique index on Subject_ID (idempotent upserts, O(log n) lookups) plus
+    secondary indexes for the common Gender / Age filters.
+    Runs once per database per process unless force=True.
+    """
+    # MongoClient.address blocks on server selection (and raises with several mongos): key on the client object
+    key = (id(db.client), db.name)
+    if key in _INDEXED and not force:
+        return
+    hydration_col = db[COLL_HYDRATION]
+    try:
+        hydration_col.create_index([("Subject_ID", pymongo.ASCENDING)], unique=True, name="subject_id_unique")
+    except OperationFailure as e:
+        if e.code != 11000:
+            raise
+        raise RuntimeError(
+            f"'{COLL_HYDRATION}' already holds duplicate Subject_IDs; "
+            "run remove_duplicate_subjects(db) before creating the unique index"
+        ) from e
+    hydration_col.create_index([("Gender", pymongo.ASCENDING), ("Age", pymongo.ASCENDING)], name="gender_age")
+    hydration_col.create_index([("Age", pymongo.ASCENDING)], name="age")
+    _INDEXED.add(key)
+
+
+def remove_duplicate_subjects(db):
+    """Keep only the most recently inserted document per Subject_ID. Returns the number removed."""
+    hydration_col = db[COLL_HYDRATION]
+    pipeline = [
+        {"$sort": {"_id": 1}},
+        {"$group": {"_id": "$Subject_ID", "ids": {"$push": "$_id"}, "n": {"$sum": 1}}},
+        {"$match": {"n": {"$gt": 1}}},
+    ]
+    stale = []
+    for group in hydration_col.aggregate(pipeline, allowDiskUse=True):
+        stale.extend(group["ids"][:-1])
+    if stale:
+        hydration_col.delete_many({"_id": {"$in": stale}})
+    print(f"🧹 Removed {len(stale)} duplicate subject document(s).")
+    return len(stale)
+
+
+# ==== UPSERT FUNCTION ====
+def upsert_subjects(db, subjects, ordered=False):
+    """
+    Write subject documents as bulk upserts keyed on Subject_ID, so
+    re-ingesting the same subjects replaces them instead of duplicating.
+    Returns the pymongo BulkWriteResult (None when there is nothing to write).
+    """
+    if not subjects:
+        return None
+    ensure_indexes(db)
+    requests = [ReplaceOne({"Subject_ID": s["Subject_ID"]}, s, upsert=True) for s in subjects]
+    return db[COLL_HYDRATION].bulk_write(requests, ordered=ordered)
+
+
 # ==== INSERT FUNCTION ====
 def insert_subjects(db, subjects):
-    """Insert subject records into MongoDB."""
+    """Insert (upsert) subject records into MongoDB."""
     if not subjects:
         print("\n⚠️ No subject data entered. Nothing inserted.")
         return 0
 
-    hydration_col = db[COLL_HYDRATION]
-    hydration_col.insert_many(subjects)
-    print(f"\n✅ Successfully inserted {len(subjects)} subject record(s) into '{COLL_HYDRATION}'.")
+    result = upsert_subjects(db, subjects)
+    print(f"\n✅ Successfully wrote {len(subjects)} subject record(s) into '{COLL_HYDRATION}' "
+          f"({result.upserted_count} new, {result.matched_count} updated).")
     return len(subjects)
 
 
@@ -139,12 +205,13 @@ def main():
     """Main entrypoint for data ingestion."""
     client, db = connect_mongo()
     try:
+        ensure_indexes(db)
         metadata = collect_metadata(db)
         subjects = collect_subject_data()
         insert_subjects(db, subjects)
         verify_collections(db)
     finally:
-        client.close()
+        close_client()
         print("🔒 MongoDB connection closed.")
 
 
@@ -1,89 +1,220 @@
+"""
+data_ingestion_batch.py
+-----------------------
+Streaming bulk loader for the hydration CSV.
+
+The CSV is read in fixed-size chunks (bounded memory regardless of file
+size) and every chunk is written with one unordered bulk upsert keyed on
+Subject_ID, so re-running a load (or re-playing a chunk after a crash)
+never duplicates subjects. After each chunk a small JSON checkpoint
+records how many rows are committed, so an interrupted load resumes
+where it stopped instead of restarting.
+
+Usage:
+    python -m scripts.data_ingestion_batch --csv data/formatted_hydration_data.csv
+    python -m scripts.data_ingestion_batch --csv big.csv --chunk-size 20000   # re-run to resume
+"""
+import argparse
 import csv
-import pymongo
+import itertools
+import json
+import os
+import time
+from pathlib import Path
+
+from scripts.data_ingestion import ensure_indexes, upsert_subjects
+from scripts.mongo_client import close_client, get_client
 
 # ==== CONFIGURATION ====
-CSV_PATH = r"E:\22MIA\4th year(2025-26)\Fall semester\CSE3086 NoSQL\Project\nosql_code\data\formatted_hydration_data.csv"
-MONGO_URI = "mongodb://localhost:27017/"
+CSV_PATH = Path("data") / "formatted_hydration_data.csv"
 DB_NAME = "HYDRA"
+COLL_HYDRATION = "hydration_data"
+COLL_METADATA = "metadata"
+CHUNK_SIZE = 5000
+# progress line every N chunks
+REPORT_EVERY = 10
+
 
-# ==== CONNECT TO MONGODB ====
-client = pymongo.MongoClient(MONGO_URI)
-db = client[DB_NAME]
-
-hydration_col = db["hydration_data"]
-metadata_col = db["metadata"]
-
-print("✅ Connected to MongoDB")
-
-# ==== READ & PROCESS CSV FILE ====
-subjects = []
-with open(CSV_PATH, mode="r", encoding="utf-8-sig") as csv_file:
-    csv_reader = csv.DictReader(csv_file)
-    for row in csv_reader:
-        # Convert numeric fields to float where possible
-        for key, value in row.items():
-            try:
-                row[key] = float(value)
-            except ValueError:
-                row[key] = value  # keep as string if not a number
-
-        # Create nested structure for each subject
-        subject = {
-            "Subject_ID": int(row["Subject_ID"]),
-            "Gender": row["Gender"],
-            "Age": row["Age"],
-            "data": {
-                "Initial_Weight_kg": row["Initial_Weight_kg"],
-                "Final_Weight_kg": row["Final_Weight_kg"],
-                "Total_Water_Consumed_ml": row["Total_Water_Consumed_ml"],
-                "final_readings": {
-                    "Gear s2": {
-                        "Sweat_kg": row["Final_Gear1_Sweat_kg"],
-                        "Salt_Lost": row["Final_Salt_Lost_1"]
-                    },
-                    "Gear fit 2": {
-                        "Sweat_kg": row["Final_Gear2_Sweat_kg"],
-                        "Salt_Lost": row["Final_Salt_Lost_2"]
-                    }
+# ==== ROW -> DOCUMENT ====
+def _to_number(value):
+    """Convert numeric fields to float where possible, keep strings otherwise."""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return value
+
+
+def row_to_subject(row: dict) -> dict:
+    """Create the nested subject document for one CSV row."""
+    row = {key: _to_number(value) for key, value in row.items()}
+    return {
+        "Subject_ID": int(row["Subject_ID"]),
+        "Gender": row["Gender"],
+        "Age": row["Age"],
+        "data": {
+            "Initial_Weight_kg": row["Initial_Weight_kg"],
+            "Final_Weight_kg": row["Final_Weight_kg"],
+            "Total_Water_Consumed_ml": row["Total_Water_Consumed_ml"],
+            "final_readings": {
+                "Gear s2": {
+                    "Sweat_kg": row["Final_Gear1_Sweat_kg"],
+                    "Salt_Lost": row["Final_Salt_Lost_1"]
                 },
-                "TARGET_True_Water_Loss_kg": row["TARGET_True_Water_Loss_kg"]
-            }
+                "Gear fit 2": {
+                    "Sweat_kg": row["Final_Gear2_Sweat_kg"],
+                    "Salt_Lost": row["Final_Salt_Lost_2"]
+                }
+            },
+            "TARGET_True_Water_Loss_kg": row["TARGET_True_Water_Loss_kg"]
         }
-        subjects.append(subject)
-
-# ==== CREATE METADATA ====
-metadata = {
-    "description": "Hydration and sweat loss data for study subjects",
-    "total_subjects": len(subjects),
-    "units": {
-        "weight": "kg",
-        "water_consumed": "ml",
-        "salt_lost": "g (assumed)",
-        "water_loss": "kg"
     }
-}
 
-# ==== INSERT INTO MONGODB ====
-# Optional: clear previous data
-metadata_col.delete_many({})
-hydration_col.delete_many({})
 
-# Insert new data
-if metadata:
-    metadata_col.insert_one(metadata)
+# ==== STREAMING READER ====
+def iter_csv_chunks(csv_path, chunk_size=CHUNK_SIZE, skip_rows=0):
+    """Yield lists of at most chunk_size subject documents, skipping the first skip_rows rows."""
+    with open(csv_path, mode="r", encoding="utf-8-sig", newline="") as csv_file:
+        reader = csv.DictReader(csv_file)
+        rows = itertools.islice(reader, skip_rows, None)
+        while True:
+            chunk = [row_to_subject(row) for row in itertools.islice(rows, chunk_size)]
+            if not chunk:
+                return
+            yield chunk
+
+
+# ==== CHECKPOINT ====
+def default_checkpoint_path(csv_path) -> Path:
+    csv_path = Path(csv_path)
+    return csv_path.with_name(csv_path.name + ".ingest_checkpoint.json")
+
+
+def _file_fingerprint(csv_path) -> dict:
+    st = Path(csv_path).stat()
+    return {"csv_path": str(Path(csv_path).resolve()), "csv_size": st.st_size, "csv_mtime_ns": st.st_mtime_ns}
+
+
+def load_checkpoint(checkpoint_path, csv_path) -> int:
+    """Rows already committed for this exact CSV (0 if no matching checkpoint)."""
+    checkpoint_path = Path(checkpoint_path)
+    if not checkpoint_path.exists():
+        return 0
+    with open(checkpoint_path, "r", encoding="utf-8") as f:
+        state = json.load(f)
+    if {k: state.get(k) for k in ("csv_path", "csv_size", "csv_mtime_ns")} != _file_fingerprint(csv_path):
+        print(f"⚠️ Checkpoint {checkpoint_path} belongs to a different/changed CSV; starting over.")
+        return 0
+    return int(state.get("rows_done", 0))
+
+
+def save_checkpoint(checkpoint_path, csv_path, rows_done: int):
+    """Atomically record the number of committed rows."""
+    state = dict(_file_fingerprint(csv_path), rows_done=rows_done)
+    tmp_path = Path(str(checkpoint_path) + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, checkpoint_path)
+
+
+# ==== INGESTION ====
+def ingest_csv(db, csv_path=CSV_PATH, chunk_size=CHUNK_SIZE, checkpoint_path=None, clear_existing=False):
+    """
+    Stream csv_path into the hydration collection.
+    Resumes from checkpoint_path when it matches the CSV; a fresh run with
+    clear_existing=True empties both collections first.
+    Returns a stats dict (rows, chunks, seconds, rows_per_sec, resumed_from).
+    """
+    checkpoint_path = Path(checkpoint_path or default_checkpoint_path(csv_path))
+    hydration_col = db[COLL_HYDRATION]
+
+    rows_done = load_checkpoint(checkpoint_path, csv_path)
+    if rows_done:
+        print(f"↩️ Resuming after {rows_done} committed rows (checkpoint: {checkpoint_path})")
+    elif clear_existing:
+        db[COLL_METADATA].delete_many({})
+        hydration_col.delete_many({})
+    ensure_indexes(db)
+
+    resumed_from = rows_done
+    chunks = 0
+    start = time.perf_counter()
+    for chunk in iter_csv_chunks(csv_path, chunk_size, skip_rows=rows_done):
+        upsert_subjects(db, chunk)
+        rows_done += len(chunk)
+        chunks += 1
+        save_checkpoint(checkpoint_path, csv_path, rows_done)
+        if chunks % REPORT_EVERY == 0:
+            elapsed = time.perf_counter() - start
+            print(f"  … {rows_done} rows committed ({(rows_done - resumed_from) / elapsed:,.0f} rows/s)")
+
+    elapsed = time.perf_counter() - start
+    inserted = rows_done - resumed_from
+    stats = {
+        "rows": rows_done,
+        "inserted": inserted,
+        "chunks": chunks,
+        "seconds": elapsed,
+        "rows_per_sec": inserted / elapsed if elapsed > 0 else 0.0,
+        "resumed_from": resumed_from,
+    }
+    # load finished: the next run is a fresh load again
+    checkpoint_path.unlink(missing_ok=True)
+    return stats
+
+
+def write_metadata(db, total_subjects: int):
+    metadata = {
+        "description": "Hydration and sweat loss data for study subjects",
+        "total_subjects": total_subjects,
+        "units": {
+            "weight": "kg",
+            "water_consumed": "ml",
+            "salt_lost": "g (assumed)",
+            "water_loss": "kg"
+        }
+    }
+    meta_col = db[COLL_METADATA]
+    meta_col.delete_many({})
+    meta_col.insert_one(metadata)
     print("✅ Metadata inserted successfully.")
+    return metadata
 
-if subjects:
-    hydration_col.insert_many(subjects)
-    print(f"✅ Inserted {len(subjects)} subject records into 'hydration_data' collection.")
-else:
-    print("⚠️ No subject data found in the CSV file.")
 
 # ==== VERIFY ====
-print("\n📋 Collections in 'HYDRA' database:")
-print(db.list_collection_names())
+def verify_collections(db):
+    print(f"\n📋 Collections in '{db.name}' database:")
+    collections = db.list_collection_names()
+    print(collections)
+    if COLL_HYDRATION in collections:
+        print(f"✅ '{COLL_HYDRATION}' collection exists.")
+    if COLL_METADATA in collections:
+        print(f"✅ '{COLL_METADATA}' collection exists.")
+
+
+# ==== MAIN ====
+def main():
+    parser = argparse.ArgumentParser(description="Stream the hydration CSV into MongoDB.")
+    parser.add_argument("--csv", default=str(CSV_PATH))
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--checkpoint", default=None, help="checkpoint file (default: <csv>.ingest_checkpoint.json)")
+    parser.add_argument("--reset", action="store_true", help="clear both collections before a fresh load")
+    parser.add_argument("--mongo-uri", default=None, help="default: HYDRA_MONGO_URI")
+    args = parser.parse_args()
+
+    db = get_client(args.mongo_uri)[DB_NAME]
+    print("✅ Connected to MongoDB")
+    try:
+        stats = ingest_csv(db, args.csv, args.chunk_size, args.checkpoint, clear_existing=args.reset)
+        if stats["rows"]:
+            write_metadata(db, stats["rows"])
+            print(f"✅ Upserted {stats['inserted']} subject records into '{COLL_HYDRATION}' "
+                  f"in {stats['chunks']} chunks ({stats['seconds']:.1f}s, {stats['rows_per_sec']:,.0f} rows/s).")
+        else:
+            print("⚠️ No subject data found in the CSV file.")
+        verify_collections(db)
+    finally:
+        close_client(args.mongo_uri)
+
 
-if "hydration_data" in db.list_collection_names():
-    print("✅ 'hydration_data' collection exists.")
-if "metadata" in db.list_collection_names():
-    print("✅ 'metadata' collection exists.")
+if __name__ == "__main__":
+    main()
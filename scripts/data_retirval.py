@@ -1,22 +1,14 @@
-import pymongo
+import argparse
 import json
 
-# ==== MongoDB Configuration ====
-MONGO_URI = "mongodb://localhost:27017/"
-DB_NAME = "HYDRA"
-
-# ==== Connect to MongoDB ====
-client = pymongo.MongoClient(MONGO_URI)
-db = client[DB_NAME]
-hydration_col = db["hydration_data"]
+from scripts.mongo_client import get_client
+from scripts.subject_browser import PAGE_SIZE, RISK_LEVELS, browse_subjects, ensure_browse_indexes, page_frame
 
-print("✅ Connected to MongoDB")
+# ==== MongoDB Configuration ====
+DB_NAME = "HYDRA"  # server: --mongo-uri, else HYDRA_MONGO_URI (scripts/mongo_client.py)
 
-# ==== Input Subject ID ====
-try:
-    subject_id = int(input("\nEnter Subject ID to retrieve: "))
 
-    # ==== Retrieve Data ====
+def retrieve_one(hydration_col, subject_id: int):
     record = hydration_col.find_one({"Subject_ID": subject_id}, {"_id": 0})  # Exclude _id
 
     if record:
@@ -25,10 +17,70 @@ try:
     else:
         print(f"\n⚠️ No record found for Subject_ID = {subject_id}")
 
-except ValueError:
-    print("⚠️ Invalid input. Please enter a valid integer Subject_ID.")
-except Exception as e:
-    print(f"❌ Error retrieving data: {e}")
 
-finally:
-    client.close()
+def browse(db, args):
+    """One filtered page (see scripts/subject_browser.py); prints the cursor for the next page."""
+    model_version = args.model_version
+    if model_version is None:
+        from scripts.model_registry import artifact_version
+        try:
+            model_version = artifact_version()  # batch predictions of the current eager artifacts
+        except FileNotFoundError:
+            model_version = None  # no model: browse without predictions
+    if model_version is None and (args.risk is not None or args.percent_loss is not None):
+        print("⚠️ --risk / --percent-loss filter batch predictions: pass --model-version (no model artifacts found)")
+        return
+
+    ensure_browse_indexes(db)
+    page = browse_subjects(db, args.gender, args.age, args.weight, args.risk, args.percent_loss,
+                           model_version, args.after, args.page_size)
+    if not page["rows"]:
+        print("\n⚠️ No matching subjects")
+        return
+    print(page_frame(page).to_string(index=False))
+    if page["next_after"] is not None:
+        print(f"\n➡️ Next page: --after {page['next_after']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Retrieve one subject, or browse subjects with filters.")
+    parser.add_argument("--id", type=int, default=None, help="retrieve this Subject_ID (default: prompt)")
+    parser.add_argument("--gender", default=None)
+    parser.add_argument("--age", nargs=2, type=float, metavar=("MIN", "MAX"))
+    parser.add_argument("--weight", nargs=2, type=float, metavar=("MIN", "MAX"), help="Initial_Weight_kg range")
+    parser.add_argument("--risk", choices=RISK_LEVELS, default=None, help="predicted risk (batch predictions)")
+    parser.add_argument("--percent-loss", nargs=2, type=float, metavar=("MIN", "MAX"))
+    parser.add_argument("--model-version", default=None, help="predictions to show/filter (default: current model)")
+    parser.add_argument("--after", type=int, default=None, help="Subject_ID cursor printed by the previous page")
+    parser.add_argument("--page-size", type=int, default=PAGE_SIZE)
+    parser.add_argument("--mongo-uri", default=None, help="default: HYDRA_MONGO_URI")
+    args = parser.parse_args()
+    browsing = any(v is not None for v in (args.gender, args.age, args.weight, args.risk, args.percent_loss,
+                                            args.after)) or args.page_size != PAGE_SIZE
+
+    # ==== Connect to MongoDB ====
+    db = get_client(args.mongo_uri)[DB_NAME]
+    hydration_col = db["hydration_data"]
+    print("✅ Connected to MongoDB")
+
+    subject_id = args.id
+    if not browsing and subject_id is None:
+        # ==== Input Subject ID ====
+        try:
+            subject_id = int(input("\nEnter Subject ID to retrieve: "))
+        except ValueError:
+            print("⚠️ Invalid input. Please enter a valid integer Subject_ID.")
+            return
+
+    try:
+        if browsing:
+            browse(db, args)
+        else:
+            retrieve_one(hydration_col, subject_id)
+
+    except Exception as e:
+        print(f"❌ Error retrieving data: {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,320 @@
+# scripts/fast_preprocessor.py
+"""
+Compile the fitted sklearn preprocessor into a fixed NumPy program.
+
+The pickled `preprocessor.pkl` is a ColumnTransformer with
+  - num: SimpleImputer(median) -> StandardScaler
+  - cat: SimpleImputer(most_frequent) -> OneHotEncoder(handle_unknown="ignore")
+Calling `.transform` on a one-row DataFrame spends almost all its time in
+sklearn/pandas validation. CompiledPreprocessor keeps only the fitted
+constants (fill vectors, mean/scale arrays, category -> one-hot lookup
+tables) and reproduces the sklearn output bit for bit.
+
+Usage:
+    python -m scripts.fast_preprocessor            # compile, verify, time
+    python -m scripts.fast_preprocessor --save model/deeprnn_artifacts/preprocessor_compiled.npz
+"""
+import argparse
+import json
+import pickle
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from scripts.model_inference import FEATURES, PREPROC_PATH
+
+DEFAULT_CSV = Path("data") / "formatted_hydration_data.csv"
+
+
+class CompiledPreprocessor:
+    """
+    NumPy equivalent of the fitted ColumnTransformer.
+
+    `numeric` describes the single numeric block (column names, imputation
+    fill vector, mean and scale arrays); `categorical` is one entry per
+    one-hot encoded column (fill token, categories, unknown handling).
+    Output columns are laid out in the same order as the sklearn transformer.
+    """
+
+    def __init__(self, numeric: Dict[str, Any], categorical: List[Dict[str, Any]], block_order: List[str]):
+        self.numeric = numeric
+        self.categorical = categorical
+        self.block_order = block_order
+
+        self.numeric_features = list(numeric["columns"])
+        self.categorical_features = [c["column"] for c in categorical]
+        self.feature_names_in_ = self._input_order()
+        self.n_features_out = len(self.numeric_features) + sum(len(c["categories"]) for c in categorical)
+
+        # category -> row of the lookup table; the extra last row is all zeros (unknown)
+        self._lookups = []
+        for c in categorical:
+            n_cat = len(c["categories"])
+            table = np.zeros((n_cat + 1, n_cat), dtype=np.float64)
+            table[np.arange(n_cat), np.arange(n_cat)] = 1.0
+            index = {cat: i for i, cat in enumerate(c["categories"])}
+            self._lookups.append((index, table))
+
+    def _input_order(self) -> List[str]:
+        cols = []
+        for block in self.block_order:
+            if block == "num":
+                cols.extend(self.numeric_features)
+            else:
+                cols.append(block)
+        return cols
+
+    # ---- transform ----
+    def _numeric(self, values: np.ndarray) -> np.ndarray:
+        out = np.array(values, dtype=np.float64)  # always a copy
+        missing = np.isnan(out)
+        if missing.any():
+            out[missing] = np.broadcast_to(self.numeric["fill"], out.shape)[missing]
+        if self.numeric["mean"] is not None:
+            out -= self.numeric["mean"]
+        if self.numeric["scale"] is not None:
+            out /= self.numeric["scale"]
+        return out
+
+    def _one_hot(self, i: int, values: np.ndarray) -> np.ndarray:
+        spec = self.categorical[i]
+        index, table = self._lookups[i]
+        unknown = len(spec["categories"])
+        fill = spec["fill"]
+        rows = np.empty(len(values), dtype=np.intp)
+        for j, v in enumerate(values):
+            # same missing test sklearn applies to object columns (only NaN, not None)
+            if v != v:
+                v = fill
+            pos = index.get(v, unknown)
+            if pos == unknown and spec["handle_unknown"] != "ignore":
+                raise ValueError(f"Found unknown category {v!r} in column '{spec['column']}' during transform")
+            rows[j] = pos
+        return table[rows]
+
+    def transform_arrays(self, numeric: np.ndarray, categorical: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Transform raw arrays without going through pandas.
+        numeric:     (N, n_numeric) floats in `numeric_features` order (NaN = missing)
+        categorical: (N,) or (N, n_categorical) tokens in `categorical_features` order
+        """
+        numeric = np.asarray(numeric, dtype=np.float64)
+        if numeric.ndim == 1:
+            numeric = numeric.reshape(1, -1)
+        n = numeric.shape[0]
+        if categorical is None:
+            categorical = np.full((n, len(self.categorical)), np.nan, dtype=object)
+        categorical = np.asarray(categorical, dtype=object)
+        if categorical.ndim == 1:
+            categorical = categorical.reshape(n, -1)
+
+        parts = []
+        cat_i = 0
+        for block in self.block_order:
+            if block == "num":
+                parts.append(self._numeric(numeric))
+            else:
+                parts.append(self._one_hot(cat_i, categorical[:, cat_i]))
+                cat_i += 1
+        return np.concatenate(parts, axis=1) if len(parts) > 1 else parts[0]
+
+    def transform(self, X: pd.DataFrame) -> np.ndarray:
+        """Drop-in replacement for ColumnTransformer.transform on a DataFrame."""
+        # column-by-column access avoids building an intermediate DataFrame
+        numeric = np.empty((len(X), len(self.numeric_features)), dtype=np.float64)
+        for i, col in enumerate(self.numeric_features):
+            numeric[:, i] = X[col].to_numpy(dtype=np.float64)
+        categorical = np.empty((len(X), len(self.categorical_features)), dtype=object)
+        for i, col in enumerate(self.categorical_features):
+            categorical[:, i] = X[col].to_numpy(dtype=object)
+        return self.transform_arrays(numeric, categorical)
+
+    # ---- (de)serialisation: plain arrays, no pickle ----
+    def save(self, path):
+        meta = {
+            "block_order": self.block_order,
+            "numeric_columns": self.numeric_features,
+            "has_mean": self.numeric["mean"] is not None,
+            "has_scale": self.numeric["scale"] is not None,
+            "categorical": [
+                {"column": c["column"], "fill": c["fill"], "handle_unknown": c["handle_unknown"]}
+                for c in self.categorical
+            ],
+        }
+        arrays = {"meta": np.array(json.dumps(meta)), "num_fill": self.numeric["fill"]}
+        if self.numeric["mean"] is not None:
+            arrays["num_mean"] = self.numeric["mean"]
+        if self.numeric["scale"] is not None:
+            arrays["num_scale"] = self.numeric["scale"]
+        for i, c in enumerate(self.categorical):
+            arrays[f"cat{i}_categories"] = np.array(c["categories"], dtype=str)
+        np.savez(path, **arrays)
+
+    @classmethod
+    def load(cls, path) -> "CompiledPreprocessor":
+        with np.load(path, allow_pickle=False) as z:
+            meta = json.loads(str(z["meta"]))
+            numeric = {
+                "columns": meta["numeric_columns"],
+                "fill": z["num_fill"],
+                "mean": z["num_mean"] if meta["has_mean"] else None,
+                "scale": z["num_scale"] if meta["has_scale"] else None,
+            }
+            categorical = [
+                dict(c, categories=z[f"cat{i}_categories"].tolist())
+                for i, c in enumerate(meta["categorical"])
+            ]
+        return cls(numeric, categorical, meta["block_order"])
+
+
+def _steps(transformer) -> list:
+    return [s for _, s in transformer.steps] if hasattr(transformer, "steps") else [transformer]
+
+
+def compile_preprocessor(preproc, verify: bool = True) -> CompiledPreprocessor:
+    """
+    Extract the fitted constants of the training ColumnTransformer.
+    Raises ValueError for layouts the NumPy program does not cover
+    (sparse output, passthrough remainder, extra pipeline steps, ...).
+    """
+    if not hasattr(preproc, "transformers_"):
+        raise ValueError("Expected a fitted sklearn ColumnTransformer")
+    if getattr(preproc, "sparse_output_", False):
+        raise ValueError("Sparse ColumnTransformer output is not supported")
+
+    numeric = None
+    categorical = []
+    block_order = []
+    for name, transformer, columns in preproc.transformers_:
+        if transformer == "drop" or len(columns) == 0:
+            continue
+        if name == "remainder":
+            raise ValueError("ColumnTransformer remainder='passthrough' is not supported")
+        columns = list(columns)
+        kinds = [type(s).__name__ for s in _steps(transformer)]
+        steps = _steps(transformer)
+
+        if kinds and kinds[-1] == "OneHotEncoder":
+            encoder = steps[-1]
+            if encoder.drop_idx_ is not None or getattr(encoder, "_infrequent_enabled", False):
+                raise ValueError("OneHotEncoder with drop/infrequent categories is not supported")
+            fills = [np.nan] * len(columns)
+            for s, kind in zip(steps[:-1], kinds[:-1]):
+                if kind != "SimpleImputer" or s.add_indicator:
+                    raise ValueError(f"Unsupported categorical step: {kind}")
+                fills = list(s.statistics_)
+            for i, col in enumerate(columns):
+                categorical.append({
+                    "column": col,
+                    "fill": fills[i],
+                    "categories": list(encoder.categories_[i]),
+                    "handle_unknown": encoder.handle_unknown,
+                })
+                block_order.append(col)
+        else:
+            if numeric is not None:
+                raise ValueError("Only one numeric block is supported")
+            spec = {"columns": columns, "fill": np.full(len(columns), np.nan), "mean": None, "scale": None}
+            for s, kind in zip(steps, kinds):
+                if kind == "SimpleImputer" and not s.add_indicator:
+                    spec["fill"] = np.asarray(s.statistics_, dtype=np.float64)
+                elif kind == "StandardScaler":
+                    spec["mean"] = None if s.mean_ is None else np.asarray(s.mean_, dtype=np.float64)
+                    spec["scale"] = None if s.scale_ is None else np.asarray(s.scale_, dtype=np.float64)
+                else:
+                    raise ValueError(f"Unsupported numeric step: {kind}")
+            numeric = spec
+            block_order.append("num")
+
+    if numeric is None:
+        numeric = {"columns": [], "fill": np.empty(0), "mean": None, "scale": None}
+    compiled = CompiledPreprocessor(numeric, categorical, block_order)
+    if verify:
+        diff = max_abs_diff(preproc, compiled, _probe_frame(compiled))
+        if diff != 0.0:
+            raise ValueError(f"Compiled preprocessor deviates from sklearn output (max abs diff {diff})")
+    return compiled
+
+
+def _probe_frame(compiled: CompiledPreprocessor) -> pd.DataFrame:
+    """Small frame hitting imputation, every category and an unknown token."""
+    rows = []
+    n_rows = max([len(c["categories"]) for c in compiled.categorical] + [1]) + 2
+    for r in range(n_rows):
+        row = {}
+        for j, col in enumerate(compiled.numeric_features):
+            row[col] = np.nan if r == 0 else float(compiled.numeric["fill"][j]) * (0.5 + r) + r
+        for c in compiled.categorical:
+            cats = c["categories"]
+            if r == 0:
+                row[c["column"]] = np.nan
+            elif r - 1 < len(cats):
+                row[c["column"]] = cats[r - 1]
+            elif c["handle_unknown"] == "ignore":
+                row[c["column"]] = "__unknown__"
+            else:
+                row[c["column"]] = cats[0]
+        rows.append(row)
+    return pd.DataFrame(rows, columns=compiled.feature_names_in_)
+
+
+def max_abs_diff(preproc, compiled: CompiledPreprocessor, X: pd.DataFrame) -> float:
+    """Largest absolute difference between the sklearn and compiled outputs on X."""
+    expected = np.asarray(preproc.transform(X), dtype=np.float64)
+    got = compiled.transform(X)
+    if expected.shape != got.shape:
+        return float("inf")
+    return float(np.max(np.abs(expected - got))) if expected.size else 0.0
+
+
+def load_compiled_preprocessor(preproc_path=PREPROC_PATH) -> CompiledPreprocessor:
+    """Load a compiled program: `.npz` files directly, pickled sklearn preprocessors are compiled."""
+    preproc_path = Path(preproc_path)
+    if preproc_path.suffix == ".npz":
+        return CompiledPreprocessor.load(preproc_path)
+    with open(preproc_path, "rb") as f:
+        preproc = pickle.load(f)
+    return compile_preprocessor(preproc)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile preprocessor.pkl into a NumPy program and check parity.")
+    parser.add_argument("--preproc", default=str(PREPROC_PATH))
+    parser.add_argument("--csv", default=str(DEFAULT_CSV), help="data used for the parity/timing check")
+    parser.add_argument("--save", default=None, help="optional .npz output path for the compiled program")
+    args = parser.parse_args()
+
+    with open(args.preproc, "rb") as f:
+        preproc = pickle.load(f)
+    compiled = compile_preprocessor(preproc)
+    print(f"✅ Compiled preprocessor: {len(compiled.numeric_features)} numeric + "
+          f"{len(compiled.categorical_features)} categorical -> {compiled.n_features_out} outputs")
+
+    df = pd.read_csv(args.csv)[FEATURES]
+    print(f"🔍 Max abs diff vs sklearn on {len(df)} rows: {max_abs_diff(preproc, compiled, df)}")
+
+    row = df.iloc[[0]]
+    for label, fn in (("sklearn", preproc.transform), ("compiled", compiled.transform)):
+        n = 200
+        start = time.perf_counter()
+        for _ in range(n):
+            fn(row)
+        print(f"⏱️ {label:>8} one-row transform: {(time.perf_counter() - start) / n * 1e6:.1f} µs")
+    numeric = row[compiled.numeric_features].to_numpy(dtype=np.float64)
+    gender = row[compiled.categorical_features].to_numpy(dtype=object)
+    n = 2000
+    start = time.perf_counter()
+    for _ in range(n):
+        compiled.transform_arrays(numeric, gender)
+    print(f"⏱️ {'arrays':>8} one-row transform: {(time.perf_counter() - start) / n * 1e6:.1f} µs")
+
+    if args.save:
+        compiled.save(args.save)
+        print(f"📁 Saved compiled program to {args.save}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,341 @@
+# scripts/gear_stream.py
+"""
+Time-series ingestion of raw wearable gear readings.
+
+The subject documents only hold per-gear totals in final_readings
+("Gear s2", "Gear fit 2"), while the devices stream sweat/salt samples.
+GearStreamWriter stores every sample in the `gear_readings` time-series
+collection and keeps the totals in hydration_data up to date:
+
+    {"ts": datetime, "meta": {"subject_id": 7, "gear": "Gear s2"},
+     "sweat_kg": 0.0004, "salt_lost": 0.41}             # one sample (amount since the previous one)
+
+Samples are buffered per stream and written in buckets: one unordered
+insert_many per flush (sorted by stream and time, so the server fills one
+time-series bucket per stream) plus one $inc per touched stream on
+final_readings.<gear>.Sweat_kg / Salt_Lost (added to whatever total the
+document already holds, e.g. the ingested CSV values). The same $inc adds
+the sample sums to streamed_Sweat_kg / streamed_Salt_Lost, so
+`total - streamed` is always the pre-stream base. The parser and the model
+keep reading final_readings as before; rebuild_rollup() recomputes
+base + sum(raw samples) after a crash between the two writes.
+Rollups only update existing subjects: samples for a Subject_ID without a
+hydration_data document are stored but counted as unmatched_rollups
+instead of creating a stub subject.
+
+On a MongoDB server (5.0+) `gear_readings` is a native time-series
+collection. Backends without time-series support (mongomock, used as the
+local stand-in for tests and benchmarks) get a regular collection with
+the same (meta, ts) index and the same API.
+
+Usage:
+    python -m scripts.gear_stream --simulate --subjects 4 --seconds 30 --rate 2000 --backend mongomock
+    python -m scripts.gear_stream --csv readings.csv   # Subject_ID,gear,timestamp,sweat_kg,salt_lost
+"""
+import argparse
+import csv
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+import pymongo
+from pymongo import UpdateOne
+from pymongo.errors import CollectionInvalid, OperationFailure
+
+from scripts.data_ingestion import DB_NAME, COLL_HYDRATION, connect_mongo
+
+# ==== CONFIGURATION ====
+COLL_GEAR_READINGS = "gear_readings"
+GEARS = ("Gear s2", "Gear fit 2")
+# gear key per document block: row_to_subject stores gear 1 under "Gear s2", collect_subject_data under "Gear1"
+GEAR_KEYS = {"data": {"Gear s2": "Gear s2", "Gear fit 2": "Gear fit 2"},
+             "measurements": {"Gear s2": "Gear1", "Gear fit 2": "Gear2"}}
+TIMESERIES_OPTIONS = {"timeField": "ts", "metaField": "meta", "granularity": "seconds"}
+# samples buffered before a flush, and the longest a sample waits in the buffer
+BUCKET_SIZE = 5000
+FLUSH_INTERVAL_S = 1.0
+
+
+# ==== COLLECTION ====
+def ensure_gear_collection(db, expire_after_seconds: Optional[int] = None) -> bool:
+    """
+    Create `gear_readings` as a time-series collection (once); returns True
+    when it is a native time-series collection, False for the stand-in.
+    """
+    native = True
+    if COLL_GEAR_READINGS not in db.list_collection_names():
+        options = {"timeseries": TIMESERIES_OPTIONS}
+        if expire_after_seconds is not None:
+            options["expireAfterSeconds"] = expire_after_seconds
+        try:
+            db.create_collection(COLL_GEAR_READINGS, **options)
+        except CollectionInvalid:
+            pass  # created concurrently
+        except (NotImplementedError, OperationFailure):
+            # no time-series support (mongomock, MongoDB < 5.0): plain collection, same documents
+            native = False
+    else:
+        try:
+            info = next(iter(db.list_collections(filter={"name": COLL_GEAR_READINGS})), {})
+            native = info.get("type") == "timeseries"
+        except NotImplementedError:
+            native = False
+    db[COLL_GEAR_READINGS].create_index(
+        [("meta.subject_id", pymongo.ASCENDING), ("meta.gear", pymongo.ASCENDING), ("ts", pymongo.ASCENDING)],
+        name="subject_gear_ts")
+    return native
+
+
+def final_readings_blocks(hydration_col, subject_ids, cache: Optional[Dict[int, str]] = None) -> Dict[int, str]:
+    """
+    Which block ("data" or "measurements") holds each subject's
+    final_readings, so rollups land where parse_record_to_features reads.
+    Subjects without a document get the data layout (row_to_subject);
+    their rollups match nothing (see GearStreamWriter.flush).
+    """
+    cache = {} if cache is None else cache
+    missing = [sid for sid in subject_ids if sid not in cache]
+    if missing:
+        found = {doc["Subject_ID"]: ("measurements" if "measurements" in doc and "data" not in doc else "data")
+                 for doc in hydration_col.find({"Subject_ID": {"$in": missing}},
+                                               {"_id": 0, "Subject_ID": 1, "data": 1, "measurements": 1})}
+        for sid in missing:
+            cache[sid] = found.get(sid, "data")
+    return {sid: cache[sid] for sid in subject_ids}
+
+
+def _as_datetime(ts) -> datetime:
+    if isinstance(ts, datetime):
+        return ts if ts.tzinfo is not None else ts.replace(tzinfo=timezone.utc)
+    return datetime.fromtimestamp(float(ts), timezone.utc)
+
+
+# ==== WRITER ====
+class GearStreamWriter:
+    """
+    Buffered writer for gear samples (one instance per thread).
+    add() is a list append; the buffer is flushed as one bulk insert plus
+    one rollup update per stream when it holds bucket_size samples or its
+    oldest sample is flush_interval_s old. Use as a context manager (or
+    call close()) so the tail is flushed.
+    """
+
+    def __init__(self, db, bucket_size: int = BUCKET_SIZE, flush_interval_s: float = FLUSH_INTERVAL_S):
+        if bucket_size <= 0:
+            raise ValueError(f"bucket_size must be positive, got {bucket_size}")
+        self.db = db
+        self.readings = db[COLL_GEAR_READINGS]
+        self.hydration = db[COLL_HYDRATION]
+        self.bucket_size = bucket_size
+        self.flush_interval_s = flush_interval_s
+        self.native = ensure_gear_collection(db)
+        # (subject_id, gear) -> ([ts], [sweat], [salt])
+        self._buffers: Dict[tuple, tuple] = {}
+        self._pending = 0
+        self._oldest: Optional[float] = None
+        # subject_id -> block holding its final_readings (see final_readings_blocks)
+        self._blocks: Dict[int, str] = {}
+        self.stats = {"samples": 0, "flushes": 0, "rollups": 0, "unmatched_rollups": 0, "flush_s": 0.0}
+
+    def _buffer(self, subject_id: int, gear: str) -> tuple:
+        key = (subject_id, gear)
+        buf = self._buffers.get(key)
+        if buf is None:
+            if gear not in GEARS:
+                raise ValueError(f"unknown gear {gear!r}, expected one of {GEARS}")
+            buf = self._buffers[key] = ([], [], [])
+        return buf
+
+    def add(self, subject_id: int, gear: str, ts, sweat_kg: float, salt_lost: float):
+        """Queue one sample; ts is a datetime or epoch seconds."""
+        ts_list, sweat, salt = self._buffer(subject_id, gear)
+        ts_list.append(ts)
+        sweat.append(sweat_kg)
+        salt.append(salt_lost)
+        self._added(1)
+
+    def add_many(self, subject_id: int, gear: str, ts: Sequence, sweat_kg: Sequence[float], salt_lost: Sequence[float]):
+        """Queue a run of samples from one stream (equal-length sequences or arrays)."""
+        if not len(ts) == len(sweat_kg) == len(salt_lost):
+            raise ValueError("ts, sweat_kg and salt_lost must have the same length")
+        ts_list, sweat, salt = self._buffer(subject_id, gear)
+        ts_list.extend(ts)
+        sweat.extend(sweat_kg)
+        salt.extend(salt_lost)
+        self._added(len(ts))
+
+    def _added(self, n: int):
+        self._pending += n
+        now = time.monotonic()
+        if self._oldest is None:
+            self._oldest = now
+        if self._pending >= self.bucket_size or now - self._oldest >= self.flush_interval_s:
+            self.flush()
+
+    def flush(self):
+        """Write every buffered sample and roll the per-stream totals into final_readings."""
+        if not self._pending:
+            return
+        start = time.perf_counter()
+        buffers, self._buffers = self._buffers, {}
+        self._pending, self._oldest = 0, None
+
+        docs, totals = [], []
+        for (subject_id, gear), (ts_list, sweat, salt) in sorted(buffers.items()):
+            sweat_arr = np.asarray(sweat, dtype=np.float64)
+            salt_arr = np.asarray(salt, dtype=np.float64)
+            meta = {"subject_id": subject_id, "gear": gear}
+            stamps = [_as_datetime(t) for t in ts_list]
+            docs.extend({"ts": t, "meta": meta, "sweat_kg": s, "salt_lost": g}
+                        for t, s, g in zip(stamps, sweat_arr.tolist(), salt_arr.tolist()))
+            totals.append((subject_id, gear, float(sweat_arr.sum()), float(salt_arr.sum()), len(stamps), max(stamps)))
+        self.readings.insert_many(docs, ordered=False)
+
+        blocks = final_readings_blocks(self.hydration, {subject_id for subject_id, *_ in totals}, self._blocks)
+        ops = []
+        for subject_id, gear, sweat_sum, salt_sum, n, last_ts in totals:
+            prefix = f"{blocks[subject_id]}.final_readings.{GEAR_KEYS[blocks[subject_id]][gear]}"
+            ops.append(UpdateOne(
+                {"Subject_ID": subject_id},
+                {"$inc": {f"{prefix}.Sweat_kg": sweat_sum, f"{prefix}.Salt_Lost": salt_sum,
+                          f"{prefix}.streamed_Sweat_kg": sweat_sum, f"{prefix}.streamed_Salt_Lost": salt_sum,
+                          f"{prefix}.samples": n},
+                 "$max": {f"{prefix}.last_sample_at": last_ts}}))
+        # no upsert: a stub document without Gender/Age/weights would pass for a real subject
+        result = self.hydration.bulk_write(ops, ordered=False)
+
+        self.stats["samples"] += len(docs)
+        self.stats["flushes"] += 1
+        self.stats["rollups"] += result.matched_count
+        self.stats["unmatched_rollups"] += len(ops) - result.matched_count
+        self.stats["flush_s"] += time.perf_counter() - start
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# ==== REPAIR ====
+def rebuild_rollup(db, subject_id: int) -> Dict[str, Dict[str, Any]]:
+    """
+    Recompute one subject's final_readings totals from its raw samples:
+    total = base + sum(samples), where base = total - streamed is what the
+    document held before streaming (ingested totals are kept). Idempotent;
+    returns {} when the subject has no samples or no document.
+    """
+    pipeline = [
+        {"$match": {"meta.subject_id": subject_id}},
+        {"$group": {"_id": "$meta.gear", "Sweat_kg": {"$sum": "$sweat_kg"}, "Salt_Lost": {"$sum": "$salt_lost"},
+                    "samples": {"$sum": 1}, "last_sample_at": {"$max": "$ts"}}},
+    ]
+    sums = {row.pop("_id"): row for row in db[COLL_GEAR_READINGS].aggregate(pipeline)}
+    doc = db[COLL_HYDRATION].find_one({"Subject_ID": subject_id}, {"_id": 0, "data": 1, "measurements": 1})
+    if not sums or doc is None:
+        return {}
+    block = "measurements" if "measurements" in doc and "data" not in doc else "data"
+    stored = (doc.get(block) or {}).get("final_readings") or {}
+
+    update, totals = {}, {}
+    for gear, row in sums.items():
+        key = GEAR_KEYS[block][gear]
+        current = stored.get(key) or {}
+        total = dict(row)
+        for field in ("Sweat_kg", "Salt_Lost"):
+            base = float(current.get(field) or 0.0) - float(current.get(f"streamed_{field}") or 0.0)
+            total[field] = base + row[field]
+            total[f"streamed_{field}"] = row[field]
+        totals[gear] = total
+        update.update({f"{block}.final_readings.{key}.{k}": v for k, v in total.items()})
+    db[COLL_HYDRATION].update_one({"Subject_ID": subject_id}, {"$set": update})
+    return totals
+
+
+# ==== CSV / SIMULATION ====
+def ingest_readings_csv(db, csv_path, bucket_size: int = BUCKET_SIZE) -> Dict[str, Any]:
+    """Stream a readings CSV (Subject_ID, gear, timestamp [epoch s or ISO 8601], sweat_kg, salt_lost)."""
+    with GearStreamWriter(db, bucket_size=bucket_size, flush_interval_s=float("inf")) as writer, \
+            open(csv_path, newline="", encoding="utf-8-sig") as f:
+        for row in csv.DictReader(f):
+            raw_ts = row["timestamp"]
+            try:
+                ts = float(raw_ts)
+            except ValueError:
+                ts = datetime.fromisoformat(raw_ts)
+            writer.add(int(row["Subject_ID"]), row["gear"], ts, float(row["sweat_kg"]), float(row["salt_lost"]))
+    return writer.stats
+
+
+def simulate_streams(db, subjects: int = 4, seconds: float = 10.0, rate_hz: int = 1000, chunk: int = 100,
+                     seed: int = 0, start_id: int = 1, bucket_size: int = BUCKET_SIZE) -> Dict[str, Any]:
+    """
+    Generate `rate_hz` samples per second per gear stream for `seconds` of
+    device time and push them through a GearStreamWriter as fast as it
+    accepts them; returns writer stats plus wall time and samples/s.
+    """
+    rng = np.random.default_rng(seed)
+    n = int(seconds * rate_hz)
+    t0 = time.time()
+    # 0.3-0.8 kg/h of sweat per gear; salt = 1100 x sweat, the ratio in the CSV
+    sweat_rate = rng.uniform(0.3, 0.8, size=(subjects, len(GEARS))) / 3600 / rate_hz
+    start = time.perf_counter()
+    with GearStreamWriter(db, bucket_size=bucket_size) as writer:
+        for lo in range(0, n, chunk):
+            hi = min(lo + chunk, n)
+            ts = (t0 + np.arange(lo, hi) / rate_hz).tolist()
+            for s in range(subjects):
+                for g, gear in enumerate(GEARS):
+                    sweat = sweat_rate[s, g] * rng.gamma(4.0, 0.25, size=hi - lo)
+                    writer.add_many(start_id + s, gear, ts, sweat, sweat * 1100.0)
+    elapsed = time.perf_counter() - start
+    stats = dict(writer.stats, seconds=elapsed, streams=subjects * len(GEARS),
+                 samples_per_sec=writer.stats["samples"] / elapsed if elapsed > 0 else 0.0)
+    stats["samples_per_sec_per_stream"] = stats["samples_per_sec"] / stats["streams"]
+    return stats
+
+
+# ==== MAIN ====
+def main():
+    parser = argparse.ArgumentParser(description="Ingest raw gear readings into the gear_readings time-series collection.")
+    parser.add_argument("--csv", default=None, help="readings CSV: Subject_ID,gear,timestamp,sweat_kg,salt_lost")
+    parser.add_argument("--simulate", action="store_true", help="generate synthetic streams and report throughput")
+    parser.add_argument("--subjects", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=10.0, help="device time simulated per stream")
+    parser.add_argument("--rate", type=int, default=1000, help="samples per second per gear stream")
+    parser.add_argument("--start-id", type=int, default=1)
+    parser.add_argument("--bucket-size", type=int, default=BUCKET_SIZE)
+    parser.add_argument("--backend", choices=("mongo", "mongomock"), default="mongo",
+                        help="mongomock: in-process stand-in, nothing is persisted")
+    parser.add_argument("--mongo-uri", default=None)
+    args = parser.parse_args()
+
+    if args.backend == "mongomock":
+        import mongomock
+        db = mongomock.MongoClient()[DB_NAME]
+    else:
+        _, db = connect_mongo(args.mongo_uri)
+
+    if args.csv:
+        stats = ingest_readings_csv(db, args.csv, args.bucket_size)
+        print(f"✅ Ingested {stats['samples']:,} samples in {stats['flushes']} bulk writes ({stats['rollups']} rollups)")
+        if stats["unmatched_rollups"]:
+            print(f"⚠️ {stats['unmatched_rollups']} rollup(s) had no hydration_data subject; samples were stored only")
+    if args.simulate:
+        stats = simulate_streams(db, args.subjects, args.seconds, args.rate, start_id=args.start_id,
+                                 bucket_size=args.bucket_size)
+        print(f"✅ {stats['samples']:,} samples from {stats['streams']} streams in {stats['seconds']:.2f}s: "
+              f"{stats['samples_per_sec']:,.0f} samples/s ({stats['samples_per_sec_per_stream']:,.0f} per stream), "
+              f"{stats['flushes']} flushes, {stats['flush_s']:.2f}s writing")
+        if stats["unmatched_rollups"]:
+            print(f"⚠️ {stats['unmatched_rollups']} rollup(s) had no hydration_data subject; samples were stored only")
+    if not (args.csv or args.simulate):
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
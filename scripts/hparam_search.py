@@ -0,0 +1,222 @@
+# scripts/hparam_search.py
+"""
+Parallel hyperparameter search for the DeepRNN.
+
+The notebook tried RNN variants by hand. Here every trial is one
+train_deeprnn.train() run with a config drawn from SEARCH_SPACE
+(hidden_size, num_layers, dropout, seq_len -> feat_per_step, lr; dropout
+only with num_layers > 1, where nn.RNN applies it), and trials run in a
+spawn process pool. Each worker pins torch to cpu_count // workers
+intra-op threads, so concurrent trials do not oversubscribe the cores.
+
+Pruning (median rule): from PRUNE_WARMUP_EPOCHS up to the epoch before
+its last, a trial whose val RMSE at an epoch is worse than the median of
+the other trials' val RMSE at the same epoch stops early. Trials report
+through a shared Manager dict, so pruning also works across the pool.
+
+The results table (one row per trial, best val RMSE first) is written
+to --results. --export retrains the winner and writes full artifacts,
+with the winner's model_config block, into a directory that
+load_model_and_preproc reads.
+
+Usage:
+    python -m scripts.hparam_search --files "data/shards/*.csv" --trials 24 --workers 4
+    python -m scripts.hparam_search --mongo --trials 12 --epochs 8 --export model/deeprnn_tuned
+"""
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from scripts.train_deeprnn import (
+    DEFAULT_CONFIG,
+    CsvShardSource,
+    MongoSource,
+    model_config_block,
+    train,
+)
+
+# ==== CONFIGURATION ====
+SEARCH_SPACE: Dict[str, List[Any]] = {
+    "hidden_size": [32, 64, 128, 256],
+    "num_layers": [1, 2, 3],
+    "dropout": [0.0, 0.1, 0.3],
+    "seq_len": [1, 3, 4, 9],   # the 9 preprocessed columns as 1x9, 3x3, 4x3 (zero-padded) or 9x1 steps
+    "lr": [3e-4, 1e-3, 3e-3],
+}
+SEARCH_EPOCHS = 10
+PRUNE_WARMUP_EPOCHS = 2     # never prune before this epoch
+PRUNE_MIN_TRIALS = 3        # other trials that must have reported an epoch before it can prune
+RESULTS_PATH = "hparam_results.csv"
+
+# set in each pool worker by _init_worker
+_REPORTS = None
+
+
+# ==== TRIALS ====
+def sample_configs(space: Dict[str, List[Any]] = SEARCH_SPACE, n_trials: Optional[int] = None,
+                   seed: int = DEFAULT_CONFIG["seed"]) -> List[Dict[str, Any]]:
+    """n_trials distinct configs of the grid (all of it when None), drawn with a fixed seed."""
+    keys = list(space)
+    grid = [dict(zip(keys, values)) for values in itertools.product(*(space[k] for k in keys))]
+    # nn.RNN applies dropout only between layers: with one layer, dropout > 0 repeats the dropout=0 trial
+    grid = [c for c in grid if not (c.get("num_layers") == 1 and c.get("dropout", 0) > 0)]
+    if n_trials is None or n_trials >= len(grid):
+        return grid
+    picks = np.random.default_rng(seed).choice(len(grid), size=n_trials, replace=False)
+    return [grid[i] for i in picks]
+
+
+def make_source(spec: Dict[str, Any]):
+    """Source from a picklable spec: {"files": [...]} or {"mongo_uri": ..., "server_side": ...}."""
+    if "files" in spec:
+        return CsvShardSource(spec["files"])
+    return MongoSource(spec.get("mongo_uri"), server_side=spec.get("server_side", True))
+
+
+def should_prune(reports: Dict, trial_id: int, epoch: int, val_rmse: float) -> bool:
+    """Median rule over the other trials' val RMSE at this epoch."""
+    if epoch < PRUNE_WARMUP_EPOCHS:
+        return False
+    others = [rmse for (tid, ep), rmse in list(reports.items()) if ep == epoch and tid != trial_id]
+    return len(others) >= PRUNE_MIN_TRIALS and val_rmse > float(np.median(others))
+
+
+def _init_worker(reports, threads: int):
+    global _REPORTS
+    import torch
+
+    # trials run side by side: each one gets its share of the cores
+    torch.set_num_threads(threads)
+    _REPORTS = reports
+
+
+def run_trial(trial_id: int, config: Dict[str, Any], source_spec: Dict[str, Any], epochs: int,
+              reports=None) -> Dict[str, Any]:
+    """Train one config (no artifacts) and return its results row."""
+    reports = reports if reports is not None else _REPORTS
+
+    def on_epoch(epoch: int, row: Dict[str, float]) -> bool:
+        reports[(trial_id, epoch)] = row["val_rmse"]
+        # the last epoch is reported for the others' medians, but stopping there would not save any training
+        return epoch < epochs and should_prune(reports, trial_id, epoch, row["val_rmse"])
+
+    start = time.perf_counter()
+    result = train(make_source(source_spec), dict(config, epochs=epochs), workers=0, on_epoch=on_epoch, verbose=False)
+    return dict(
+        trial=trial_id,
+        **config,
+        feat_per_step=result["feat_per_step"],
+        status=result["stopped"],
+        epochs_run=len(result["history"]),
+        best_epoch=result["best_epoch"],
+        val_rmse=result["val_rmse"],
+        test_rmse=result["test"].get("RMSE", float("nan")),
+        samples_per_sec=result["samples_per_sec"],
+        seconds=time.perf_counter() - start,
+    )
+
+
+def search(source_spec: Dict[str, Any], configs: List[Dict[str, Any]], workers: Optional[int] = None,
+           epochs: int = SEARCH_EPOCHS) -> pd.DataFrame:
+    """Run every config, `workers` trials at a time; returns the results table, best val RMSE first."""
+    workers = max(1, min(workers or os.cpu_count() or 1, len(configs)))
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    rows = []
+    if workers == 1:
+        reports: Dict = {}
+        for i, config in enumerate(configs):
+            rows.append(run_trial(i, config, source_spec, epochs, reports))
+            _print_row(rows[-1], len(configs))
+    else:
+        # spawn: each worker builds its own source (and MongoClient) and torch thread pool
+        ctx = multiprocessing.get_context("spawn")
+        with ctx.Manager() as manager:
+            reports = manager.dict()
+            with ProcessPoolExecutor(max_workers=workers, mp_context=ctx,
+                                     initializer=_init_worker, initargs=(reports, threads)) as pool:
+                futures = [pool.submit(run_trial, i, config, source_spec, epochs) for i, config in enumerate(configs)]
+                for future in as_completed(futures):
+                    rows.append(future.result())
+                    _print_row(rows[-1], len(configs))
+    return pd.DataFrame(rows).sort_values(["val_rmse", "trial"]).reset_index(drop=True)
+
+
+def _print_row(row: Dict[str, Any], total: int):
+    icon = "✂️" if row["status"] == "pruned" else "✅"
+    print(f"{icon} trial {row['trial'] + 1}/{total}  hidden {row['hidden_size']}  layers {row['num_layers']}  "
+          f"dropout {row['dropout']}  seq_len {row['seq_len']}  lr {row['lr']:g}  ->  val RMSE {row['val_rmse']:.4f}  "
+          f"({row['status']}, {row['epochs_run']} epochs, {row['seconds']:.1f}s)")
+
+
+# ==== WINNER ====
+def _winner_row(results: pd.DataFrame) -> pd.Series:
+    """Best completed (not pruned) trial; the table is sorted by val RMSE."""
+    completed = results[results["status"] != "pruned"]
+    return (completed if not completed.empty else results).iloc[0]
+
+
+def winner_config(results: pd.DataFrame) -> Dict[str, Any]:
+    """Training config (SEARCH_SPACE keys) of the winning trial."""
+    best = _winner_row(results)
+    return {k: best[k].item() if hasattr(best[k], "item") else best[k] for k in SEARCH_SPACE}
+
+
+def winner_model_config(results: pd.DataFrame) -> Dict[str, Any]:
+    """The winner as the checkpoint's model_config block, with its feat_per_step and seq_len."""
+    config = winner_config(results)
+    feat_per_step = int(_winner_row(results)["feat_per_step"])
+    return {"model_config": model_config_block(dict(DEFAULT_CONFIG, **config), feat_per_step),
+            "feat_per_step": feat_per_step, "seq_len": config["seq_len"]}
+
+
+def export_winner(results: pd.DataFrame, source_spec: Dict[str, Any], out_dir, epochs: int = DEFAULT_CONFIG["epochs"],
+                  workers: int = 0) -> Dict[str, Any]:
+    """Retrain the winning config with early stopping and write full artifacts to out_dir."""
+    return train(make_source(source_spec), dict(winner_config(results), epochs=epochs), out_dir, workers=workers)
+
+
+# ==== MAIN ====
+def main():
+    parser = argparse.ArgumentParser(description="Parallel DeepRNN hyperparameter search with median pruning.")
+    source_group = parser.add_mutually_exclusive_group(required=True)
+    source_group.add_argument("--files", nargs="+", help="CSV shard paths or glob patterns")
+    source_group.add_argument("--mongo", action="store_true", help="stream hydration_data")
+    parser.add_argument("--mongo-uri", default=None, help="default: HYDRA_MONGO_URI")
+    parser.add_argument("--client-side", action="store_true", help="--mongo: parse documents on the client")
+    parser.add_argument("--trials", type=int, default=None, help="configs sampled from the grid (default: all)")
+    parser.add_argument("--workers", type=int, default=None, help="concurrent trials (default: all cores)")
+    parser.add_argument("--epochs", type=int, default=SEARCH_EPOCHS, help="max epochs per trial")
+    parser.add_argument("--seed", type=int, default=DEFAULT_CONFIG["seed"], help="trial sampling seed")
+    parser.add_argument("--results", default=RESULTS_PATH)
+    parser.add_argument("--export", default=None, help="retrain the winner and write its artifacts here")
+    args = parser.parse_args()
+
+    source_spec = ({"files": args.files} if args.files
+                   else {"mongo_uri": args.mongo_uri, "server_side": not args.client_side})
+    configs = sample_configs(SEARCH_SPACE, args.trials, args.seed)
+    print(f"🔎 {len(configs)} trials, up to {args.epochs} epochs each")
+    start = time.perf_counter()
+    results = search(source_spec, configs, args.workers, args.epochs)
+    elapsed = time.perf_counter() - start
+    results.to_csv(args.results, index=False)
+
+    pruned = int((results["status"] == "pruned").sum())
+    print(f"\n⏱️ {len(results)} trials in {elapsed:.1f}s ({pruned} pruned); table saved to {args.results}")
+    print(results.head(10).to_string(index=False, float_format=lambda v: f"{v:.4g}"))
+    print("\n🏆 Winner model_config:")
+    print(json.dumps(winner_model_config(results), indent=2))
+    if args.export:
+        result = export_winner(results, source_spec, args.export)
+        print(f"💾 Winner retrained: test RMSE {result['test']['RMSE']:.4f}; artifacts in {args.export}")
+
+
+if __name__ == "__main__":
+    main()
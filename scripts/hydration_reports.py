@@ -0,0 +1,285 @@
+# scripts/hydration_reports.py
+"""
+Bulk per-subject hydration report rendering.
+
+Takes a predictions table (CSV or the `predictions` collection written by
+scripts/batch_scoring.py) and renders one hydration visual per subject in
+a process pool. Every worker runs headless (Agg) and keeps its own
+render-once template (visualization_utils.get_viz_renderer), so a render
+is a redraw of the dynamic parts only. Each chunk can also be stitched
+into one multi-page PDF inside the worker that rendered it; the PNG data
+is embedded as-is (PngPdfWriter), so stitching costs no re-encoding.
+
+Usage:
+    python -m scripts.hydration_reports --predictions preds.csv --out reports/
+    python -m scripts.hydration_reports --from-mongo --pdf --no-png --workers 8
+"""
+import argparse
+import math
+import multiprocessing
+import os
+import struct
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+
+# ==== CONFIGURATION ====
+IMAGE_PATH = "assets/bodywater_by_age.jpg"
+OUT_DIR = Path("reports")
+# subjects per task; with --pdf this is also the number of pages per PDF
+CHUNK_SIZE = 250
+REPORT_COLUMNS = ["Subject_ID", "Gender", "Age", "initial_weight_kg", "predicted_loss_kg"]
+# accepted alternative column names in a predictions CSV
+_COLUMN_ALIASES = {"Initial_Weight_kg": "initial_weight_kg", "prediction": "predicted_loss_kg",
+                   "predicted": "predicted_loss_kg", "gender": "Gender", "age": "Age"}
+
+
+# ==== INPUT ====
+def normalize_predictions(df: pd.DataFrame) -> pd.DataFrame:
+    """Rename known aliases, check the required columns and drop unrenderable rows."""
+    df = df.rename(columns={k: v for k, v in _COLUMN_ALIASES.items() if k in df.columns and v not in df.columns})
+    missing = [c for c in REPORT_COLUMNS if c not in df.columns]
+    if missing:
+        raise ValueError(f"Predictions table is missing columns: {missing}")
+    df = df[REPORT_COLUMNS].copy()
+    df["Gender"] = df["Gender"].fillna("").astype(str)
+    for col in ("Age", "initial_weight_kg", "predicted_loss_kg"):
+        df[col] = pd.to_numeric(df[col], errors="coerce")
+    renderable = df[["Age", "initial_weight_kg", "predicted_loss_kg"]].notna().all(axis=1) & (df["initial_weight_kg"] > 0)
+    dropped = int((~renderable).sum())
+    if dropped:
+        print(f"⚠️ Skipping {dropped} rows without age, initial weight or prediction")
+    return df[renderable].reset_index(drop=True)
+
+
+def load_predictions_from_mongo(db, model_version: Optional[str] = None, mode: str = "eager") -> pd.DataFrame:
+    """
+    Join one model version's predictions with Age/Gender from hydration_data.
+    model_version defaults to the version batch_scoring writes for the
+    current artifacts in this serving mode, so each subject appears once.
+    """
+    from scripts.batch_scoring import COLL_HYDRATION, COLL_PREDICTIONS
+
+    if not model_version:
+        from scripts.model_registry import get_model_version
+        model_version = get_model_version(mode=mode)
+    pipeline = [
+        {"$match": {"model_version": model_version}},
+        {"$lookup": {"from": COLL_HYDRATION, "localField": "Subject_ID", "foreignField": "Subject_ID", "as": "_s"}},
+        {"$unwind": "$_s"},
+        {"$project": {
+            "_id": 0,
+            "Subject_ID": 1,
+            "Gender": {"$ifNull": ["$_s.Gender", "$_s.gender"]},
+            "Age": {"$ifNull": ["$_s.Age", "$_s.age"]},
+            "initial_weight_kg": 1,
+            "predicted_loss_kg": 1,
+        }},
+    ]
+    return pd.DataFrame(list(db[COLL_PREDICTIONS].aggregate(pipeline)), columns=REPORT_COLUMNS)
+
+
+# ==== PDF ====
+class PngPdfWriter:
+    """
+    Streams PNG pages into a PDF without decoding or re-encoding them.
+    An 8-bit non-interlaced RGB/grayscale PNG's IDAT data is a valid PDF
+    FlateDecode stream (PNG predictors), so each page costs one file
+    write and memory stays flat however many pages a file has.
+    """
+
+    def __init__(self, path, dpi: int = 150):
+        self.path = path
+        self.dpi = dpi
+        self._f = open(path, "wb")
+        self._offsets = {}
+        self._page_ids = []
+        self._next_id = 3  # 1 = catalog, 2 = page tree (written on close)
+        self._f.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def _write_object(self, obj_id: int, body: bytes, stream: bytes = None):
+        self._offsets[obj_id] = self._f.tell()
+        self._f.write(b"%d 0 obj\n" % obj_id + body)
+        if stream is not None:
+            self._f.write(b"\nstream\n" + stream + b"\nendstream")
+        self._f.write(b"\nendobj\n")
+
+    @staticmethod
+    def _parse_png(png_bytes: bytes):
+        if png_bytes[:8] != b"\x89PNG\r\n\x1a\n":
+            raise ValueError("not a PNG")
+        pos, idat, header = 8, [], None
+        while pos < len(png_bytes):
+            length, kind = struct.unpack(">I4s", png_bytes[pos:pos + 8])
+            data = png_bytes[pos + 8:pos + 8 + length]
+            if kind == b"IHDR":
+                header = struct.unpack(">IIBBBBB", data)
+            elif kind == b"IDAT":
+                idat.append(data)
+            pos += 12 + length
+        width, height, depth, color_type, _, _, interlace = header
+        if depth != 8 or interlace or color_type not in (0, 2):
+            raise ValueError("only 8-bit non-interlaced RGB/grayscale PNGs can be embedded")
+        return width, height, (3 if color_type == 2 else 1), b"".join(idat)
+
+    def add_png(self, png_bytes: bytes):
+        width, height, colors, data = self._parse_png(png_bytes)
+        image_id, content_id, page_id = self._next_id, self._next_id + 1, self._next_id + 2
+        self._next_id += 3
+
+        self._write_object(image_id, (
+            b"<< /Type /XObject /Subtype /Image /Width %d /Height %d /ColorSpace /%s /BitsPerComponent 8 "
+            b"/Filter /FlateDecode /DecodeParms << /Predictor 15 /Colors %d /BitsPerComponent 8 /Columns %d >> "
+            b"/Length %d >>" % (width, height, b"DeviceRGB" if colors == 3 else b"DeviceGray", colors, width, len(data))
+        ), data)
+        w_pt, h_pt = width * 72.0 / self.dpi, height * 72.0 / self.dpi
+        content = b"q %.2f 0 0 %.2f 0 0 cm /Im0 Do Q" % (w_pt, h_pt)
+        self._write_object(content_id, b"<< /Length %d >>" % len(content), content)
+        self._write_object(page_id, (
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %.2f %.2f] "
+            b"/Resources << /XObject << /Im0 %d 0 R >> >> /Contents %d 0 R >>" % (w_pt, h_pt, image_id, content_id)
+        ))
+        self._page_ids.append(page_id)
+
+    def close(self):
+        kids = b" ".join(b"%d 0 R" % i for i in self._page_ids)
+        self._write_object(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+        self._write_object(2, b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(self._page_ids)))
+        xref = self._f.tell()
+        self._f.write(b"xref\n0 %d\n0000000000 65535 f \n" % self._next_id)
+        for obj_id in range(1, self._next_id):
+            self._f.write(b"%010d 00000 n \n" % self._offsets[obj_id])
+        self._f.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (self._next_id, xref))
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# ==== WORKER ====
+def _init_worker():
+    # headless: must be set before pyplot is imported in this process
+    os.environ["MPLBACKEND"] = "Agg"
+    import matplotlib
+    matplotlib.use("Agg")
+
+
+def _subject_label(subject_id) -> str:
+    # CSV round-trips turn integer IDs into floats
+    if isinstance(subject_id, float) and subject_id.is_integer():
+        return str(int(subject_id))
+    return str(subject_id)
+
+
+def render_chunk(rows: List[Dict[str, Any]], out_dir: str, image_path: str = IMAGE_PATH,
+                 png: bool = True, pdf_path: Optional[str] = None) -> Dict[str, Any]:
+    """Render one chunk of subjects: PNG files and/or one multi-page PDF."""
+    from scripts.visualization_utils import get_viz_renderer
+
+    renderer = get_viz_renderer(image_path)
+    out_dir = Path(out_dir)
+    pdf = PngPdfWriter(pdf_path, dpi=renderer.dpi) if pdf_path else None
+    try:
+        for row in rows:
+            png_bytes, _ = renderer.render(row["initial_weight_kg"], row["predicted_loss_kg"],
+                                           int(row["Age"]), row["Gender"])
+            if png:
+                (out_dir / f"subject_{_subject_label(row['Subject_ID'])}.png").write_bytes(png_bytes)
+            if pdf is not None:
+                pdf.add_png(png_bytes)
+    finally:
+        if pdf is not None:
+            pdf.close()
+    return {"rendered": len(rows), "pdf": pdf_path}
+
+
+# ==== DRIVER ====
+def render_reports(predictions: pd.DataFrame, out_dir=OUT_DIR, workers: Optional[int] = None,
+                   chunk_size: int = CHUNK_SIZE, image_path: str = IMAGE_PATH,
+                   png: bool = True, pdf: bool = False) -> Dict[str, Any]:
+    """
+    Render every row of the predictions table across a process pool.
+    Returns stats (rendered, pdfs, seconds, images_per_sec).
+    """
+    if not (png or pdf):
+        raise ValueError("Nothing to write: enable png and/or pdf")
+    predictions = normalize_predictions(predictions)
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+
+    records = predictions.to_dict("records")
+    n_chunks = math.ceil(len(records) / chunk_size)
+    width = len(str(max(n_chunks, 1)))
+    tasks = []
+    for i in range(n_chunks):
+        pdf_path = str(out_dir / f"hydration_report_{i + 1:0{width}d}.pdf") if pdf else None
+        tasks.append((records[i * chunk_size:(i + 1) * chunk_size], str(out_dir), image_path, png, pdf_path))
+
+    total = len(records)
+    done, pdfs = 0, []
+    start = time.perf_counter()
+    # spawn: fresh interpreters, so the Agg backend is selected before pyplot loads
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_init_worker) as pool:
+        futures = [pool.submit(render_chunk, *task) for task in tasks]
+        for fut in as_completed(futures):
+            res = fut.result()
+            done += res["rendered"]
+            if res["pdf"]:
+                pdfs.append(res["pdf"])
+            elapsed = time.perf_counter() - start
+            print(f"  … {done}/{total} subjects rendered ({done / elapsed:,.1f} images/s)")
+
+    elapsed = time.perf_counter() - start
+    return {
+        "rendered": done,
+        "pdfs": sorted(pdfs),
+        "workers": workers,
+        "seconds": elapsed,
+        "images_per_sec": done / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+# ==== MAIN ====
+def main():
+    parser = argparse.ArgumentParser(description="Render per-subject hydration reports in parallel.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--predictions", help="CSV with Subject_ID, Gender, Age, initial_weight_kg, predicted_loss_kg")
+    source.add_argument("--from-mongo", action="store_true", help="read the predictions collection")
+    parser.add_argument("--model-version", default=None,
+                        help="with --from-mongo: predictions of this model version (default: the current model)")
+    parser.add_argument("--mode", default=os.environ.get("HYDRA_MODEL_MODE", "eager"),
+                        help="with --from-mongo: serving mode whose current version is the default")
+    parser.add_argument("--mongo-uri", default=None)
+    parser.add_argument("--out", default=str(OUT_DIR))
+    parser.add_argument("--workers", type=int, default=None, help="process pool size (default: all cores)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="subjects per task / pages per PDF")
+    parser.add_argument("--image-path", default=IMAGE_PATH)
+    parser.add_argument("--pdf", action="store_true", help="also write multi-page PDFs (one per chunk)")
+    parser.add_argument("--no-png", action="store_true", help="skip the per-subject PNG files")
+    args = parser.parse_args()
+
+    if args.from_mongo:
+        from scripts.mongo_client import get_db
+
+        predictions = load_predictions_from_mongo(get_db(uri=args.mongo_uri), args.model_version, args.mode)
+    else:
+        predictions = pd.read_csv(args.predictions)
+
+    stats = render_reports(predictions, args.out, args.workers, args.chunk_size, args.image_path,
+                           png=not args.no_png, pdf=args.pdf)
+    print(f"✅ Rendered {stats['rendered']} reports on {stats['workers']} workers in {stats['seconds']:.1f}s "
+          f"({stats['images_per_sec']:,.1f} images/s) → {args.out}")
+    for path in stats["pdfs"]:
+        print(f"📁 {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# scripts/inference_client.py
+"""
+Stdlib-only client for scripts/inference_server.py.
+
+Each thread keeps its own keep-alive connection, so one client object can
+be shared by a whole thread pool (dashboard sessions, load tests).
+
+    from scripts.inference_client import InferenceClient
+    client = InferenceClient("http://127.0.0.1:8765")
+    loss_kg = client.predict({"Gender": "male", "Age": 24, ...})
+"""
+import http.client
+import json
+import math
+import threading
+from typing import Any, Dict, List, Sequence
+from urllib.parse import urlsplit
+
+DEFAULT_URL = "http://127.0.0.1:8765"
+TIMEOUT_S = 30.0
+
+
+class InferenceError(RuntimeError):
+    """The server rejected a request or could not be reached."""
+
+
+def _jsonable(features: Dict[str, Any]) -> Dict[str, Any]:
+    # NaN is not valid JSON; missing values travel as null
+    out = {}
+    for name, value in features.items():
+        if hasattr(value, "item"):
+            value = value.item()  # numpy scalars
+        if isinstance(value, float) and math.isnan(value):
+            value = None
+        out[name] = value
+    return out
+
+
+class InferenceClient:
+    def __init__(self, url: str = DEFAULT_URL, timeout: float = TIMEOUT_S):
+        parts = urlsplit(url)
+        self.host = parts.hostname or "127.0.0.1"
+        self.port = parts.port or 80
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self) -> http.client.HTTPConnection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            self._local.conn = conn
+        return conn
+
+    def _request(self, method: str, path: str, payload: Any = None) -> Dict[str, Any]:
+        body = json.dumps(payload).encode() if payload is not None else None
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+        for attempt in range(2):
+            conn = self._connection()
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                resp = conn.getresponse()
+                data = json.loads(resp.read() or b"{}")
+                break
+            except (http.client.HTTPException, ConnectionError, OSError) as e:
+                # the server may have dropped an idle keep-alive connection: reconnect once
+                conn.close()
+                self._local.conn = None
+                if attempt:
+                    raise InferenceError(f"inference server unreachable at {self.host}:{self.port}: {e}") from e
+        if resp.status != 200:
+            raise InferenceError(f"HTTP {resp.status}: {data.get('error', data)}")
+        return data
+
+    def predict(self, features: Dict[str, Any]) -> float:
+        """Predicted water loss (kg) for one subject's 8 FEATURES."""
+        return float(self._request("POST", "/predict", {"features": _jsonable(features)})["prediction"])
+
+    def predict_many(self, rows: Sequence[Dict[str, Any]]) -> List[float]:
+        """Predictions for several subjects in one request (rows are still batched server-side)."""
+        data = self._request("POST", "/predict", {"instances": [_jsonable(r) for r in rows]})
+        return [float(p) for p in data["predictions"]]
+
+    def health(self) -> Dict[str, Any]:
+        return self._request("GET", "/health")
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
@@ -0,0 +1,150 @@
+# scripts/inference_loadtest.py
+"""
+Closed-loop load test for scripts/inference_server.py on one machine.
+
+Each of N client threads sends single-subject /predict requests back to
+back (rows cycled from the CSV) and the run reports throughput, latency
+percentiles and the server's average batch size per concurrency level.
+Without --url a server is started as a subprocess on a free port and
+stopped at the end, so client threads and the model do not share a GIL.
+
+Usage:
+    python -m scripts.inference_loadtest --concurrency 1,8,32 --requests 2000
+    python -m scripts.inference_loadtest --url http://127.0.0.1:8765 --json results.json
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+import pandas as pd
+
+from scripts.inference_client import InferenceClient, InferenceError
+from scripts.model_inference import FEATURES
+
+CSV_PATH = os.path.join("data", "formatted_hydration_data.csv")
+STARTUP_TIMEOUT_S = 60.0
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(port: int, max_batch_size: int, max_wait_ms: float, mode: str) -> subprocess.Popen:
+    """Launch the server in a subprocess and wait until /health answers."""
+    proc = subprocess.Popen([sys.executable, "-m", "scripts.inference_server", "--port", str(port), "--mode", mode,
+                             "--max-batch-size", str(max_batch_size), "--max-wait-ms", str(max_wait_ms)])
+    client = InferenceClient(f"http://127.0.0.1:{port}", timeout=2)
+    deadline = time.time() + STARTUP_TIMEOUT_S
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"inference server exited with code {proc.returncode}")
+        try:
+            client.health()
+            return proc
+        except InferenceError:
+            time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError("inference server did not start in time")
+
+
+def run_level(client: InferenceClient, rows: List[Dict[str, Any]], concurrency: int, n_requests: int) -> Dict[str, Any]:
+    """n_requests single-row predictions spread over `concurrency` closed-loop threads."""
+    before = client.health()
+    latencies: List[float] = []
+    errors = [0]
+    lock = threading.Lock()
+    counter = iter(range(n_requests))
+
+    def worker():
+        local = []
+        for i in counter:  # next() on a range iterator is atomic under the GIL
+            row = rows[i % len(rows)]
+            start = time.perf_counter()
+            try:
+                client.predict(row)
+                local.append(time.perf_counter() - start)
+            except InferenceError:
+                with lock:
+                    errors[0] += 1
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    after = client.health()
+
+    lat_ms = np.array(latencies) * 1e3
+    batches = after["batches"] - before["batches"]
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors[0],
+        "elapsed_s": elapsed,
+        "throughput_rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": float(np.percentile(lat_ms, 50)) if len(lat_ms) else None,
+        "p95_ms": float(np.percentile(lat_ms, 95)) if len(lat_ms) else None,
+        "p99_ms": float(np.percentile(lat_ms, 99)) if len(lat_ms) else None,
+        "avg_batch": (after["requests"] - before["requests"]) / batches if batches else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test for the micro-batching inference server.")
+    parser.add_argument("--url", default=None, help="existing server (default: start one locally)")
+    parser.add_argument("--csv", default=CSV_PATH, help="feature rows to cycle through")
+    parser.add_argument("--concurrency", default="1,8,32", help="comma-separated client thread counts")
+    parser.add_argument("--requests", type=int, default=2000, help="requests per concurrency level")
+    parser.add_argument("--max-batch-size", type=int, default=256, help="for the locally started server")
+    parser.add_argument("--max-wait-ms", type=float, default=5.0, help="for the locally started server")
+    parser.add_argument("--mode", default="eager", help="for the locally started server")
+    parser.add_argument("--json", default=None, help="also write the results to this file")
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.csv)
+    rows = df[FEATURES].to_dict(orient="records")
+    levels = [int(c) for c in args.concurrency.split(",") if c.strip()]
+
+    proc = None
+    url = args.url
+    if url is None:
+        port = _free_port()
+        proc = start_server(port, args.max_batch_size, args.max_wait_ms, args.mode)
+        url = f"http://127.0.0.1:{port}"
+
+    results = []
+    try:
+        client = InferenceClient(url)
+        client.predict(rows[0])  # warm-up
+        print(f"{'conc':>5} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'avg batch':>10} {'errors':>7}")
+        for level in levels:
+            r = run_level(client, rows, level, args.requests)
+            results.append(r)
+            print(f"{r['concurrency']:>5} {r['throughput_rps']:>9.1f} {r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f} "
+                  f"{r['p99_ms']:>8.2f} {r['avg_batch']:>10.1f} {r['errors']:>7}")
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=10)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"url": url, "results": results}, f, indent=2)
+        print(f"✅ Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,372 @@
+# scripts/inference_server.py
+"""
+Local micro-batching inference server (stdlib HTTP) for the DeepRNN or any
+model exported by scripts/model_zoo.py.
+
+Single-subject requests are queued and coalesced into one batched
+forward: a batch closes when `max_wait_ms` has passed since its first
+request or when it reaches `max_batch_size` rows. Under concurrency many
+requests share one forward instead of queueing behind each other, and
+every client (dashboard, scripts) shares one warm model loaded through
+scripts/model_registry.py.
+
+Endpoints:
+    POST /predict   {"features": {...8 FEATURES...}}         -> {"prediction": float, "model_version": str}
+                    {"instances": [{...}, {...}]}            -> {"predictions": [...], "model_version": str}
+    GET  /health                                             -> status, model version, batching and shadow stats
+    GET  /metrics, /metrics.json                             -> per-stage latency (with --metrics, see scripts/metrics.py)
+
+Usage:
+    python -m scripts.inference_server --port 8765 --max-wait-ms 5 --max-batch-size 256
+    python -m scripts.inference_server --model deeprnn --shadow ridge    # candidate scored off the request path
+    (client: scripts/inference_client.py, load test: scripts/inference_loadtest.py)
+"""
+import argparse
+import json
+import math
+import os
+import queue
+import random
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+
+from scripts import metrics
+from scripts.model_inference import FEATURES, predict_batch
+from scripts.model_registry import PRIMARY_MODEL, get_named_model, get_named_model_version
+
+# ==== CONFIGURATION ====
+HOST = "127.0.0.1"
+PORT = 8765
+MAX_BATCH_SIZE = 256
+MAX_WAIT_MS = 5.0
+REQUEST_TIMEOUT_S = 30.0
+MAX_BODY_BYTES = 1 << 20
+# batches waiting for the shadow model; when it falls behind, batches are dropped, never waited for
+SHADOW_QUEUE_SIZE = 64
+
+
+# ==== INPUT VALIDATION ====
+def coerce_features(obj: Any) -> Dict[str, Any]:
+    """
+    One request row -> FEATURES dict. Missing numeric values (absent, null)
+    become NaN and are imputed by the preprocessor; anything non-numeric
+    is rejected with ValueError.
+    """
+    if not isinstance(obj, dict):
+        raise ValueError("features must be a JSON object")
+    unknown = set(obj) - set(FEATURES)
+    if unknown:
+        raise ValueError(f"unknown features: {sorted(unknown)}")
+    row = {"Gender": obj.get("Gender")}
+    if row["Gender"] is not None and not isinstance(row["Gender"], str):
+        raise ValueError("Gender must be a string or null")
+    for name in FEATURES[1:]:
+        value = obj.get(name)
+        if value is None:
+            row[name] = math.nan
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            row[name] = float(value)
+        else:
+            raise ValueError(f"{name} must be a number or null, got {value!r}")
+    return row
+
+
+# ==== SHADOW SCORING ====
+class ShadowScorer:
+    """
+    Scores the primary's batches with a candidate model on its own thread.
+    The batcher hands over a batch only after the primary's results are
+    delivered and never blocks on it (a full queue drops the batch), so the
+    candidate adds no latency to responses; /health reports how far its
+    predictions are from the primary's. The candidate still shares the
+    CPU: sample_rate < 1 scores only that fraction of batches.
+    """
+
+    def __init__(self, name: str, mode: str = "eager", sample_rate: float = 1.0, queue_size: int = SHADOW_QUEUE_SIZE):
+        if not 0 < sample_rate <= 1:
+            raise ValueError(f"sample_rate must be in (0, 1], got {sample_rate}")
+        self.name = name
+        self.mode = mode
+        self.sample_rate = sample_rate
+        self._queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self.stats = {"batches": 0, "rows": 0, "skipped_batches": 0, "dropped_batches": 0, "errors": 0, "busy_s": 0.0,
+                      "sum_abs_diff": 0.0, "max_abs_diff": 0.0, "sum_diff": 0.0}
+        get_named_model(name, mode=mode)
+        self.model_version = get_named_model_version(name, mode=mode)
+        self._thread = threading.Thread(target=self._run, name="shadow-scorer", daemon=True)
+        self._thread.start()
+
+    def offer(self, df: pd.DataFrame, primary_preds):
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            with self._lock:
+                self.stats["skipped_batches"] += 1
+            return
+        try:
+            self._queue.put_nowait((df, primary_preds))
+        except queue.Full:
+            with self._lock:
+                self.stats["dropped_batches"] += 1
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                df, primary_preds = self._queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            start = time.perf_counter()
+            try:
+                with metrics.stage("shadow"):
+                    model, preproc, feat_per_step, seq_len, device = get_named_model(self.name, mode=self.mode)
+                    preds = predict_batch(df, model, preproc, feat_per_step, seq_len, device, batch_size=len(df))
+                self.model_version = get_named_model_version(self.name, mode=self.mode)
+                diff = preds - primary_preds
+                with self._lock:
+                    self.stats["batches"] += 1
+                    self.stats["rows"] += len(diff)
+                    self.stats["sum_abs_diff"] += float(abs(diff).sum())
+                    self.stats["sum_diff"] += float(diff.sum())
+                    self.stats["max_abs_diff"] = max(self.stats["max_abs_diff"], float(abs(diff).max()))
+            except Exception:
+                with self._lock:
+                    self.stats["errors"] += 1
+            with self._lock:
+                self.stats["busy_s"] += time.perf_counter() - start
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.stats)
+        rows = stats.pop("rows")
+        sum_abs, sum_diff = stats.pop("sum_abs_diff"), stats.pop("sum_diff")
+        return {"model": self.name, "model_version": self.model_version, "rows": rows,
+                "mean_abs_diff": sum_abs / rows if rows else None,
+                "mean_diff": sum_diff / rows if rows else None,
+                "queued": self._queue.qsize(), **stats}
+
+    def close(self):
+        self._stop.set()
+        self._thread.join(timeout=1)
+
+
+# ==== MICRO-BATCHER ====
+class MicroBatcher:
+    """Queue of single rows scored by one background thread in coalesced batches."""
+
+    def __init__(self, mode: str = "eager", max_batch_size: int = MAX_BATCH_SIZE, max_wait_ms: float = MAX_WAIT_MS,
+                 model: str = PRIMARY_MODEL, shadow: Optional[str] = None, shadow_sample: float = 1.0):
+        if max_batch_size <= 0:
+            raise ValueError(f"max_batch_size must be positive, got {max_batch_size}")
+        self.mode = mode
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait_s = max_wait_ms / 1e3
+        self._queue: "queue.Queue" = queue.Queue()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "batches": 0, "max_batch": 0, "errors": 0, "busy_s": 0.0}
+        # load once up front so the first request does not pay for it
+        get_named_model(model, mode=mode)
+        self.model_version = get_named_model_version(model, mode=mode)
+        self.shadow = ShadowScorer(shadow, mode, shadow_sample) if shadow else None
+        self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, row: Dict[str, Any]) -> Future:
+        fut: Future = Future()
+        self._queue.put((row, fut))
+        return fut
+
+    def _collect(self) -> List:
+        first = self._queue.get(timeout=0.1)
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait_s
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                # after the window, rows that are already queued still join without waiting
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                batch = self._collect()
+            except queue.Empty:
+                continue
+            start = time.perf_counter()
+            try:
+                with metrics.request("batch"):
+                    model, preproc, feat_per_step, seq_len, device = get_named_model(self.model, mode=self.mode)
+                    df = pd.DataFrame([row for row, _ in batch], columns=FEATURES)
+                    preds = predict_batch(df, model, preproc, feat_per_step, seq_len, device, batch_size=len(df))
+                self.model_version = get_named_model_version(self.model, mode=self.mode)
+                for (_, fut), pred in zip(batch, preds):
+                    fut.set_result(float(pred))
+                if self.shadow is not None:
+                    # after the responses are released; offer() never blocks
+                    self.shadow.offer(df, preds)
+            except Exception as e:
+                with self._lock:
+                    self.stats["errors"] += 1
+                for _, fut in batch:
+                    fut.set_exception(e)
+            with self._lock:
+                self.stats["requests"] += len(batch)
+                self.stats["batches"] += 1
+                self.stats["max_batch"] = max(self.stats["max_batch"], len(batch))
+                self.stats["busy_s"] += time.perf_counter() - start
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.stats)
+        stats["avg_batch"] = stats["requests"] / stats["batches"] if stats["batches"] else 0.0
+        stats["queued"] = self._queue.qsize()
+        return stats
+
+    def close(self):
+        self._stop.set()
+        self._thread.join(timeout=1)
+        if self.shadow is not None:
+            self.shadow.close()
+
+
+# ==== HTTP ====
+class InferenceHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive for clients that reuse connections
+    # headers and body are separate writes; with Nagle + delayed ACK each response would stall ~40 ms
+    disable_nagle_algorithm = True
+    batcher: Optional[MicroBatcher] = None
+    quiet = True
+
+    def log_message(self, format, *args):
+        if not self.quiet:
+            super().log_message(format, *args)
+
+    def _send(self, status: int, body: bytes, content_type: str):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status: int, payload: Dict[str, Any]):
+        self._send(status, json.dumps(payload).encode(), "application/json")
+
+    def do_GET(self):
+        if self.path == "/metrics":
+            self._send(200, metrics.prometheus_text().encode(), "text/plain; version=0.0.4")
+            return
+        if self.path == "/metrics.json":
+            self._send_json(200, dict(metrics.snapshot(), slow_profiles=metrics.slow_profiles()))
+            return
+        if self.path != "/health":
+            self._send_json(404, {"error": f"unknown path {self.path}"})
+            return
+        shadow = self.batcher.shadow.snapshot() if self.batcher.shadow is not None else None
+        self._send_json(200, {"ok": True, "model": self.batcher.model, "mode": self.batcher.mode,
+                              "model_version": self.batcher.model_version,
+                              "max_batch_size": self.batcher.max_batch_size,
+                              "max_wait_ms": self.batcher.max_wait_s * 1e3, **self.batcher.snapshot(),
+                              "shadow": shadow})
+
+    def do_POST(self):
+        if self.path != "/predict":
+            self._send_json(404, {"error": f"unknown path {self.path}"})
+            return
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY_BYTES:
+            self.close_connection = True  # the unread body would corrupt the next request
+            self._send_json(413, {"error": "request body too large"})
+            return
+        try:
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            if "instances" in payload:
+                if not isinstance(payload["instances"], list):
+                    raise ValueError("instances must be a list")
+                rows = [coerce_features(obj) for obj in payload["instances"]]
+            elif "features" in payload:
+                rows = [coerce_features(payload["features"])]
+            else:
+                raise ValueError("expected 'features' or 'instances'")
+        except (ValueError, TypeError, AttributeError) as e:
+            self._send_json(400, {"error": str(e)})
+            return
+
+        try:
+            with metrics.request("http_predict"):
+                futures = [self.batcher.submit(row) for row in rows]
+                preds = [fut.result(timeout=REQUEST_TIMEOUT_S) for fut in futures]
+        except Exception as e:
+            self._send_json(500, {"error": f"prediction failed: {e}"})
+            return
+        if "instances" in payload:
+            self._send_json(200, {"predictions": preds, "model_version": self.batcher.model_version})
+        else:
+            self._send_json(200, {"prediction": preds[0], "model_version": self.batcher.model_version})
+
+
+class InferenceHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128  # listen backlog; the default 5 drops connection bursts
+
+
+def make_server(host: str = HOST, port: int = PORT, mode: str = "eager", max_batch_size: int = MAX_BATCH_SIZE,
+                max_wait_ms: float = MAX_WAIT_MS, quiet: bool = True, model: str = PRIMARY_MODEL,
+                shadow: Optional[str] = None, shadow_sample: float = 1.0) -> InferenceHTTPServer:
+    """Build (but do not start) a server; server.batcher is its MicroBatcher."""
+    batcher = MicroBatcher(mode, max_batch_size, max_wait_ms, model, shadow, shadow_sample)
+    handler = type("BoundInferenceHandler", (InferenceHandler,), {"batcher": batcher, "quiet": quiet})
+    server = InferenceHTTPServer((host, port), handler)
+    server.batcher = batcher
+    return server
+
+
+# ==== MAIN ====
+def main():
+    parser = argparse.ArgumentParser(description="Micro-batching DeepRNN inference server.")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--mode", default=os.environ.get("HYDRA_MODEL_MODE", "eager"),
+                        help="serving mode: eager | scripted | quantized | onnx")
+    parser.add_argument("--model", default=os.environ.get("HYDRA_MODEL", PRIMARY_MODEL),
+                        help=f"'{PRIMARY_MODEL}' or an exported model from scripts/model_zoo.py")
+    parser.add_argument("--shadow", default=os.environ.get("HYDRA_SHADOW_MODEL"),
+                        help="candidate model scored alongside the primary (GET /health -> shadow)")
+    parser.add_argument("--shadow-sample", type=float, default=1.0, help="fraction of batches the shadow scores")
+    parser.add_argument("--max-batch-size", type=int, default=MAX_BATCH_SIZE)
+    parser.add_argument("--max-wait-ms", type=float, default=MAX_WAIT_MS)
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    parser.add_argument("--metrics", action="store_true", help="collect per-stage latency (GET /metrics)")
+    parser.add_argument("--profile-slow-ms", type=float, default=None,
+                        help="with --metrics: keep stack samples of batches slower than this")
+    args = parser.parse_args()
+    if args.metrics:
+        metrics.enable(slow_ms=args.profile_slow_ms)
+
+    server = make_server(args.host, args.port, args.mode, args.max_batch_size, args.max_wait_ms,
+                         quiet=not args.verbose, model=args.model, shadow=args.shadow,
+                         shadow_sample=args.shadow_sample)
+    print(f"✅ Serving {args.model} ({args.mode}, version={server.batcher.model_version}) on http://{args.host}:{args.port} "
+          f"(batch ≤ {args.max_batch_size}, window {args.max_wait_ms} ms)")
+    if server.batcher.shadow is not None:
+        print(f"👥 Shadow-scoring {args.shadow} (version={server.batcher.shadow.model_version})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.batcher.close()
+        print("\n🔒 Server stopped.")
+
+
+if __name__ == "__main__":
+    main()
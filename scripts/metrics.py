@@ -0,0 +1,260 @@
+# scripts/metrics.py
+"""
+Per-stage latency metrics for the prediction path.
+
+    with stage("forward"):            # time one stage into a histogram
+        ...
+    with request("predict"):          # one end-to-end request (+ slow-request profiling)
+        ...
+    inc("predictions", 1)             # plain counter
+
+Stages used by the pipeline: fetch, parse (mongo_ml_pipeline), transform,
+tensor, forward (model_inference), viz (visualization_utils).
+
+Metrics are off unless HYDRA_METRICS=1 (or enable() is called); when off,
+stage()/request() return a shared no-op context manager, so the hooks cost
+one global lookup and an empty with-block.
+
+Exports: prometheus_text() (text exposition format) and snapshot() (JSON-
+ready dict with count/sum/mean and bucket-estimated p50/p95/p99).
+
+Slow-request profiling (opt-in, HYDRA_PROFILE_SLOW_MS=<ms>): while a
+request() is open a background thread samples its stack every
+PROFILE_INTERVAL_S; requests slower than the threshold keep their
+collapsed-stack sample counts in slow_profiles() (last PROFILE_KEEP).
+"""
+import bisect
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager, nullcontext
+from typing import Any, Dict, List, Optional
+
+# ==== CONFIGURATION ====
+# histogram upper bounds in seconds (Prometheus "le" buckets; +Inf is implicit)
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PROFILE_INTERVAL_S = 0.002
+PROFILE_KEEP = 20
+PROFILE_STACK_DEPTH = 40
+PREFIX = "hydra"
+
+_ENABLED = os.environ.get("HYDRA_METRICS", "") not in ("", "0", "false", "False")
+_SLOW_MS: Optional[float] = float(os.environ["HYDRA_PROFILE_SLOW_MS"]) if os.environ.get("HYDRA_PROFILE_SLOW_MS") else None
+_NOOP = nullcontext()
+_LOCK = threading.Lock()
+
+
+# ==== HISTOGRAM ====
+class Histogram:
+    """Cumulative-bucket latency histogram (seconds)."""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds: float):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimate from the buckets (linear within the bucket, like Prometheus histogram_quantile)."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, c in enumerate(self.counts):
+            if seen + c >= rank and c:
+                lo = self.buckets[i - 1] if i > 0 else 0.0
+                hi = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+                return lo + (hi - lo) * (rank - seen) / c
+            seen += c
+        return self.buckets[-1]
+
+
+_STAGES: Dict[str, Histogram] = {}
+_REQUESTS: Dict[str, Histogram] = {}
+_COUNTERS: Counter = Counter()
+
+
+def _observe(table: Dict[str, Histogram], name: str, seconds: float):
+    with _LOCK:
+        hist = table.get(name)
+        if hist is None:
+            hist = table[name] = Histogram()
+        hist.observe(seconds)
+
+
+# ==== SWITCHES ====
+def enable(slow_ms: Optional[float] = None):
+    """Turn metrics on; slow_ms also turns on slow-request profiling."""
+    global _ENABLED, _SLOW_MS
+    _ENABLED = True
+    if slow_ms is not None:
+        _SLOW_MS = slow_ms
+
+
+def disable():
+    global _ENABLED, _SLOW_MS
+    _ENABLED = False
+    _SLOW_MS = None
+
+
+def is_enabled() -> bool:
+    return _ENABLED
+
+
+def reset():
+    """Clear all histograms, counters and stored profiles."""
+    with _LOCK:
+        _STAGES.clear()
+        _REQUESTS.clear()
+        _COUNTERS.clear()
+        _SLOW_PROFILES.clear()
+
+
+# ==== HOOKS ====
+@contextmanager
+def _timed_stage(name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _observe(_STAGES, name, time.perf_counter() - start)
+
+
+def stage(name: str):
+    """Context manager timing one pipeline stage (no-op while metrics are disabled)."""
+    if not _ENABLED:
+        return _NOOP
+    return _timed_stage(name)
+
+
+def inc(name: str, value: float = 1):
+    if _ENABLED:
+        with _LOCK:
+            _COUNTERS[name] += value
+
+
+# ==== SLOW-REQUEST PROFILER ====
+_SLOW_PROFILES: deque = deque(maxlen=PROFILE_KEEP)
+_ACTIVE: Dict[int, Counter] = {}  # thread id -> collapsed stack -> samples
+_SAMPLER: Optional[threading.Thread] = None
+
+
+def _collapse(frame) -> str:
+    parts = []
+    while frame is not None and len(parts) < PROFILE_STACK_DEPTH:
+        code = frame.f_code
+        parts.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}")
+        frame = frame.f_back
+    return ";".join(reversed(parts))
+
+
+def _sample_loop():
+    while True:
+        time.sleep(PROFILE_INTERVAL_S)
+        with _LOCK:
+            if not _ACTIVE:
+                continue
+            frames = sys._current_frames()
+            for tid, samples in _ACTIVE.items():
+                frame = frames.get(tid)
+                if frame is not None:
+                    samples[_collapse(frame)] += 1
+
+
+def _ensure_sampler():
+    global _SAMPLER
+    with _LOCK:
+        if _SAMPLER is None or not _SAMPLER.is_alive():
+            _SAMPLER = threading.Thread(target=_sample_loop, name="hydra-metrics-sampler", daemon=True)
+            _SAMPLER.start()
+
+
+@contextmanager
+def _timed_request(name: str):
+    slow_ms = _SLOW_MS
+    profile = slow_ms is not None
+    tid = threading.get_ident()
+    if profile:
+        _ensure_sampler()
+        with _LOCK:
+            _ACTIVE[tid] = Counter()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        _observe(_REQUESTS, name, elapsed)
+        if profile:
+            with _LOCK:
+                samples = _ACTIVE.pop(tid, Counter())
+                if elapsed * 1e3 >= slow_ms:
+                    _SLOW_PROFILES.append({"request": name, "duration_ms": elapsed * 1e3, "at": time.time(),
+                                           "samples": dict(samples.most_common())})
+
+
+def request(name: str = "predict"):
+    """Context manager for one end-to-end request (no-op while metrics are disabled)."""
+    if not _ENABLED:
+        return _NOOP
+    return _timed_request(name)
+
+
+def slow_profiles() -> List[Dict[str, Any]]:
+    """Stored profiles of slow requests, oldest first (collapsed stack -> sample count)."""
+    with _LOCK:
+        return list(_SLOW_PROFILES)
+
+
+# ==== EXPORT ====
+def _summary(hist: Histogram) -> Dict[str, Any]:
+    return {
+        "count": hist.count,
+        "sum_s": hist.sum,
+        "mean_ms": hist.sum / hist.count * 1e3 if hist.count else None,
+        "p50_ms": (hist.quantile(0.50) or 0) * 1e3 if hist.count else None,
+        "p95_ms": (hist.quantile(0.95) or 0) * 1e3 if hist.count else None,
+        "p99_ms": (hist.quantile(0.99) or 0) * 1e3 if hist.count else None,
+    }
+
+
+def snapshot() -> Dict[str, Any]:
+    """JSON-ready view of every stage, request and counter."""
+    with _LOCK:
+        return {
+            "enabled": _ENABLED,
+            "stages": {name: _summary(h) for name, h in sorted(_STAGES.items())},
+            "requests": {name: _summary(h) for name, h in sorted(_REQUESTS.items())},
+            "counters": dict(_COUNTERS),
+            "slow_profiles": len(_SLOW_PROFILES),
+        }
+
+
+def _prometheus_histogram(lines: List[str], metric: str, label: str, table: Dict[str, Histogram]):
+    lines.append(f"# TYPE {metric} histogram")
+    for name, hist in sorted(table.items()):
+        cumulative = 0
+        for bound, c in zip(hist.buckets + (float("inf"),), hist.counts):
+            cumulative += c
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(f'{metric}_bucket{{{label}="{name}",le="{le}"}} {cumulative}')
+        lines.append(f'{metric}_sum{{{label}="{name}"}} {hist.sum!r}')
+        lines.append(f'{metric}_count{{{label}="{name}"}} {hist.count}')
+
+
+def prometheus_text() -> str:
+    """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+    lines: List[str] = []
+    with _LOCK:
+        _prometheus_histogram(lines, f"{PREFIX}_stage_latency_seconds", "stage", _STAGES)
+        _prometheus_histogram(lines, f"{PREFIX}_request_latency_seconds", "request", _REQUESTS)
+        for name, value in sorted(_COUNTERS.items()):
+            lines.append(f"# TYPE {PREFIX}_{name}_total counter")
+            lines.append(f"{PREFIX}_{name}_total {value}")
+    return "\n".join(lines) + "\n"
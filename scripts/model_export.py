@@ -0,0 +1,207 @@
+# scripts/model_export.py
+"""
+Export the trained DeepRNN into its serving variants and report parity.
+
+    scripted  - TorchScript (torch.jit.script) of the eager DeepRNN
+    quantized - int8 dynamic quantization, traced to TorchScript. torch has
+                no dynamically quantized kernel for nn.RNN, so the recurrence
+                is unrolled over nn.RNNCell layers (same weights), which are
+                quantized together with the Linear head.
+    onnx      - ONNX graph for onnxruntime (needs `onnx` to export and
+                `onnxruntime` to serve)
+
+Usage:
+    python -m scripts.model_export                 # scripted + quantized (+ onnx if available) and report
+    python -m scripts.model_export --report-only   # re-run the parity report
+"""
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import torch
+import torch.nn as nn
+
+from scripts.model_inference import (
+    MODEL_DIR,
+    MODEL_CHECKPOINT,
+    PREPROC_PATH,
+    FEATURES,
+    SERVING_MODES,
+    load_model_and_preproc,
+    serving_artifact_path,
+    _forward,
+    _to_sequences,
+)
+
+DEFAULT_CSV = Path("data") / "formatted_hydration_data.csv"
+TEST_PREDICTIONS_PATH = MODEL_DIR / "test_predictions.csv"
+PARITY_REPORT_PATH = MODEL_DIR / "serving_parity_report.csv"
+TARGET = "TARGET_True_Water_Loss_kg"
+# must match the notebook's train_test_split
+TEST_SIZE = 0.2
+SEED = 42
+
+
+class UnrolledDeepRNN(nn.Module):
+    """DeepRNN with the nn.RNN stack expressed as per-layer nn.RNNCell (quantizable)."""
+
+    def __init__(self, model):
+        super().__init__()
+        rnn = model.rnn
+        self.hidden_size = rnn.hidden_size
+        self.cells = nn.ModuleList()
+        for l in range(rnn.num_layers):
+            cell = nn.RNNCell(rnn.input_size if l == 0 else rnn.hidden_size, rnn.hidden_size, nonlinearity="tanh")
+            cell.load_state_dict({
+                "weight_ih": getattr(rnn, f"weight_ih_l{l}").detach().clone(),
+                "weight_hh": getattr(rnn, f"weight_hh_l{l}").detach().clone(),
+                "bias_ih": getattr(rnn, f"bias_ih_l{l}").detach().clone(),
+                "bias_hh": getattr(rnn, f"bias_hh_l{l}").detach().clone(),
+            })
+            self.cells.append(cell)
+        self.fc = model.fc
+
+    def forward(self, x):
+        seq = x
+        for cell in self.cells:
+            h = x.new_zeros((x.shape[0], self.hidden_size))
+            outs = []
+            for t in range(seq.shape[1]):
+                h = cell(seq[:, t], h)
+                outs.append(h)
+            seq = torch.stack(outs, dim=1)
+        return self.fc(h)
+
+
+class OnnxDeepRNN:
+    """onnxruntime session behind the predict_sequences engine interface."""
+
+    def __init__(self, onnx_path):
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise ImportError("onnxruntime is required for mode='onnx' (pip install onnxruntime)") from e
+        self.session = ort.InferenceSession(str(onnx_path), providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def predict_sequences(self, Xseq: np.ndarray) -> np.ndarray:
+        out = self.session.run(None, {self.input_name: np.asarray(Xseq, dtype=np.float32)})[0]
+        return out.reshape(-1)
+
+
+def export_serving_models(model_path=MODEL_CHECKPOINT, preproc_path=PREPROC_PATH, onnx=True):
+    """Write the scripted, quantized and (optionally) ONNX variants next to the checkpoint."""
+    model, _, feat_per_step, seq_len, _ = load_model_and_preproc(model_path, preproc_path, torch.device("cpu"))
+    example = torch.zeros((2, seq_len, feat_per_step), dtype=torch.float32)
+    written = []
+
+    path = serving_artifact_path("scripted", model_path)
+    torch.jit.save(torch.jit.script(model), str(path))
+    written.append(path)
+
+    quantized = torch.ao.quantization.quantize_dynamic(
+        UnrolledDeepRNN(model).eval(), {nn.RNNCell, nn.Linear}, dtype=torch.qint8
+    )
+    path = serving_artifact_path("quantized", model_path)
+    with torch.no_grad():
+        torch.jit.save(torch.jit.trace(quantized, example), str(path))
+    written.append(path)
+
+    if onnx:
+        path = serving_artifact_path("onnx", model_path)
+        try:
+            torch.onnx.export(model, example, str(path), input_names=["x"], output_names=["y"],
+                              dynamic_axes={"x": {0: "batch"}, "y": {0: "batch"}}, dynamo=False)
+            written.append(path)
+        except Exception as e:
+            print(f"⚠️ ONNX export skipped: {e}")
+
+    for path in written:
+        print(f"📁 Exported {path} ({path.stat().st_size / 1024:.0f} KiB)")
+    return written
+
+
+def _test_split(csv_path) -> pd.DataFrame:
+    from sklearn.model_selection import train_test_split
+
+    df = pd.read_csv(csv_path)
+    _, test_df = train_test_split(df, test_size=TEST_SIZE, random_state=SEED)
+    return test_df
+
+
+def _time_per_call(fn, n: int) -> float:
+    fn()  # warm-up
+    start = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - start) / n * 1e3
+
+
+def parity_report(csv_path=DEFAULT_CSV, reference_path=TEST_PREDICTIONS_PATH,
+                  model_path=MODEL_CHECKPOINT, preproc_path=PREPROC_PATH) -> pd.DataFrame:
+    """
+    Score the notebook's held-out test split with every available serving
+    mode. Each mode is compared with the eager forward (serving parity) and
+    with the predictions stored in test_predictions.csv at training time.
+    """
+    test_df = _test_split(csv_path)
+    reference = pd.read_csv(reference_path)
+    if len(reference) != len(test_df):
+        raise ValueError(f"Reference has {len(reference)} rows but the test split has {len(test_df)}")
+    ref_pred = reference["predicted"].to_numpy(dtype=np.float64)
+    actual = test_df[TARGET].to_numpy(dtype=np.float64)
+
+    rows = []
+    eager_pred = None
+    for mode in SERVING_MODES:
+        path = serving_artifact_path(mode, model_path)
+        if not path.exists():
+            print(f"⚠️ Skipping '{mode}': {path} not found")
+            continue
+        try:
+            model, preproc, feat_per_step, seq_len, device = load_model_and_preproc(
+                model_path, preproc_path, mode=mode)
+        except ImportError as e:
+            print(f"⚠️ Skipping '{mode}': {e}")
+            continue
+        Xseq = _to_sequences(preproc.transform(test_df[FEATURES]), feat_per_step, seq_len)
+        pred = _forward(model, Xseq, device)
+        if mode == "eager":
+            eager_pred = pred
+        one = Xseq[:1]
+        rows.append({
+            "mode": mode,
+            "n": len(pred),
+            "max_abs_diff_vs_eager": float(np.max(np.abs(pred - eager_pred))) if eager_pred is not None else np.nan,
+            "max_abs_diff_vs_reference": float(np.max(np.abs(pred - ref_pred))),
+            "rmse": float(np.sqrt(np.mean((pred - actual) ** 2))),
+            "mae": float(np.mean(np.abs(pred - actual))),
+            "single_row_ms": _time_per_call(lambda: _forward(model, one, device), 200),
+            "batch_ms": _time_per_call(lambda: _forward(model, Xseq, device), 50),
+            "file_kib": path.stat().st_size / 1024,
+        })
+    return pd.DataFrame(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export DeepRNN serving variants and write a parity report.")
+    parser.add_argument("--report-only", action="store_true")
+    parser.add_argument("--no-onnx", action="store_true")
+    parser.add_argument("--csv", default=str(DEFAULT_CSV))
+    parser.add_argument("--out", default=str(PARITY_REPORT_PATH))
+    args = parser.parse_args()
+
+    if not args.report_only:
+        export_serving_models(onnx=not args.no_onnx)
+
+    report = parity_report(args.csv)
+    report.to_csv(args.out, index=False)
+    print("\n📊 Serving mode parity report:")
+    print(report.to_string(index=False, float_format="{:.6f}".format))
+    print(f"📁 Saved report to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,37 @@
 # stdin_infer.py
 import pickle
 from pathlib import Path
+from typing import Iterable, Iterator, Union
 import numpy as np
 import pandas as pd
-import torch
-import torch.nn as nn
 
-MODEL_DIR = Path(r"model\deeprnn_artifacts")
+from scripts.metrics import inc, stage
+
+try:
+    import torch
+    import torch.nn as nn
+except ImportError:  # torch-free workers serve through scripts/numpy_rnn.py
+    torch = None
+    nn = None
+
+MODEL_DIR = Path("model") / "deeprnn_artifacts"
 MODEL_CHECKPOINT = MODEL_DIR / "deep_rnn_state_dict.pt"
 PREPROC_PATH = MODEL_DIR / "preprocessor.pkl"
-DEVICE = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+# serving modes selectable in load_model_and_preproc; exported files live next to the checkpoint
+# (see scripts/model_export.py)
+SERVING_FILES = {
+    "scripted": "deep_rnn_scripted.pt",
+    "quantized": "deep_rnn_quantized.pt",
+    "onnx": "deep_rnn.onnx",
+    "bundle": "deep_rnn.bundle",
+}
+SERVING_MODES = ("eager",) + tuple(SERVING_FILES)
+if torch is not None:
+    DEVICE = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+else:
+    DEVICE = "cpu"
+# rows per batched forward in predict_batch
+DEFAULT_BATCH_SIZE = 1024
 
 # make sure these match training FEATURES order
 FEATURES = [
@@ -24,7 +46,7 @@ FEATURES = [
 ]
 
 # Define model class exactly as used during training
-class DeepRNN(nn.Module):
+class DeepRNN(nn.Module if nn is not None else object):
     def __init__(self, input_size, hidden_size=128, num_layers=3, dropout=0.3):
         super().__init__()
         self.rnn = nn.RNN(input_size=input_size,
@@ -43,11 +65,38 @@ class DeepRNN(nn.Module):
         last_hidden = h_n[-1]
         return self.fc(last_hidden)
 
-def load_model_and_preproc(model_path=MODEL_CHECKPOINT, preproc_path=PREPROC_PATH, device=DEVICE):
+def serving_artifact_path(mode: str, model_path=MODEL_CHECKPOINT) -> Path:
+    """File backing a serving mode ("eager" is the checkpoint itself)."""
+    if mode not in SERVING_MODES:
+        raise ValueError(f"Unknown serving mode '{mode}', expected one of {SERVING_MODES}")
+    model_path = Path(model_path)
+    return model_path if mode == "eager" else model_path.parent / SERVING_FILES[mode]
+
+def load_model_and_preproc(model_path=MODEL_CHECKPOINT, preproc_path=PREPROC_PATH, device=DEVICE, mode="eager"):
+    """
+    Load the DeepRNN and the fitted preprocessor.
+    mode selects the serving variant: "eager" (DeepRNN from the state dict),
+    "scripted" (TorchScript), "quantized" (int8 dynamic quantization, CPU
+    only), "onnx" (onnxruntime) or "bundle" (memory-mapped NumPy engine,
+    needs neither torch nor pickle). Non-eager files are produced by
+    `python -m scripts.model_export` and `python -m scripts.artifact_bundle`.
+    """
+    if mode == "bundle":
+        from scripts.artifact_bundle import load_bundle
+        return load_bundle(serving_artifact_path(mode, model_path))
+    if torch is None:
+        raise ImportError("torch is required to load the DeepRNN checkpoint; "
+                          "use scripts.numpy_rnn.load_numpy_model_and_preproc for torch-free inference")
+    serving_path = serving_artifact_path(mode, model_path)
     if not model_path.exists():
         raise FileNotFoundError(f"Model checkpoint not found: {model_path}")
     if not preproc_path.exists():
         raise FileNotFoundError(f"Preprocessor not found: {preproc_path}")
+    if not serving_path.exists():
+        raise FileNotFoundError(f"Exported '{mode}' model not found: {serving_path} (run `python -m scripts.model_export`)")
+    if mode in ("quantized", "onnx"):
+        # quantized kernels and onnxruntime's CPU provider run on CPU only
+        device = torch.device("cpu")
 
     ckpt = torch.load(model_path, map_location=device)
     cfg = ckpt.get("model_config", {})
@@ -58,10 +107,18 @@ def load_model_and_preproc(model_path=MODEL_CHECKPOINT, preproc_path=PREPROC_PAT
     feat_per_step = ckpt.get("feat_per_step", None)
     seq_len = ckpt.get("seq_len", None) or 4
 
-    model = DeepRNN(input_size=input_size, hidden_size=hidden_size, num_layers=num_layers, dropout=dropout)
-    model.load_state_dict(ckpt["model_state_dict"])
-    model.to(device)
-    model.eval()
+    if mode == "eager":
+        model = DeepRNN(input_size=input_size, hidden_size=hidden_size, num_layers=num_layers, dropout=dropout)
+        model.load_state_dict(ckpt["model_state_dict"])
+        model.to(device)
+    elif mode == "onnx":
+        from scripts.model_export import OnnxDeepRNN
+        model = OnnxDeepRNN(serving_path)
+    else:
+        model = torch.jit.load(str(serving_path), map_location=device)
+    del ckpt
+    if hasattr(model, "eval"):
+        model.eval()
 
     with open(preproc_path, "rb") as f:
         preproc = pickle.load(f)
@@ -103,9 +160,8 @@ def read_features_from_stdin():
     df = pd.DataFrame([vals], columns=FEATURES)
     return df
 
-def preprocess_and_predict(df_input: pd.DataFrame, model, preproc, feat_per_step, seq_len, device=DEVICE):
-    # transform with preprocessor
-    Xpr = preproc.transform(df_input[FEATURES])
+def _to_sequences(Xpr: np.ndarray, feat_per_step: int, seq_len: int) -> np.ndarray:
+    """Pad/trim preprocessed features to feat_per_step * seq_len and reshape to (N, seq_len, feat_per_step)."""
     # ensure divisible and pad zeros if needed
     n_features = Xpr.shape[1]
     needed = feat_per_step * seq_len
@@ -115,15 +171,88 @@ def preprocess_and_predict(df_input: pd.DataFrame, model, preproc, feat_per_step
     elif n_features > needed:
         # trim extra columns (training used [:feat_per_step*seq_len])
         Xpr = Xpr[:, :needed]
+    return Xpr.reshape(-1, seq_len, feat_per_step)
+
+def _forward(model, Xseq: np.ndarray, device=DEVICE) -> np.ndarray:
+    """Run the model on (N, seq_len, feat_per_step) sequences and return the flat predictions."""
+    if hasattr(model, "predict_sequences"):
+        # torch-free engines (scripts/numpy_rnn.py) take NumPy input directly
+        with stage("forward"):
+            return model.predict_sequences(Xseq)
+    with stage("tensor"):
+        Xt = torch.tensor(Xseq, dtype=torch.float32).to(device)
+    with stage("forward"), torch.no_grad():
+        return model(Xt).cpu().numpy().reshape(-1)
 
-    Xseq = Xpr.reshape(-1, seq_len, feat_per_step)
-    Xt = torch.tensor(Xseq, dtype=torch.float32).to(device)
-    with torch.no_grad():
-        pred = model(Xt).cpu().numpy().flatten()[0]
+def _transform_to_sequences(df: pd.DataFrame, preproc, feat_per_step: int, seq_len: int) -> np.ndarray:
+    with stage("transform"):
+        Xpr = preproc.transform(df[FEATURES])
+    with stage("tensor"):
+        return _to_sequences(Xpr, feat_per_step, seq_len)
+
+def preprocess_and_predict(df_input: pd.DataFrame, model, preproc, feat_per_step, seq_len, device=DEVICE):
+    # transform with preprocessor
+    Xseq = _transform_to_sequences(df_input, preproc, feat_per_step, seq_len)
+    pred = _forward(model, Xseq, device)[0]
+    inc("predictions")
     return float(pred)
 
+def _iter_batches(data: Union[pd.DataFrame, Iterable[pd.DataFrame]], batch_size: int) -> Iterator[pd.DataFrame]:
+    """
+    Yield frames of exactly batch_size rows (the last one may be shorter).
+    Accepts a single DataFrame or any iterable of DataFrames; small frames
+    from an iterator are coalesced so every forward runs on a full batch.
+    """
+    if isinstance(data, pd.DataFrame):
+        for start in range(0, len(data), batch_size):
+            yield data.iloc[start:start + batch_size]
+        return
+
+    pending, n_pending = [], 0
+    for frame in data:
+        if len(frame) == 0:
+            continue
+        pending.append(frame)
+        n_pending += len(frame)
+        if n_pending < batch_size:
+            continue
+        merged = pd.concat(pending, ignore_index=True) if len(pending) > 1 else pending[0]
+        start = 0
+        while n_pending - start >= batch_size:
+            yield merged.iloc[start:start + batch_size]
+            start += batch_size
+        pending = [merged.iloc[start:]] if start < n_pending else []
+        n_pending -= start
+    if n_pending:
+        yield pd.concat(pending, ignore_index=True) if len(pending) > 1 else pending[0]
+
+def predict_batch(data: Union[pd.DataFrame, Iterable[pd.DataFrame]], model, preproc, feat_per_step, seq_len,
+                  device=DEVICE, batch_size: int = DEFAULT_BATCH_SIZE) -> np.ndarray:
+    """
+    Batched counterpart of preprocess_and_predict.
+    Scores an N-row DataFrame (or an iterator of DataFrames) with one
+    transform + forward per chunk of batch_size rows and returns a float
+    array of N predictions aligned with the input row order.
+    """
+    if batch_size <= 0:
+        raise ValueError(f"batch_size must be positive, got {batch_size}")
+
+    preds = []
+    for batch in _iter_batches(data, batch_size):
+        Xseq = _transform_to_sequences(batch, preproc, feat_per_step, seq_len)
+        preds.append(_forward(model, Xseq, device))
+        inc("predictions", len(batch))
+        inc("batches")
+    if not preds:
+        return np.empty(0, dtype=np.float64)
+    return np.concatenate(preds).astype(np.float64)
+
 def main():
-    model, preproc, feat_per_step, seq_len, device = load_model_and_preproc()
+    if torch is None:
+        from scripts.numpy_rnn import load_numpy_model_and_preproc
+        model, preproc, feat_per_step, seq_len, device = load_numpy_model_and_preproc()
+    else:
+        model, preproc, feat_per_step, seq_len, device = load_model_and_preproc()
     print(f"Loaded model (feat_per_step={feat_per_step}, seq_len={seq_len}) on device={device}\n")
     df_input = read_features_from_stdin()
     try:
@@ -0,0 +1,163 @@
+# scripts/model_registry.py
+"""
+Process-wide registry of loaded DeepRNN artifact sets (and, by name, the
+alternative regressors exported by scripts/model_zoo.py).
+
+Each (checkpoint, preprocessor, device) combination is loaded once per
+process and shared by every caller (Streamlit sessions, reruns, CLI
+helpers). Before handing out a cached entry the registry stats both
+files; the artifacts are only reloaded when the mtime/size changed *and*
+the content hash differs, so a plain `touch` does not trigger a reload.
+"""
+import hashlib
+import threading
+from pathlib import Path
+from typing import Any, Dict, Tuple
+
+from scripts.model_inference import (
+    MODEL_CHECKPOINT,
+    PREPROC_PATH,
+    DEVICE,
+    load_model_and_preproc,
+    serving_artifact_path,
+)
+from scripts.fast_preprocessor import CompiledPreprocessor, compile_preprocessor
+
+# name of the DeepRNN in get_named_model; any other name is looked up in the model zoo
+PRIMARY_MODEL = "deeprnn"
+_LOCK = threading.Lock()
+_ENTRIES: Dict[Tuple[str, ...], Dict[str, Any]] = {}
+
+
+def _file_signature(path: Path) -> Tuple[int, int]:
+    st = path.stat()
+    return st.st_mtime_ns, st.st_size
+
+
+def file_sha256(path: Path, chunk_size: int = 1 << 20) -> str:
+    """Hex SHA-256 of a file's content."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def artifact_version(model_path=MODEL_CHECKPOINT, preproc_path=PREPROC_PATH, *extra_paths) -> str:
+    """
+    Short content hash identifying a checkpoint + preprocessor pair
+    (plus any exported serving file, which changes the predictions).
+    """
+    h = hashlib.sha256()
+    for path in (model_path, preproc_path) + extra_paths:
+        h.update(file_sha256(Path(path)).encode())
+    return h.hexdigest()[:16]
+
+
+def _registry_key(model_path, preproc_path, device, fast_preproc, mode) -> Tuple[str, ...]:
+    return (str(Path(model_path).resolve()), str(Path(preproc_path).resolve()), str(device),
+            str(bool(fast_preproc)), mode)
+
+
+def _get_entry(model_path, preproc_path, device, fast_preproc=True, mode="eager") -> Dict[str, Any]:
+    model_path, preproc_path = Path(model_path), Path(preproc_path)
+    serving_path = serving_artifact_path(mode, model_path)
+    if mode == "bundle":
+        # self-contained: the checkpoint and pickle need not be deployed
+        paths = (serving_path,)
+    else:
+        paths = (model_path, preproc_path) + (() if mode == "eager" else (serving_path,))
+
+    def version():
+        if mode == "bundle":
+            from scripts.artifact_bundle import bundle_version
+            return bundle_version(serving_path)  # content hash stored in the header
+        return artifact_version(*paths)
+
+    return _cached_entry(_registry_key(model_path, preproc_path, device, fast_preproc, mode), paths, version,
+                         lambda: load_model_and_preproc(model_path, preproc_path, device, mode=mode),
+                         fast_preproc, f"{mode} model", model_path.parent)
+
+
+def _cached_entry(key, paths, version_fn, load_fn, fast_preproc, label, source) -> Dict[str, Any]:
+    """Shared cache logic: reload only when the files' signature and content version changed."""
+    for path in paths:
+        if not Path(path).exists():
+            raise FileNotFoundError(f"Model artifact not found: {path}")
+    signature = tuple(_file_signature(Path(p)) for p in paths)
+
+    # fast path: unchanged files, no locking
+    entry = _ENTRIES.get(key)
+    if entry is not None and entry["signature"] == signature:
+        return entry
+
+    with _LOCK:
+        entry = _ENTRIES.get(key)
+        if entry is not None and entry["signature"] == signature:
+            return entry
+
+        version = version_fn()
+        if entry is not None and entry["version"] == version:
+            # mtime moved but content is identical -> keep the loaded model
+            entry["signature"] = signature
+            return entry
+
+        artifacts = load_fn()
+        if fast_preproc and not isinstance(artifacts[1], CompiledPreprocessor):
+            model, preproc, feat_per_step, seq_len, dev = artifacts
+            artifacts = (model, compile_preprocessor(preproc), feat_per_step, seq_len, dev)
+        entry = {"signature": signature, "version": version, "artifacts": artifacts}
+        _ENTRIES[key] = entry
+        print(f"✅ Loaded {label} artifacts (version={version}) from {source}")
+        return entry
+
+
+def get_model_and_preproc(model_path=MODEL_CHECKPOINT, preproc_path=PREPROC_PATH, device=DEVICE,
+                          fast_preproc: bool = True, mode: str = "eager"):
+    """
+    Cached drop-in for load_model_and_preproc.
+    Returns the same (model, preproc, feat_per_step, seq_len, device) tuple,
+    loading the artifacts only on first use or after the files changed.
+    With fast_preproc the sklearn preprocessor is replaced by its compiled
+    NumPy equivalent (identical output, see scripts/fast_preprocessor.py).
+    mode is passed through to load_model_and_preproc (eager/scripted/quantized/onnx/bundle).
+    The returned model is shared, so callers must treat it as read-only.
+    """
+    return _get_entry(model_path, preproc_path, device, fast_preproc, mode)["artifacts"]
+
+
+def get_model_version(model_path=MODEL_CHECKPOINT, preproc_path=PREPROC_PATH, device=DEVICE,
+                      fast_preproc: bool = True, mode: str = "eager") -> str:
+    """Content-hash version of the artifacts currently served for these paths."""
+    return _get_entry(model_path, preproc_path, device, fast_preproc, mode)["version"]
+
+
+def get_named_model(name: str = PRIMARY_MODEL, mode: str = "eager", fast_preproc: bool = True):
+    """
+    Cached (model, preproc, feat_per_step, seq_len, device) for any servable
+    model: PRIMARY_MODEL is the DeepRNN in the given serving mode, every
+    other name is an exported alternative from scripts/model_zoo.py.
+    All of them score through model_inference.predict_batch.
+    """
+    return _named_entry(name, mode, fast_preproc)["artifacts"]
+
+
+def get_named_model_version(name: str = PRIMARY_MODEL, mode: str = "eager", fast_preproc: bool = True) -> str:
+    return _named_entry(name, mode, fast_preproc)["version"]
+
+
+def _named_entry(name, mode, fast_preproc) -> Dict[str, Any]:
+    if name == PRIMARY_MODEL:
+        return _get_entry(MODEL_CHECKPOINT, PREPROC_PATH, DEVICE, fast_preproc, mode)
+    from scripts.model_zoo import ZOO_DIR, load_zoo_model, zoo_artifact_paths
+
+    paths = zoo_artifact_paths(name)
+    return _cached_entry(("zoo", str(Path(ZOO_DIR).resolve()), name, str(bool(fast_preproc))), paths,
+                         lambda: artifact_version(*paths), lambda: load_zoo_model(name),
+                         fast_preproc, f"'{name}' model", ZOO_DIR)
+
+
+def clear_registry():
+    """Drop every cached artifact set (next access reloads from disk)."""
+    with _LOCK:
+        _ENTRIES.clear()
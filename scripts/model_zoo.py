@@ -0,0 +1,410 @@
+# scripts/model_zoo.py
+"""
+Alternative regressors from model/NoSQL_Project.ipynb, exported so they
+can be served next to the DeepRNN.
+
+    sklearn: linear, ridge, random_forest, mlp   (fit on the flat preprocessed features)
+    torch:   basic_rnn, bi_rnn, gru, lstm, attention_rnn, residual_rnn
+             (fit on the same zero-padded (N, seq_len, feat_per_step) sequences as the DeepRNN)
+
+Every model is trained on the notebook's train split with the notebook's
+hyperparameters and a preprocessor fitted the way the notebook fits it
+(model/zoo/preprocessor.pkl). All of them take the 8 FEATURES and score
+through model_inference.predict_batch:
+sklearn estimators are wrapped in SklearnRegressor (a predict_sequences
+engine, like the NumPy DeepRNN), the RNN variants are plain nn.Modules.
+Exports live in model/zoo/ with a manifest.json; load them by name with
+model_registry.get_named_model(name).
+
+Usage:
+    python -m scripts.model_zoo --export                 # train + export every alternative
+    python -m scripts.model_zoo --export --only ridge,gru
+    python -m scripts.model_zoo --report --max-rmse 0.12 # latency/accuracy on the held-out test split
+    python -m scripts.model_zoo --list
+"""
+import argparse
+import json
+import pickle
+import random
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from scripts.model_inference import MODEL_DIR, FEATURES, predict_batch, _to_sequences
+
+try:
+    import torch
+    import torch.nn as nn
+except ImportError:  # sklearn models still load without torch
+    torch = None
+    nn = None
+
+# ==== CONFIGURATION ====
+ZOO_DIR = MODEL_DIR.parent / "zoo"
+MANIFEST_NAME = "manifest.json"
+ZOO_PREPROC_NAME = "preprocessor.pkl"
+DEFAULT_CSV = Path("data") / "formatted_hydration_data.csv"
+ZOO_REPORT_PATH = ZOO_DIR / "zoo_report.csv"
+TARGET = "TARGET_True_Water_Loss_kg"
+# notebook settings: train_test_split(test_size=0.2, random_state=42), seq_len 4
+TEST_SIZE = 0.2
+SEED = 42
+SEQ_LEN = 4
+RNN_EPOCHS = 20
+RNN_LR = 1e-3
+RNN_BATCH_SIZE = 16
+SKLEARN_MODELS = ("linear", "ridge", "random_forest", "mlp")
+TORCH_MODELS = ("basic_rnn", "bi_rnn", "gru", "lstm", "attention_rnn", "residual_rnn")
+
+
+def _sklearn_estimator(name: str):
+    from sklearn.ensemble import RandomForestRegressor
+    from sklearn.linear_model import LinearRegression, Ridge
+    from sklearn.neural_network import MLPRegressor
+
+    return {
+        "linear": lambda: LinearRegression(),
+        "ridge": lambda: Ridge(alpha=1.0),
+        "random_forest": lambda: RandomForestRegressor(n_estimators=200, random_state=SEED),
+        "mlp": lambda: MLPRegressor(hidden_layer_sizes=(64, 32), max_iter=1000, random_state=SEED),
+    }[name]()
+
+
+# ==== ENGINES ====
+class SklearnRegressor:
+    """
+    sklearn estimator behind the sequence interface of _forward: the
+    (N, seq_len, feat_per_step) input is flattened back to the first
+    n_features preprocessed columns (dropping the zero padding).
+    """
+
+    def __init__(self, estimator, n_features: int):
+        self.estimator = estimator
+        self.n_features = n_features
+
+    def predict_sequences(self, Xseq: np.ndarray) -> np.ndarray:
+        X = np.asarray(Xseq, dtype=np.float64).reshape(len(Xseq), -1)[:, :self.n_features]
+        return np.asarray(self.estimator.predict(X), dtype=np.float64).reshape(-1)
+
+
+_Module = nn.Module if nn is not None else object
+
+
+# notebook architectures (hidden 64), same layer names as in the notebook
+class BasicRNN(_Module):
+    def __init__(self, input_size, hidden_size=64):
+        super().__init__()
+        self.rnn = nn.RNN(input_size, hidden_size, batch_first=True)
+        self.fc = nn.Linear(hidden_size, 1)
+
+    def forward(self, x):
+        _, h = self.rnn(x)
+        return self.fc(h[-1])
+
+
+class BiRNN(_Module):
+    def __init__(self, input_size, hidden_size=64):
+        super().__init__()
+        self.rnn = nn.RNN(input_size, hidden_size, batch_first=True, bidirectional=True)
+        self.fc = nn.Linear(hidden_size * 2, 1)
+
+    def forward(self, x):
+        _, h = self.rnn(x)
+        return self.fc(torch.cat((h[-2], h[-1]), dim=1))
+
+
+class GRURegressor(_Module):
+    def __init__(self, input_size, hidden_size=64):
+        super().__init__()
+        self.gru = nn.GRU(input_size, hidden_size, batch_first=True)
+        self.fc = nn.Linear(hidden_size, 1)
+
+    def forward(self, x):
+        _, h = self.gru(x)
+        return self.fc(h[-1])
+
+
+class LSTMRegressor(_Module):
+    def __init__(self, input_size, hidden_size=64):
+        super().__init__()
+        self.lstm = nn.LSTM(input_size, hidden_size, batch_first=True)
+        self.fc = nn.Linear(hidden_size, 1)
+
+    def forward(self, x):
+        _, (h, _) = self.lstm(x)
+        return self.fc(h[-1])
+
+
+class AttentionRNN(_Module):
+    def __init__(self, input_size, hidden_size=64):
+        super().__init__()
+        self.rnn = nn.RNN(input_size, hidden_size, batch_first=True)
+        self.attn = nn.MultiheadAttention(embed_dim=hidden_size, num_heads=4, batch_first=True)
+        self.fc = nn.Linear(hidden_size, 1)
+
+    def forward(self, x):
+        out, _ = self.rnn(x)
+        attn_out, _ = self.attn(out, out, out)
+        return self.fc(attn_out.mean(dim=1))
+
+
+class ResidualRNN(_Module):
+    def __init__(self, input_size, hidden_size=64):
+        super().__init__()
+        self.rnn1 = nn.RNN(input_size, hidden_size, batch_first=True)
+        self.rnn2 = nn.RNN(hidden_size, hidden_size, batch_first=True)
+        self.fc = nn.Linear(hidden_size, 1)
+
+    def forward(self, x):
+        out1, _ = self.rnn1(x)
+        out2, _ = self.rnn2(out1)
+        return self.fc((out1 + out2).mean(dim=1))
+
+
+ARCHITECTURES = {
+    "basic_rnn": BasicRNN,
+    "bi_rnn": BiRNN,
+    "gru": GRURegressor,
+    "lstm": LSTMRegressor,
+    "attention_rnn": AttentionRNN,
+    "residual_rnn": ResidualRNN,
+}
+
+
+# ==== MANIFEST ====
+def read_manifest(zoo_dir=ZOO_DIR) -> Dict[str, Dict[str, Any]]:
+    """{name: entry} of every exported model ({} when nothing was exported yet)."""
+    path = Path(zoo_dir) / MANIFEST_NAME
+    if not path.exists():
+        return {}
+    with open(path) as f:
+        return json.load(f)["models"]
+
+
+def _write_manifest(models: Dict[str, Dict[str, Any]], zoo_dir=ZOO_DIR):
+    path = Path(zoo_dir) / MANIFEST_NAME
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump({"models": models}, f, indent=2, sort_keys=True)
+    tmp_path.replace(path)
+
+
+def zoo_artifact_paths(name: str, zoo_dir=ZOO_DIR) -> tuple:
+    """(model file, preprocessor) backing an exported model; these version it in the registry."""
+    manifest = read_manifest(zoo_dir)
+    if name not in manifest:
+        known = ", ".join(sorted(manifest)) or "none (run `python -m scripts.model_zoo --export`)"
+        raise KeyError(f"Unknown model '{name}'; exported models: {known}")
+    entry = manifest[name]
+    return Path(zoo_dir) / entry["file"], Path(zoo_dir) / entry["preprocessor"]
+
+
+# ==== LOAD ====
+def load_zoo_model(name: str, zoo_dir=ZOO_DIR):
+    """
+    Same return shape as load_model_and_preproc:
+    (model, preproc, feat_per_step, seq_len, device).
+    """
+    entry = read_manifest(zoo_dir)[name]
+    model_path, preproc_path = zoo_artifact_paths(name, zoo_dir)
+    if entry["kind"] == "sklearn":
+        with open(model_path, "rb") as f:
+            model = SklearnRegressor(pickle.load(f), int(entry["n_features"]))
+        device = "cpu"
+    else:
+        if torch is None:
+            raise ImportError(f"torch is required to load the '{name}' model")
+        ckpt = torch.load(model_path, map_location="cpu")
+        model = ARCHITECTURES[entry["arch"]](**ckpt["model_config"])
+        model.load_state_dict(ckpt["model_state_dict"])
+        model.eval()
+        device = torch.device("cpu")
+    with open(preproc_path, "rb") as f:
+        preproc = pickle.load(f)
+    return model, preproc, int(entry["feat_per_step"]), int(entry["seq_len"]), device
+
+
+# ==== EXPORT ====
+def split_dataset(csv_path=DEFAULT_CSV):
+    """(train_df, test_df) exactly as the notebook's train_test_split."""
+    from sklearn.model_selection import train_test_split
+
+    df = pd.read_csv(csv_path)
+    return train_test_split(df, test_size=TEST_SIZE, random_state=SEED)
+
+
+def _train_rnn(name: str, Xseq: np.ndarray, y: np.ndarray):
+    """The notebook's train_model: Adam + MSE, shuffled mini-batches."""
+    random.seed(SEED)
+    np.random.seed(SEED)
+    torch.manual_seed(SEED)
+    model = ARCHITECTURES[name](input_size=Xseq.shape[2])
+    X_t = torch.tensor(Xseq, dtype=torch.float32)
+    y_t = torch.tensor(y, dtype=torch.float32).unsqueeze(1)
+    loader = torch.utils.data.DataLoader(torch.utils.data.TensorDataset(X_t, y_t),
+                                         batch_size=RNN_BATCH_SIZE, shuffle=True)
+    criterion = nn.MSELoss()
+    optimizer = torch.optim.Adam(model.parameters(), lr=RNN_LR)
+    model.train()
+    for _ in range(RNN_EPOCHS):
+        for xb, yb in loader:
+            optimizer.zero_grad()
+            loss = criterion(model(xb), yb)
+            loss.backward()
+            optimizer.step()
+    model.eval()
+    return model
+
+
+def build_preprocessor():
+    """The notebook's ColumnTransformer: median impute + scale numerics, mode impute + one-hot Gender."""
+    from sklearn.compose import ColumnTransformer
+    from sklearn.impute import SimpleImputer
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+    num_pipeline = Pipeline([("imputer", SimpleImputer(strategy="median")), ("scaler", StandardScaler())])
+    cat_pipeline = Pipeline([("imputer", SimpleImputer(strategy="most_frequent")),
+                             ("encoder", OneHotEncoder(handle_unknown="ignore"))])
+    return ColumnTransformer([("num", num_pipeline, FEATURES[1:]), ("cat", cat_pipeline, ["Gender"])])
+
+
+def export_zoo(names: Optional[Sequence[str]] = None, csv_path=DEFAULT_CSV, zoo_dir=ZOO_DIR) -> List[str]:
+    """
+    Fit the zoo preprocessor and the notebook's alternative models on the
+    train split and export them; returns the exported names.
+    """
+    names = list(names or SKLEARN_MODELS + (TORCH_MODELS if torch is not None else ()))
+    zoo_dir = Path(zoo_dir)
+    zoo_dir.mkdir(parents=True, exist_ok=True)
+    train_df, _ = split_dataset(csv_path)
+    # fitted here, as in every notebook cell (preprocessor.pkl next to the checkpoint belongs to the DeepRNN)
+    preproc = build_preprocessor().fit(train_df[FEATURES])
+    preproc_path = zoo_dir / ZOO_PREPROC_NAME
+    with open(preproc_path, "wb") as f:
+        pickle.dump(preproc, f)
+    X_train = preproc.transform(train_df[FEATURES])
+    y_train = train_df[TARGET].to_numpy(dtype=np.float64)
+    n_features = X_train.shape[1]
+    # padded like the served DeepRNN (the notebook's RNN cells truncated to 8 columns, dropping Gender_M)
+    feat_per_step = -(-n_features // SEQ_LEN)
+
+    manifest = read_manifest(zoo_dir)
+    for name in names:
+        start = time.perf_counter()
+        entry = {"feat_per_step": feat_per_step, "seq_len": SEQ_LEN, "n_features": n_features,
+                 "preprocessor": ZOO_PREPROC_NAME, "trained_at": datetime.now(timezone.utc).isoformat()}
+        if name in SKLEARN_MODELS:
+            estimator = _sklearn_estimator(name).fit(X_train, y_train)
+            entry.update(kind="sklearn", file=f"{name}.pkl")
+            with open(zoo_dir / entry["file"], "wb") as f:
+                pickle.dump(estimator, f)
+        elif name in TORCH_MODELS:
+            if torch is None:
+                raise ImportError(f"torch is required to train the '{name}' model")
+            model = _train_rnn(name, _to_sequences(X_train, feat_per_step, SEQ_LEN), y_train)
+            entry.update(kind="torch", arch=name, file=f"{name}.pt")
+            torch.save({"model_state_dict": model.state_dict(),
+                        "model_config": {"input_size": feat_per_step}}, zoo_dir / entry["file"])
+        else:
+            raise ValueError(f"Unknown model '{name}', expected one of {SKLEARN_MODELS + TORCH_MODELS}")
+        manifest[name] = entry
+        print(f"📁 Exported {name} -> {zoo_dir / entry['file']} ({time.perf_counter() - start:.1f}s)")
+    _write_manifest(manifest, zoo_dir)
+    return names
+
+
+# ==== REPORT ====
+def _time_per_call(fn, n: int) -> float:
+    fn()  # warm-up
+    start = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - start) / n * 1e3
+
+
+def zoo_report(csv_path=DEFAULT_CSV, names: Optional[Sequence[str]] = None, mode: str = "eager",
+               max_rmse: Optional[float] = None) -> pd.DataFrame:
+    """
+    Accuracy and serving latency of every model on the held-out test split,
+    cheapest first. Latency is the full predict_batch path (transform +
+    forward) through the registry, exactly as the inference server runs it.
+    """
+    from scripts.model_registry import PRIMARY_MODEL, get_named_model, get_named_model_version
+
+    _, test_df = split_dataset(csv_path)
+    actual = test_df[TARGET].to_numpy(dtype=np.float64)
+    X = test_df[FEATURES]
+    one = X.iloc[:1]
+    names = list(names or [PRIMARY_MODEL] + sorted(read_manifest()))
+
+    rows = []
+    for name in names:
+        try:
+            model, preproc, feat_per_step, seq_len, device = get_named_model(name, mode=mode)
+        except (ImportError, FileNotFoundError) as e:
+            print(f"⚠️ Skipping '{name}': {e}")
+            continue
+        predict = lambda df: predict_batch(df, model, preproc, feat_per_step, seq_len, device, batch_size=len(df))
+        pred = predict(X)
+        ss_res = float(np.sum((actual - pred) ** 2))
+        ss_tot = float(np.sum((actual - actual.mean()) ** 2))
+        rows.append({
+            "model": name,
+            "version": get_named_model_version(name, mode=mode),
+            "n": len(pred),
+            "rmse": float(np.sqrt(np.mean((pred - actual) ** 2))),
+            "mae": float(np.mean(np.abs(pred - actual))),
+            "r2": 1.0 - ss_res / ss_tot if ss_tot else np.nan,
+            "single_row_ms": _time_per_call(lambda: predict(one), 200),
+            "batch_ms": _time_per_call(lambda: predict(X), 50),
+        })
+    report = pd.DataFrame(rows)
+    if report.empty:
+        return report
+    report["meets_budget"] = report["rmse"] <= max_rmse if max_rmse is not None else True
+    return report.sort_values("single_row_ms", ignore_index=True)
+
+
+# ==== MAIN ====
+def main():
+    parser = argparse.ArgumentParser(description="Export and compare the notebook's alternative regressors.")
+    parser.add_argument("--export", action="store_true", help="train + export models into model/zoo")
+    parser.add_argument("--only", default=None, help="comma-separated model names (export/report)")
+    parser.add_argument("--report", action="store_true", help="latency/accuracy on the held-out test split")
+    parser.add_argument("--max-rmse", type=float, default=None, help="error budget for --report")
+    parser.add_argument("--mode", default="eager", help="serving mode of the DeepRNN in the report")
+    parser.add_argument("--list", action="store_true", help="list exported models")
+    parser.add_argument("--csv", default=str(DEFAULT_CSV))
+    parser.add_argument("--out", default=str(ZOO_REPORT_PATH))
+    args = parser.parse_args()
+    only = [n.strip() for n in args.only.split(",") if n.strip()] if args.only else None
+
+    if args.export:
+        export_zoo(only, args.csv)
+    if args.list:
+        for name, entry in sorted(read_manifest().items()):
+            print(f"  {name:<14} {entry['kind']:<8} {entry['file']:<20} trained {entry['trained_at']}")
+    if args.report:
+        report = zoo_report(args.csv, only, args.mode, args.max_rmse)
+        Path(args.out).parent.mkdir(parents=True, exist_ok=True)
+        report.to_csv(args.out, index=False)
+        print("\n📊 Model latency/accuracy report (held-out test split, cheapest first):")
+        print(report.to_string(index=False, float_format="{:.6f}".format))
+        within = report[report["meets_budget"]] if not report.empty else report
+        if args.max_rmse is not None:
+            if within.empty:
+                print(f"❌ No model meets RMSE ≤ {args.max_rmse}")
+            else:
+                print(f"🏆 Cheapest model with RMSE ≤ {args.max_rmse}: {within.iloc[0]['model']}")
+        print(f"📁 Saved report to {args.out}")
+    if not (args.export or args.list or args.report):
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+# scripts/mongo_client.py
+"""
+Process-wide MongoDB client factory.
+
+A MongoClient owns a connection pool and background monitoring threads,
+so it should be created once per process and shared: Streamlit reruns the
+whole script on every interaction, and creating/closing a client each
+time put connection setup into every click. get_client() hands out one
+client per (uri, options) and process; it is thread-safe and fork-aware
+(a child process gets its own client, as PyMongo requires).
+
+Pool sizes and timeouts come from environment variables (defaults below)
+and can be overridden per call:
+
+    HYDRA_MONGO_URI                   mongodb://localhost:27017/
+    HYDRA_MONGO_MAX_POOL_SIZE         50
+    HYDRA_MONGO_MIN_POOL_SIZE         0
+    HYDRA_MONGO_MAX_IDLE_TIME_MS      60000
+    HYDRA_MONGO_SERVER_SELECTION_MS   5000
+    HYDRA_MONGO_CONNECT_TIMEOUT_MS    5000
+    HYDRA_MONGO_SOCKET_TIMEOUT_MS     30000
+
+Shared clients must not be closed by callers (a closed PyMongo 4 client
+cannot be reused); use close_client()/close_all(), which also evict it.
+"""
+import atexit
+import os
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+
+DEFAULT_URI = "mongodb://localhost:27017/"
+DB_NAME = "HYDRA"
+# health_check() pings at most this often and otherwise returns the last result
+HEALTH_CHECK_INTERVAL_S = 30.0
+# a failed check is reused for this long, so reruns do not each wait out serverSelectionTimeoutMS
+HEALTH_RETRY_INTERVAL_S = 5.0
+
+_LOCK = threading.Lock()
+_CLIENTS: Dict[Tuple, Dict[str, Any]] = {}
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.environ.get(name)
+    return int(value) if value not in (None, "") else default
+
+
+def default_uri() -> str:
+    return os.environ.get("HYDRA_MONGO_URI", DEFAULT_URI)
+
+
+def client_options(**overrides) -> Dict[str, Any]:
+    """MongoClient keyword options from the environment, with per-call overrides."""
+    options = {
+        "maxPoolSize": _env_int("HYDRA_MONGO_MAX_POOL_SIZE", 50),
+        "minPoolSize": _env_int("HYDRA_MONGO_MIN_POOL_SIZE", 0),
+        "maxIdleTimeMS": _env_int("HYDRA_MONGO_MAX_IDLE_TIME_MS", 60000),
+        "serverSelectionTimeoutMS": _env_int("HYDRA_MONGO_SERVER_SELECTION_MS", 5000),
+        "connectTimeoutMS": _env_int("HYDRA_MONGO_CONNECT_TIMEOUT_MS", 5000),
+        "socketTimeoutMS": _env_int("HYDRA_MONGO_SOCKET_TIMEOUT_MS", 30000),
+        "appname": "hydra",
+    }
+    options.update(overrides)
+    return options
+
+
+def _key(uri: Optional[str], overrides: Dict[str, Any]) -> Tuple[str, Tuple]:
+    uri = uri or default_uri()
+    return uri, tuple(sorted(client_options(**overrides).items()))
+
+
+def _get_entry(uri: Optional[str], overrides: Dict[str, Any]) -> Dict[str, Any]:
+    """This process's {"client", "pid", "health"} entry for uri and options; created on first use."""
+    key = _key(uri, overrides)
+    entry = _CLIENTS.get(key)
+    if entry is not None and entry["pid"] == os.getpid():
+        return entry
+
+    with _LOCK:
+        entry = _CLIENTS.get(key)
+        if entry is None or entry["pid"] != os.getpid():
+            # after a fork the parent's client is unusable here; it is left for the parent to close
+            client = MongoClient(key[0], **dict(key[1]))
+            entry = {"client": client, "pid": os.getpid(), "health": None}
+            _CLIENTS[key] = entry
+        return entry
+
+
+def get_client(uri: Optional[str] = None, **overrides) -> MongoClient:
+    """Shared client for uri (default: HYDRA_MONGO_URI) and options; created on first use."""
+    return _get_entry(uri, overrides)["client"]
+
+
+def get_db(db_name: str = DB_NAME, uri: Optional[str] = None, **overrides):
+    """Database handle on the shared client."""
+    return get_client(uri, **overrides)[db_name]
+
+
+def health_check(uri: Optional[str] = None, force: bool = False, **overrides) -> Dict[str, Any]:
+    """
+    Ping the server through the shared client.
+    Returns {"ok", "latency_ms", "error", "checked_at"}; unless force=True a
+    successful result is reused for HEALTH_CHECK_INTERVAL_S and a failed one
+    for HEALTH_RETRY_INTERVAL_S.
+    """
+    # the entry itself, not a second _CLIENTS lookup: a concurrent close_client may evict it
+    entry = _get_entry(uri, overrides)
+    client = entry["client"]
+    last = entry["health"]
+    now = time.time()
+    if not force and last is not None:
+        ttl = HEALTH_CHECK_INTERVAL_S if last["ok"] else HEALTH_RETRY_INTERVAL_S
+        if now - last["checked_at"] < ttl:
+            return last
+
+    start = time.perf_counter()
+    try:
+        client.admin.command("ping")
+        health = {"ok": True, "latency_ms": (time.perf_counter() - start) * 1e3, "error": None}
+    except PyMongoError as e:
+        health = {"ok": False, "latency_ms": None, "error": str(e)}
+    health["checked_at"] = now
+    entry["health"] = health
+    return health
+
+
+def close_client(uri: Optional[str] = None, **overrides):
+    """Close and evict the shared client (the next get_client creates a new one)."""
+    with _LOCK:
+        entry = _CLIENTS.pop(_key(uri, overrides), None)
+    if entry is not None and entry["pid"] == os.getpid():
+        entry["client"].close()
+
+
+def close_all():
+    """Close every client this process created."""
+    with _LOCK:
+        entries = list(_CLIENTS.values())
+        _CLIENTS.clear()
+    for entry in entries:
+        if entry["pid"] == os.getpid():
+            entry["client"].close()
+
+
+atexit.register(close_all)
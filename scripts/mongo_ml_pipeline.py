@@ -1,29 +1,32 @@
 # scripts/mongo_ml_pipeline.py
-import pymongo
+import numpy as np
 import pandas as pd
 import json
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 
 # Import inference utilities from your existing script
+from scripts.metrics import stage
+from scripts.mongo_client import get_client, close_client
 from scripts.model_inference import (
     load_model_and_preproc,
     preprocess_and_predict,
     FEATURES,
 )
 
-MONGO_URI = "mongodb://localhost:27017/"
 DB_NAME = "HYDRA"
 
 def connect_to_mongo():
-    client = pymongo.MongoClient(MONGO_URI)
+    # shared process-wide client (HYDRA_MONGO_URI, see scripts/mongo_client.py); not closed per call
+    client = get_client()
     db = client[DB_NAME]
     hydration_col = db["hydration_data"]
     print("✅ Connected to MongoDB database 'HYDRA'")
     return client, hydration_col
 
 def retrieve_subject_data(hydration_col, subject_id: int) -> Dict[str, Any]:
-    record = hydration_col.find_one({"Subject_ID": subject_id}, {"_id": 0})
+    with stage("fetch"):
+        record = hydration_col.find_one({"Subject_ID": subject_id}, {"_id": 0})
     if not record:
         raise ValueError(f"No record found for Subject_ID={subject_id}")
     
@@ -54,86 +57,315 @@ def _to_float(val: Any) -> Optional[float]:
     except Exception:
         return None
 
-def _extract_gear(final_readings: Dict[str, Any], gear_index: int):
+# Candidate key names, in priority order
+_AGE_KEYS = ("Age", "age")
+_BLOCK_KEYS = ("data", "measurements")
+_INITIAL_WEIGHT_KEYS = ("Initial_Weight_kg", "Initial_Weight", "initial_weight")
+_TOTAL_WATER_KEYS = ("Total_Water_Consumed_ml", "Total_Water_Consumed")
+_FINAL_READINGS_KEYS = ("final_readings", "final readings")
+_SWEAT_KEYS = ("Sweat_kg", "Sweat", "sweat_kg", "sweat")
+_SALT_KEYS = ("Salt_Lost", "Salt_Lost_1", "Salt_Lost_2", "Salt", "salt_lost", "Salt_Lost(g)")
+# alternate names directly under the measurement block, used when the gear entry has no value
+_GEAR_FALLBACK_KEYS = {
+    "Final_Gear1_Sweat_kg": ("Final_Gear1_Sweat_kg", "Gear1_Sweat"),
+    "Final_Salt_Lost_1": ("Final_Salt_Lost_1", "Gear1_Salt"),
+    "Final_Gear2_Sweat_kg": ("Final_Gear2_Sweat_kg", "Gear2_Sweat"),
+    "Final_Salt_Lost_2": ("Final_Salt_Lost_2", "Gear2_Salt"),
+}
+NUMERIC_FEATURES = [f for f in FEATURES if f != "Gender"]
+TARGET = "TARGET_True_Water_Loss_kg"
+
+# shape signature -> resolved key paths per numeric feature
+_LAYOUT_CACHE: Dict[tuple, Dict[str, List[tuple]]] = {}
+_LAYOUT_CACHE_MAX = 512
+
+def _first_key(d: Any, keys) -> Optional[str]:
+    """First of keys present in dict d (None if d is not a dict or has none of them)."""
+    if isinstance(d, dict):
+        for k in keys:
+            if k in d:
+                return k
+    return None
+
+def _shape_signature(record: Dict[str, Any]) -> tuple:
+    """
+    Structural fingerprint of a document: key names down to the gear
+    objects, plus the truthiness of non-dict values under the measurement
+    block (an empty/None final_readings changes how gears are found).
+    """
+    sig = []
+    for k, v in record.items():
+        if not isinstance(v, dict):
+            sig.append((k, None))
+            continue
+        inner = []
+        for k2, v2 in v.items():
+            if isinstance(v2, dict):
+                inner.append((k2, tuple((k3, tuple(v3) if isinstance(v3, dict) else None) for k3, v3 in v2.items())))
+            else:
+                inner.append((k2, bool(v2)))
+        sig.append((k, tuple(inner)))
+    return tuple(sig)
+
+def _resolve_layout(record: Dict[str, Any]) -> Dict[str, List[tuple]]:
     """
-    Pick gear entry by index (0 or 1) from final_readings.
-    Returns (sweat, salt) or (None, None) if not found.
+    Work out, for one document shape, the key paths (tried in order) that
+    hold each numeric feature. Mirrors the lookup rules of the original
+    per-record parser: data vs measurements block, final_readings or gear
+    dicts directly under the block, first two gears by sorted key name and
+    the Final_Gear*/Gear*_ fallbacks.
     """
-    if not isinstance(final_readings, dict) or len(final_readings) == 0:
-        return None, None
+    paths: Dict[str, List[tuple]] = {f: [] for f in NUMERIC_FEATURES}
+
+    age_key = _first_key(record, _AGE_KEYS)
+    if age_key is not None:
+        paths["Age"].append((age_key,))
+
+    block_key = _first_key(record, _BLOCK_KEYS)
+    block = record[block_key] if block_key is not None else None
+    if not isinstance(block, dict) or not block:
+        return paths
+    base = (block_key,)
+
+    for feat, keys in (("Initial_Weight_kg", _INITIAL_WEIGHT_KEYS), ("Total_Water_Consumed_ml", _TOTAL_WATER_KEYS)):
+        k = _first_key(block, keys)
+        if k is not None:
+            paths[feat].append(base + (k,))
+
+    # gear entries: final_readings (or 'final readings'), else gear-like dicts directly under the block
+    fr_key = _first_key(block, _FINAL_READINGS_KEYS)
+    final_readings = block[fr_key] if fr_key is not None else None
+    if final_readings:
+        gear_base = base + (fr_key,)
+    else:
+        final_readings = {k: v for k, v in block.items()
+                          if isinstance(v, dict) and ("gear" in k.lower() or "fit" in k.lower() or "s2" in k.lower())}
+        gear_base = base
 
-    # Deterministic order: sort keys so behavior is consistent
-    keys = sorted(final_readings.keys())
-    if gear_index >= len(keys):
-        return None, None
+    if isinstance(final_readings, dict):
+        # Deterministic order: sort keys so behavior is consistent
+        gear_keys = sorted(final_readings.keys())[:2]
+        gear_feats = (("Final_Gear1_Sweat_kg", "Final_Salt_Lost_1"), ("Final_Gear2_Sweat_kg", "Final_Salt_Lost_2"))
+        for gear_key, (sweat_feat, salt_feat) in zip(gear_keys, gear_feats):
+            gear_obj = final_readings[gear_key]
+            for feat, keys in ((sweat_feat, _SWEAT_KEYS), (salt_feat, _SALT_KEYS)):
+                k = _first_key(gear_obj, keys)
+                if k is not None:
+                    paths[feat].append(gear_base + (gear_key, k))
 
-    gear_key = keys[gear_index]
-    gear_obj = final_readings.get(gear_key, {})
-    # possible sweat keys
-    sweat = _safe_get(gear_obj, "Sweat_kg", "Sweat", "sweat_kg", "sweat")
-    salt = _safe_get(gear_obj, "Salt_Lost", "Salt_Lost_1", "Salt_Lost_2", "Salt", "salt_lost", "Salt_Lost(g)")
-    return _to_float(sweat), _to_float(salt)
+    for feat, keys in _GEAR_FALLBACK_KEYS.items():
+        k = _first_key(block, keys)
+        if k is not None:
+            paths[feat].append(base + (k,))
+    return paths
+
+def _layout_for(record: Dict[str, Any]) -> Dict[str, List[tuple]]:
+    sig = _shape_signature(record)
+    layout = _LAYOUT_CACHE.get(sig)
+    if layout is None:
+        layout = _resolve_layout(record)
+        if len(_LAYOUT_CACHE) >= _LAYOUT_CACHE_MAX:
+            _LAYOUT_CACHE.pop(next(iter(_LAYOUT_CACHE)))
+        _LAYOUT_CACHE[sig] = layout
+    return layout
+
+def _extract(record: Dict[str, Any], candidates: List[tuple]) -> Optional[float]:
+    """First candidate path whose value converts to float."""
+    for path in candidates:
+        val = record
+        for k in path:
+            val = val[k]
+        val = _to_float(val)
+        if val is not None:
+            return val
+    return None
+
+def _extract_mapped(record: Dict[str, Any]) -> Dict[str, Any]:
+    layout = _layout_for(record)
+    mapped = {"Gender": record.get("Gender", "") or record.get("gender", "") or ""}
+    for feat in NUMERIC_FEATURES:
+        mapped[feat] = _extract(record, layout[feat])
+    return mapped
 
 def parse_record_to_features(record: Dict[str, Any]) -> pd.DataFrame:
     """
     Map MongoDB record to the FEATURES expected by the model.
-    Handles multiple schemata (data vs measurements) and variable gear names.
+    Handles multiple schemata (data vs measurements) and variable gear names;
+    key paths are resolved once per document shape and cached.
     """
-    # top-level gender/age may be present at root
-    gender = record.get("Gender", "") or record.get("gender", "") or ""
-    age = _to_float(_safe_get(record, "Age", "age"))
-
-    # two common places for measurement block: 'data' or 'measurements'
-    data_block = _safe_get(record, "data", "measurements", default={}) or {}
-
-    initial_w = _to_float(_safe_get(data_block, "Initial_Weight_kg", "Initial_Weight", "initial_weight", default=None))
-    final_w = _to_float(_safe_get(data_block, "Final_Weight_kg", "Final_Weight", "final_weight", default=None))
-    total_water = _to_float(_safe_get(data_block, "Total_Water_Consumed_ml", "Total_Water_Consumed", "Total_Water_Consumed_ml", default=None))
-
-    # final_readings might be under data_block["final_readings"] or data_block["final_readings "]
-    final_readings = _safe_get(data_block, "final_readings", "final readings", default={}) or {}
-
-    # If final_readings empty but gear keys are directly under data_block, try to detect
-    if (not final_readings) and isinstance(data_block, dict):
-        # heuristic: keys that contain 'Gear' or 'gear' or 'fit' are gear entries
-        candidate = {k: v for k, v in data_block.items() if isinstance(v, dict) and ("gear" in k.lower() or "fit" in k.lower() or "s2" in k.lower())}
-        if candidate:
-            final_readings = candidate
-
-    # Extract gear1 & gear2 values (first two gear entries sorted by key)
-    g1_sweat, g1_salt = _extract_gear(final_readings, 0)
-    g2_sweat, g2_salt = _extract_gear(final_readings, 1)
-
-    # If any value is still None, try alternate names directly at top-level measurement block
-    if g1_sweat is None:
-        g1_sweat = _to_float(_safe_get(data_block, "Final_Gear1_Sweat_kg", "Gear1_Sweat", default=None))
-    if g1_salt is None:
-        g1_salt = _to_float(_safe_get(data_block, "Final_Salt_Lost_1", "Gear1_Salt", default=None))
-    if g2_sweat is None:
-        g2_sweat = _to_float(_safe_get(data_block, "Final_Gear2_Sweat_kg", "Gear2_Sweat", default=None))
-    if g2_salt is None:
-        g2_salt = _to_float(_safe_get(data_block, "Final_Salt_Lost_2", "Gear2_Salt", default=None))
-
-    # Build mapping in the FEATURES order expected by model_inference
-    mapped = {
-        "Gender": gender,
-        "Age": age,
-        "Initial_Weight_kg": initial_w,
-        "Total_Water_Consumed_ml": total_water,
-        "Final_Gear1_Sweat_kg": g1_sweat,
-        "Final_Salt_Lost_1": g1_salt,
-        "Final_Gear2_Sweat_kg": g2_sweat,
-        "Final_Salt_Lost_2": g2_salt,
-    }
+    with stage("parse"):
+        mapped = _extract_mapped(record)
 
-    # Print helpful warnings for missing keys (so you can inspect/clean DB)
-    for k, v in mapped.items():
-        if v is None or (isinstance(v, str) and v == ""):
-            print(f"⚠️ Warning: extracted feature '{k}' is missing or empty (value={v})")
+        # Print helpful warnings for missing keys (so you can inspect/clean DB)
+        for k, v in mapped.items():
+            if v is None or (isinstance(v, str) and v == ""):
+                print(f"⚠️ Warning: extracted feature '{k}' is missing or empty (value={v})")
 
-    df = pd.DataFrame([mapped], columns=FEATURES)
+        df = pd.DataFrame([mapped], columns=FEATURES)
     return df
 
+def parse_records_to_matrix(records: Iterable[Dict[str, Any]]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Bulk variant of parse_record_to_features without per-record DataFrames.
+    Returns (gender, X): an object array of Gender tokens and a float
+    matrix of NUMERIC_FEATURES (NaN where missing), ready for
+    CompiledPreprocessor.transform_arrays or a DataFrame.
+    """
+    genders = []
+    rows = []
+    for record in records:
+        layout = _layout_for(record)
+        genders.append(record.get("Gender", "") or record.get("gender", "") or "")
+        rows.append([_extract(record, layout[feat]) for feat in NUMERIC_FEATURES])
+    gender = np.array(genders, dtype=object)
+    X = np.array(rows, dtype=np.float64).reshape(len(rows), len(NUMERIC_FEATURES))
+    return gender, X
+
+def parse_record_target(record: Dict[str, Any]) -> Optional[float]:
+    """TARGET_True_Water_Loss_kg from the data/measurements block (None when missing)."""
+    return _to_float(_safe_get(_safe_get(record, *_BLOCK_KEYS), TARGET))
+
+def records_to_frame(records: Iterable[Dict[str, Any]]) -> pd.DataFrame:
+    """Parse many records into one FEATURES-ordered DataFrame (for predict_batch)."""
+    gender, X = parse_records_to_matrix(records)
+    df = pd.DataFrame(X, columns=NUMERIC_FEATURES)
+    df.insert(0, "Gender", gender)
+    return df[FEATURES]
+
+# ---- server-side flattening (aggregation) ----
+FETCH_BATCH_SIZE = 5000
+
+def _agg_float(expr) -> Dict[str, Any]:
+    """Server-side _to_float: double, or null when missing/unconvertible."""
+    return {"$convert": {"input": expr, "to": "double", "onError": None, "onNull": None}}
+
+def _agg_first(exprs: List[Any]) -> Any:
+    """First non-null expression (nested two-argument $ifNull, works on any server version)."""
+    out = exprs[-1]
+    for expr in reversed(exprs[:-1]):
+        out = {"$ifNull": [expr, out]}
+    return out
+
+def _agg_first_float(base: str, keys) -> Any:
+    return _agg_first([_agg_float(f"{base}.{k}") for k in keys])
+
+def _agg_is_object(expr) -> Dict[str, Any]:
+    return {"$eq": [{"$type": expr}, "object"]}
+
+def _agg_truthy(expr, default) -> Dict[str, Any]:
+    """expr unless it is missing/null/""/false/0 (Python `or` semantics)."""
+    return {"$cond": [{"$in": [{"$ifNull": [expr, None]}, [None, "", False, 0]]}, default, expr]}
+
+def _agg_min_key(entries) -> Dict[str, Any]:
+    """Entry with the smallest key of a $objectToArray result (null if empty)."""
+    return {"$reduce": {
+        "input": entries,
+        "initialValue": None,
+        "in": {"$cond": [{"$or": [{"$eq": ["$$value", None]}, {"$lt": ["$$this.k", "$$value.k"]}]},
+                         "$$this", "$$value"]},
+    }}
+
+def feature_pipeline(match: Optional[Dict[str, Any]] = None, with_target: bool = False) -> List[Dict[str, Any]]:
+    """
+    Aggregation pipeline that flattens both document layouts
+    (data/measurements, final_readings/'final readings' or gear dicts
+    directly under the block) into Subject_ID + the 8 FEATURES columns,
+    following the same lookup rules as parse_record_to_features.
+    One difference: when a document carries several aliases of a key
+    (e.g. both `data: null` and `measurements`), the server takes the
+    first alias with a usable value instead of the first one present.
+    Uses only $objectToArray/$reduce/$filter/$convert (MongoDB >= 4.0).
+    with_target also projects TARGET_True_Water_Loss_kg (for training).
+    """
+    final_readings = {"$ifNull": ["$_b.final_readings", "$_b.final readings"]}
+    gear_like = {"$filter": {
+        "input": {"$cond": [_agg_is_object("$_b"), {"$objectToArray": "$_b"}, []]},
+        "cond": {"$and": [_agg_is_object("$$this.v"), {"$or": [
+            {"$gte": [{"$indexOfCP": [{"$toLower": "$$this.k"}, token]}, 0]} for token in ("gear", "fit", "s2")
+        ]}]},
+    }}
+    gears = {"$cond": [
+        _agg_is_object(final_readings),
+        {"$cond": [{"$gt": [{"$size": {"$objectToArray": final_readings}}, 0]},
+                   {"$objectToArray": final_readings}, gear_like]},
+        {"$cond": [{"$in": [{"$type": final_readings}, ["missing", "null"]]}, gear_like, []]},
+    ]}
+
+    project = {
+        "_id": 0,
+        "Subject_ID": 1,
+        "Gender": _agg_truthy("$Gender", _agg_truthy("$gender", "")),
+        "Age": _agg_first([_agg_float(f"${k}") for k in _AGE_KEYS]),
+        "Initial_Weight_kg": _agg_first_float("$_b", _INITIAL_WEIGHT_KEYS),
+        "Total_Water_Consumed_ml": _agg_first_float("$_b", _TOTAL_WATER_KEYS),
+    }
+    gear_feats = (("$_g1", "Final_Gear1_Sweat_kg", "Final_Salt_Lost_1"), ("$_g2", "Final_Gear2_Sweat_kg", "Final_Salt_Lost_2"))
+    for gear, sweat_feat, salt_feat in gear_feats:
+        for feat, keys in ((sweat_feat, _SWEAT_KEYS), (salt_feat, _SALT_KEYS)):
+            exprs = [_agg_float(f"{gear}.v.{k}") for k in keys]
+            exprs += [_agg_float(f"$_b.{k}") for k in _GEAR_FALLBACK_KEYS[feat]]
+            project[feat] = _agg_first(exprs)
+    if with_target:
+        project[TARGET] = _agg_float(f"$_b.{TARGET}")
+
+    pipeline = [{"$match": match}] if match else []
+    pipeline += [
+        {"$addFields": {"_b": {"$ifNull": ["$data", "$measurements"]}}},
+        {"$addFields": {"_gears": gears}},
+        {"$addFields": {"_g1": _agg_min_key("$_gears")}},
+        {"$addFields": {"_g2": _agg_min_key({"$filter": {"input": "$_gears", "cond": {"$ne": ["$$this.k", "$_g1.k"]}}})}},
+        {"$project": project},
+    ]
+    return pipeline
+
+def iter_feature_batches(hydration_col, match: Optional[Dict[str, Any]] = None,
+                         batch_size: int = FETCH_BATCH_SIZE, with_target: bool = False):
+    """
+    Stream flattened feature rows from the server in columnar batches.
+    Yields (subject_ids, gender, X) per batch: X is a float matrix of
+    NUMERIC_FEATURES (NaN where missing), the same layout as
+    parse_records_to_matrix. with_target yields (subject_ids, gender, X, y)
+    with y the TARGET column (NaN where missing).
+    """
+    cursor = hydration_col.aggregate(feature_pipeline(match, with_target), batchSize=batch_size, allowDiskUse=True)
+    batch: List[Dict[str, Any]] = []
+    for doc in cursor:
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            yield _columns(batch, with_target)
+            batch = []
+    if batch:
+        yield _columns(batch, with_target)
+
+def _columns(docs: List[Dict[str, Any]], with_target: bool = False) -> tuple:
+    subject_ids = np.array([d.get("Subject_ID") for d in docs], dtype=object)
+    gender = np.array([d.get("Gender", "") for d in docs], dtype=object)
+    X = np.array([[d.get(f) for f in NUMERIC_FEATURES] for d in docs], dtype=np.float64)
+    X = X.reshape(len(docs), len(NUMERIC_FEATURES))
+    if not with_target:
+        return subject_ids, gender, X
+    return subject_ids, gender, X, np.array([d.get(TARGET) for d in docs], dtype=np.float64)
+
+def fetch_features_frame(hydration_col, match: Optional[Dict[str, Any]] = None,
+                         batch_size: int = FETCH_BATCH_SIZE) -> pd.DataFrame:
+    """All matching subjects as one DataFrame: Subject_ID + FEATURES."""
+    frames = []
+    for subject_ids, gender, X in iter_feature_batches(hydration_col, match, batch_size):
+        df = pd.DataFrame(X, columns=NUMERIC_FEATURES)
+        df.insert(0, "Gender", gender)
+        df.insert(0, "Subject_ID", subject_ids)
+        frames.append(df)
+    if not frames:
+        return pd.DataFrame(columns=["Subject_ID"] + FEATURES)
+    return pd.concat(frames, ignore_index=True)
+
+def retrieve_subject_features(hydration_col, subject_id: int) -> pd.DataFrame:
+    """Server-flattened counterpart of retrieve_subject_data + parse_record_to_features."""
+    df = fetch_features_frame(hydration_col, {"Subject_ID": subject_id}, batch_size=1)
+    if df.empty:
+        raise ValueError(f"No record found for Subject_ID={subject_id}")
+    return df[FEATURES].iloc[:1].reset_index(drop=True)
+
 def main():
     client, hydration_col = connect_to_mongo()
     try:
@@ -154,7 +386,7 @@ def main():
     except Exception as e:
         print("❌ Error:", e)
     finally:
-        client.close()
+        close_client()
         print("\n🔒 MongoDB connection closed.")
 
 if __name__ == "__main__":
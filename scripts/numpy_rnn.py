@@ -0,0 +1,182 @@
+# scripts/numpy_rnn.py
+"""
+Torch-free DeepRNN inference engine.
+
+The DeepRNN is a 3-layer tanh nn.RNN (hidden 128, seq_len 4) followed by
+Linear -> ReLU -> Linear. Once its state dict is exported to plain arrays
+the whole forward is a handful of batched NumPy matmuls, so scoring
+workers and the CLI can run without importing torch.
+
+Export (needs torch + sklearn once):
+    python -m scripts.numpy_rnn --export
+Parity check against the torch forward:
+    python -m scripts.numpy_rnn --check
+"""
+import argparse
+import json
+import pickle
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+from scripts.model_inference import (
+    MODEL_DIR,
+    MODEL_CHECKPOINT,
+    PREPROC_PATH,
+    FEATURES,
+    _to_sequences,
+)
+from scripts.fast_preprocessor import CompiledPreprocessor, compile_preprocessor
+
+NUMPY_WEIGHTS_PATH = MODEL_DIR / "deep_rnn_weights.npz"
+COMPILED_PREPROC_PATH = MODEL_DIR / "preprocessor_compiled.npz"
+DEFAULT_CSV = Path("data") / "formatted_hydration_data.csv"
+PARITY_ATOL = 1e-5
+
+
+class NumpyDeepRNN:
+    """
+    Eval-mode DeepRNN forward in NumPy.
+    Weights are stored pre-transposed so every step is `x @ W`; dropout is
+    a no-op at inference, exactly as in model.eval().
+    """
+
+    def __init__(self, state_dict: Dict[str, np.ndarray], num_layers: int, dtype=np.float32):
+        self.num_layers = num_layers
+        self.dtype = dtype
+        self.layers = []
+        for l in range(num_layers):
+            w_ih = np.asarray(state_dict[f"rnn.weight_ih_l{l}"], dtype=dtype)
+            w_hh = np.asarray(state_dict[f"rnn.weight_hh_l{l}"], dtype=dtype)
+            bias = (np.asarray(state_dict[f"rnn.bias_ih_l{l}"], dtype=dtype)
+                    + np.asarray(state_dict[f"rnn.bias_hh_l{l}"], dtype=dtype))
+            self.layers.append((np.ascontiguousarray(w_ih.T), np.ascontiguousarray(w_hh.T), bias))
+        self.fc1_w = np.ascontiguousarray(np.asarray(state_dict["fc.0.weight"], dtype=dtype).T)
+        self.fc1_b = np.asarray(state_dict["fc.0.bias"], dtype=dtype)
+        self.fc2_w = np.ascontiguousarray(np.asarray(state_dict["fc.2.weight"], dtype=dtype).T)
+        self.fc2_b = np.asarray(state_dict["fc.2.bias"], dtype=dtype)
+        self.hidden_size = self.layers[0][1].shape[0]
+        self.input_size = self.layers[0][0].shape[0]
+
+    @classmethod
+    def from_arrays(cls, layers, fc1_w, fc1_b, fc2_w, fc2_b) -> "NumpyDeepRNN":
+        """
+        Build from already transposed arrays (layers = [(W_ih^T, W_hh^T, bias), ...])
+        without copying them, e.g. read-only views into a memory-mapped bundle.
+        """
+        model = cls.__new__(cls)
+        model.num_layers = len(layers)
+        model.dtype = fc1_w.dtype
+        model.layers = [tuple(layer) for layer in layers]
+        model.fc1_w, model.fc1_b, model.fc2_w, model.fc2_b = fc1_w, fc1_b, fc2_w, fc2_b
+        model.hidden_size = model.layers[0][1].shape[0]
+        model.input_size = model.layers[0][0].shape[0]
+        return model
+
+    def hidden_states(self, Xseq: np.ndarray) -> List[np.ndarray]:
+        """Final hidden state of every layer (the NumPy equivalent of h_n)."""
+        x = np.asarray(Xseq, dtype=self.dtype)
+        n, seq_len, _ = x.shape
+        h_n = []
+        for w_ih, w_hh, bias in self.layers:
+            # input projection for all timesteps in one matmul
+            proj = x @ w_ih + bias
+            h = np.zeros((n, self.hidden_size), dtype=self.dtype)
+            out = np.empty((n, seq_len, self.hidden_size), dtype=self.dtype)
+            for t in range(seq_len):
+                h = np.tanh(proj[:, t] + h @ w_hh)
+                out[:, t] = h
+            h_n.append(h)
+            x = out
+        return h_n
+
+    def head(self, last_hidden: np.ndarray) -> np.ndarray:
+        """Linear -> ReLU -> Linear on the top layer's hidden state, shape (N, 1)."""
+        z = np.maximum(last_hidden @ self.fc1_w + self.fc1_b, 0)
+        return z @ self.fc2_w + self.fc2_b
+
+    def __call__(self, Xseq: np.ndarray) -> np.ndarray:
+        return self.head(self.hidden_states(Xseq)[-1])
+
+    def predict_sequences(self, Xseq: np.ndarray) -> np.ndarray:
+        return self(Xseq).reshape(-1)
+
+
+def export_numpy_weights(model_path=MODEL_CHECKPOINT, out_path=NUMPY_WEIGHTS_PATH):
+    """Convert the torch checkpoint into a plain .npz (state dict arrays + config)."""
+    import torch
+
+    ckpt = torch.load(model_path, map_location="cpu")
+    cfg = dict(ckpt.get("model_config", {}))
+    cfg.setdefault("hidden_size", 128)
+    cfg.setdefault("num_layers", 3)
+    cfg["feat_per_step"] = int(ckpt.get("feat_per_step"))
+    cfg["seq_len"] = int(ckpt.get("seq_len", None) or 4)
+    arrays = {k: v.detach().cpu().numpy() for k, v in ckpt["model_state_dict"].items()}
+    np.savez(out_path, model_config=np.array(json.dumps(cfg)), **arrays)
+    return out_path
+
+
+def load_numpy_model(weights_path=NUMPY_WEIGHTS_PATH):
+    """Returns (NumpyDeepRNN, feat_per_step, seq_len) from an exported .npz."""
+    weights_path = Path(weights_path)
+    if not weights_path.exists():
+        raise FileNotFoundError(f"NumPy weights not found: {weights_path} (run `python -m scripts.numpy_rnn --export`)")
+    with np.load(weights_path, allow_pickle=False) as z:
+        cfg = json.loads(str(z["model_config"]))
+        state_dict = {k: z[k] for k in z.files if k != "model_config"}
+    model = NumpyDeepRNN(state_dict, num_layers=int(cfg["num_layers"]))
+    return model, int(cfg["feat_per_step"]), int(cfg["seq_len"])
+
+
+def load_numpy_model_and_preproc(weights_path=NUMPY_WEIGHTS_PATH, preproc_path=COMPILED_PREPROC_PATH):
+    """
+    Torch-free counterpart of load_model_and_preproc, same return shape:
+    (model, preproc, feat_per_step, seq_len, device). The compiled .npz
+    preprocessor needs neither sklearn nor pickle.
+    """
+    preproc_path = Path(preproc_path)
+    if not preproc_path.exists():
+        raise FileNotFoundError(f"Compiled preprocessor not found: {preproc_path} (run `python -m scripts.numpy_rnn --export`)")
+    model, feat_per_step, seq_len = load_numpy_model(weights_path)
+    preproc = CompiledPreprocessor.load(preproc_path)
+    return model, preproc, feat_per_step, seq_len, "cpu"
+
+
+def check_parity(csv_path=DEFAULT_CSV, weights_path=NUMPY_WEIGHTS_PATH) -> float:
+    """Max abs difference between the torch and NumPy forwards on the CSV rows."""
+    from scripts.model_inference import load_model_and_preproc, _forward
+
+    torch_model, preproc, feat_per_step, seq_len, device = load_model_and_preproc()
+    np_model, _, _ = load_numpy_model(weights_path)
+    df = pd.read_csv(csv_path)
+    Xseq = _to_sequences(preproc.transform(df[FEATURES]), feat_per_step, seq_len)
+    expected = _forward(torch_model, Xseq, device)
+    got = np_model.predict_sequences(Xseq)
+    return float(np.max(np.abs(expected - got)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export/check the torch-free DeepRNN engine.")
+    parser.add_argument("--export", action="store_true", help="write NumPy weights + compiled preprocessor")
+    parser.add_argument("--check", action="store_true", help="compare against the torch forward")
+    parser.add_argument("--csv", default=str(DEFAULT_CSV))
+    args = parser.parse_args()
+
+    if args.export:
+        export_numpy_weights()
+        with open(PREPROC_PATH, "rb") as f:
+            compile_preprocessor(pickle.load(f)).save(COMPILED_PREPROC_PATH)
+        print(f"📁 Exported {NUMPY_WEIGHTS_PATH} and {COMPILED_PREPROC_PATH}")
+    if args.check:
+        diff = check_parity(args.csv)
+        status = "✅" if diff <= PARITY_ATOL else "❌"
+        print(f"{status} Max abs diff torch vs NumPy: {diff:.3e} (tolerance {PARITY_ATOL:.0e})")
+    if not (args.export or args.check):
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
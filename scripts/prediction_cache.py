@@ -0,0 +1,180 @@
+# scripts/prediction_cache.py
+"""
+Two-tier cache for preprocess_and_predict results.
+
+    tier 1 - in-process LRU (bounded, shared by every Streamlit session)
+    tier 2 - optional MongoDB collection (shared across processes/restarts)
+
+The key is a SHA-256 of the normalized 8-feature vector and the model
+version (content hash of checkpoint + preprocessor, see
+model_registry.artifact_version), so retraining or swapping the artifacts
+invalidates every old entry without any explicit flush.
+"""
+import hashlib
+import math
+import struct
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+import pandas as pd
+from pymongo.errors import PyMongoError
+
+from scripts.model_inference import FEATURES, DEVICE, preprocess_and_predict
+
+COLL_PREDICTION_CACHE = "prediction_cache"
+DEFAULT_MAXSIZE = 4096
+
+
+def _to_float(val: Any) -> float:
+    try:
+        val = float(val)
+    except (TypeError, ValueError):
+        return math.nan
+    if val != val:
+        return math.nan  # one canonical NaN bit pattern
+    # -0.0 and 0.0 scale to the same value
+    return 0.0 if val == 0 else val
+
+
+def _gender_token(val: Any) -> str:
+    # None and NaN go through the preprocessor differently (NaN is imputed), keep them apart
+    if val is None:
+        return "\x00none"
+    if isinstance(val, float) and math.isnan(val):
+        return "\x00nan"
+    return str(val)
+
+
+def feature_key(features, model_version: str) -> str:
+    """
+    Cache key for one feature row (1-row DataFrame, Series or dict).
+    Numeric features are packed as float64 (missing/unparsable -> NaN, which
+    the preprocessor imputes alike); Gender is kept verbatim because the
+    encoder is case-sensitive.
+    """
+    if isinstance(features, pd.DataFrame):
+        if len(features) != 1:
+            raise ValueError(f"feature_key expects a single row, got {len(features)}")
+        features = features.iloc[0]
+    h = hashlib.sha256(model_version.encode())
+    h.update(b"\x00" + _gender_token(features.get("Gender")).encode())
+    h.update(struct.pack(f"<{len(FEATURES) - 1}d", *(_to_float(features.get(f)) for f in FEATURES[1:])))
+    return h.hexdigest()
+
+
+class PredictionCache:
+    """Bounded LRU in front of an optional MongoDB collection, with hit/miss counters."""
+
+    def __init__(self, maxsize: int = DEFAULT_MAXSIZE, collection=None):
+        if maxsize <= 0:
+            raise ValueError(f"maxsize must be positive, got {maxsize}")
+        self.maxsize = maxsize
+        self.collection = collection
+        self._lru: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.mongo_hits = 0
+        self.misses = 0
+
+    def _remember(self, key: str, value: float):
+        with self._lock:
+            self._lru[key] = value
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.maxsize:
+                self._lru.popitem(last=False)
+
+    def get(self, key: str, collection=None) -> Optional[float]:
+        """Cached prediction for key, or None. collection overrides the Mongo tier for this call."""
+        with self._lock:
+            value = self._lru.get(key)
+            if value is not None:
+                self._lru.move_to_end(key)
+                self.memory_hits += 1
+                return value
+
+        collection = collection if collection is not None else self.collection
+        if collection is not None:
+            try:
+                doc = collection.find_one({"_id": key}, {"prediction": 1})
+            except PyMongoError as e:
+                print(f"⚠️ Prediction cache lookup failed: {e}")
+                doc = None
+            if doc is not None:
+                value = float(doc["prediction"])
+                self._remember(key, value)
+                with self._lock:
+                    self.mongo_hits += 1
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, value: float, model_version: str, collection=None):
+        self._remember(key, float(value))
+        collection = collection if collection is not None else self.collection
+        if collection is None:
+            return
+        try:
+            collection.update_one(
+                {"_id": key},
+                {"$set": {"prediction": float(value), "model_version": model_version,
+                          "created_at": datetime.now(timezone.utc)}},
+                upsert=True,
+            )
+        except PyMongoError as e:
+            print(f"⚠️ Prediction cache write failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            hits = self.memory_hits + self.mongo_hits
+            total = hits + self.misses
+            return {
+                "size": len(self._lru),
+                "maxsize": self.maxsize,
+                "memory_hits": self.memory_hits,
+                "mongo_hits": self.mongo_hits,
+                "misses": self.misses,
+                "hit_rate": hits / total if total else 0.0,
+            }
+
+    def clear(self):
+        """Empty the in-process tier and reset the counters (the Mongo tier is left as is)."""
+        with self._lock:
+            self._lru.clear()
+            self.memory_hits = self.mongo_hits = self.misses = 0
+
+
+_DEFAULT_CACHE = PredictionCache()
+
+
+def get_prediction_cache() -> PredictionCache:
+    """Process-wide cache shared by every caller."""
+    return _DEFAULT_CACHE
+
+
+def cached_preprocess_and_predict(df_input: pd.DataFrame, model, preproc, feat_per_step, seq_len, device=DEVICE,
+                                  model_version: str = "", cache: Optional[PredictionCache] = None,
+                                  collection=None) -> float:
+    """
+    preprocess_and_predict with a cache lookup in front.
+    model_version must identify the artifacts (model_registry.get_model_version);
+    collection optionally enables the MongoDB tier for this call.
+    """
+    if not model_version:
+        raise ValueError("model_version is required so new artifacts do not hit stale entries")
+    cache = cache or _DEFAULT_CACHE
+    key = feature_key(df_input, model_version)
+    value = cache.get(key, collection)
+    if value is not None:
+        return value
+    value = preprocess_and_predict(df_input, model, preproc, feat_per_step, seq_len, device)
+    cache.put(key, value, model_version, collection)
+    return value
+
+
+def purge_stale_entries(collection, model_version: str) -> int:
+    """Delete Mongo-tier entries written by other model versions; returns the number removed."""
+    return collection.delete_many({"model_version": {"$ne": model_version}}).deleted_count
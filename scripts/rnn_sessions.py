@@ -0,0 +1,226 @@
+# scripts/rnn_sessions.py
+"""
+Incremental DeepRNN scoring with per-subject hidden state.
+
+A full forward re-runs all seq_len steps of the 3-layer RNN. For live
+sessions, where a subject's inputs arrive one step at a time, the
+RNNSessionCache keeps each subject's per-layer h_n and advances it by one
+RNN step per update:
+
+    h_l = tanh(x W_ih_l^T + b_l + h_l W_hh_l^T)   for l = 0..num_layers-1, x = h_l
+    prediction = fc(h_top)
+
+so an update costs one step instead of a sequence, and after seq_len
+updates the prediction equals the full forward on the same sequence.
+Sessions expire after `ttl_s` without updates and the least recently
+used session is evicted beyond `max_sessions`.
+
+Step inputs are preprocessed feature_per_step vectors, i.e. the rows of
+the (seq_len, feat_per_step) sequence _to_sequences builds;
+feature_steps() produces them for raw FEATURES rows.
+
+Usage:
+    python -m scripts.rnn_sessions --check    # incremental vs full forward on the CSV
+    python -m scripts.rnn_sessions --bench    # one step vs one full sequence
+"""
+import argparse
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Sequence
+
+import numpy as np
+import pandas as pd
+
+from scripts.metrics import inc, stage
+from scripts.model_inference import FEATURES, _to_sequences
+from scripts.numpy_rnn import NumpyDeepRNN, DEFAULT_CSV, PARITY_ATOL
+
+# ==== CONFIGURATION ====
+SESSION_TTL_S = 15 * 60
+MAX_SESSIONS = 10_000
+
+
+def as_numpy_engine(model) -> NumpyDeepRNN:
+    """NumPy engine for a loaded DeepRNN: bundle/NumPy models as is, eager torch models from their state dict."""
+    if isinstance(model, NumpyDeepRNN):
+        return model
+    if hasattr(model, "rnn") and hasattr(model, "state_dict"):
+        state_dict = {k: v.detach().cpu().numpy() for k, v in model.state_dict().items()}
+        return NumpyDeepRNN(state_dict, num_layers=model.rnn.num_layers)
+    raise TypeError(f"incremental scoring needs the eager, bundle or NumPy DeepRNN, got {type(model).__name__}")
+
+
+def feature_steps(df: pd.DataFrame, preproc, feat_per_step: int, seq_len: int) -> np.ndarray:
+    """(N, seq_len, feat_per_step) step inputs for raw FEATURES rows (same as the full forward's input)."""
+    return _to_sequences(preproc.transform(df[FEATURES]), feat_per_step, seq_len)
+
+
+# ==== SESSION CACHE ====
+class RNNSessionCache:
+    """
+    subject id -> (h_n of every layer, steps taken, last update time),
+    in least-recently-updated order. Thread-safe; updates for many
+    subjects are batched into one matmul per layer.
+    """
+
+    def __init__(self, model, ttl_s: float = SESSION_TTL_S, max_sessions: int = MAX_SESSIONS, clock=time.monotonic):
+        if max_sessions <= 0:
+            raise ValueError(f"max_sessions must be positive, got {max_sessions}")
+        self.model = as_numpy_engine(model)
+        self.ttl_s = ttl_s
+        self.max_sessions = max_sessions
+        self._clock = clock
+        self._sessions: "OrderedDict[Hashable, list]" = OrderedDict()  # id -> [h (L, H), steps, last_seen]
+        self._lock = threading.Lock()
+        self.stats = {"steps": 0, "started": 0, "expired": 0, "evicted": 0}
+
+    @classmethod
+    def from_registry(cls, mode: str = "eager", **kwargs) -> "RNNSessionCache":
+        """Session cache over the DeepRNN the model registry serves in this mode (eager or bundle)."""
+        from scripts.model_registry import get_model_and_preproc
+
+        return cls(get_model_and_preproc(mode=mode)[0], **kwargs)
+
+    def _expire(self, now: float):
+        # oldest first: stop at the first session that is still live
+        while self._sessions:
+            sid, session = next(iter(self._sessions.items()))
+            if now - session[2] < self.ttl_s:
+                break
+            del self._sessions[sid]
+            self.stats["expired"] += 1
+
+    def step_many(self, subject_ids: Sequence[Hashable], X_step: np.ndarray) -> np.ndarray:
+        """
+        Advance each subject's session by one step (X_step: (B, feat_per_step),
+        one row per subject id, ids unique) and return the B predictions.
+        Unknown or expired subjects start from a zero state, like the full forward.
+        """
+        model = self.model
+        x = np.asarray(X_step, dtype=model.dtype).reshape(len(subject_ids), -1)
+        if len(set(subject_ids)) != len(subject_ids):
+            raise ValueError("subject_ids must be unique within one step_many call")
+        with self._lock:
+            now = self._clock()
+            self._expire(now)
+            # (layers, batch, hidden): each layer's states are one contiguous block for the matmul
+            h = np.zeros((model.num_layers, len(subject_ids), model.hidden_size), dtype=model.dtype)
+            steps = []
+            for i, sid in enumerate(subject_ids):
+                session = self._sessions.pop(sid, None)
+                if session is None:
+                    self.stats["started"] += 1
+                    steps.append(0)
+                else:
+                    h[:, i] = session[0]
+                    steps.append(session[1])
+
+            with stage("forward"):
+                for l, (w_ih, w_hh, bias) in enumerate(model.layers):
+                    x = np.tanh(x @ w_ih + bias + h[l] @ w_hh)
+                    h[l] = x
+                preds = model.head(x).reshape(-1).astype(np.float64)
+
+            # re-inserted at the most recently used end
+            for i, sid in enumerate(subject_ids):
+                self._sessions[sid] = [h[:, i].copy(), steps[i] + 1, now]
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self.stats["evicted"] += 1
+            self.stats["steps"] += len(subject_ids)
+        inc("session_steps", len(subject_ids))
+        return preds
+
+    def step(self, subject_id: Hashable, x_step: np.ndarray) -> float:
+        """Advance one subject by one step; returns the prediction from its updated state."""
+        return float(self.step_many([subject_id], np.asarray(x_step).reshape(1, -1))[0])
+
+    def steps_taken(self, subject_id: Hashable) -> int:
+        """Steps in the subject's live session (0 when there is none)."""
+        with self._lock:
+            session = self._sessions.get(subject_id)
+            if session is None or self._clock() - session[2] >= self.ttl_s:
+                return 0
+            return session[1]
+
+    def reset(self, subject_id: Hashable) -> bool:
+        """Drop a subject's session (the next step starts from zero state)."""
+        with self._lock:
+            return self._sessions.pop(subject_id, None) is not None
+
+    def clear(self):
+        with self._lock:
+            self._sessions.clear()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self.stats, sessions=len(self._sessions), ttl_s=self.ttl_s, max_sessions=self.max_sessions)
+
+
+# ==== CHECK / BENCH ====
+def check_incremental(csv_path=DEFAULT_CSV, mode: str = "eager") -> float:
+    """Max abs difference between seq_len incremental steps and the full forward on the CSV rows."""
+    from scripts.model_registry import get_model_and_preproc
+    from scripts.model_inference import _forward
+
+    model, preproc, feat_per_step, seq_len, device = get_model_and_preproc(mode=mode)
+    Xseq = feature_steps(pd.read_csv(csv_path), preproc, feat_per_step, seq_len)
+    expected = _forward(model, Xseq, device)
+    cache = RNNSessionCache(model, max_sessions=len(Xseq))
+    ids = list(range(len(Xseq)))
+    for t in range(seq_len):
+        got = cache.step_many(ids, Xseq[:, t])
+    return float(np.max(np.abs(expected - got)))
+
+
+def bench(mode: str = "eager", sessions: int = 1000, batch: int = 1, n: int = 2000) -> Dict[str, float]:
+    """Per-update cost: one incremental step vs re-running the full sequence with the NumPy engine."""
+    from scripts.model_registry import get_model_and_preproc
+
+    model, _, feat_per_step, seq_len, _ = get_model_and_preproc(mode=mode)
+    cache = RNNSessionCache(model, max_sessions=sessions)
+    engine = cache.model
+    rng = np.random.default_rng(0)
+    Xseq = rng.standard_normal((batch, seq_len, feat_per_step)).astype(np.float32)
+    ids_pool = list(range(sessions))
+
+    start = time.perf_counter()
+    for i in range(n):
+        lo = (i * batch) % max(1, sessions - batch + 1)
+        cache.step_many(ids_pool[lo:lo + batch], Xseq[:, i % seq_len])
+    step_us = (time.perf_counter() - start) / n * 1e6
+    start = time.perf_counter()
+    for _ in range(n):
+        engine.predict_sequences(Xseq)
+    full_us = (time.perf_counter() - start) / n * 1e6
+    return {"batch": batch, "step_us": step_us, "full_sequence_us": full_us, "speedup": full_us / step_us}
+
+
+# ==== MAIN ====
+def main():
+    parser = argparse.ArgumentParser(description="Incremental (per-subject hidden state) DeepRNN scoring.")
+    parser.add_argument("--check", action="store_true", help="incremental steps vs full forward on the CSV")
+    parser.add_argument("--bench", action="store_true", help="cost of one step vs one full sequence")
+    parser.add_argument("--mode", default="eager", help="eager | bundle")
+    parser.add_argument("--batch", type=int, default=1, help="--bench: subjects per update")
+    parser.add_argument("--csv", default=str(DEFAULT_CSV))
+    args = parser.parse_args()
+
+    if args.check:
+        diff = check_incremental(args.csv, args.mode)
+        status = "✅" if diff <= PARITY_ATOL else "❌"
+        print(f"{status} Max abs diff incremental vs full forward: {diff:.3e} (tolerance {PARITY_ATOL:.0e})")
+    if args.bench:
+        result = bench(args.mode, batch=args.batch)
+        print(f"⏱️ batch {result['batch']}: step {result['step_us']:.1f} µs vs full sequence "
+              f"{result['full_sequence_us']:.1f} µs ({result['speedup']:.1f}x)")
+    if not (args.check or args.bench):
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
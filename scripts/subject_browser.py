@@ -0,0 +1,193 @@
+# scripts/subject_browser.py
+"""
+Filtered, keyset-paginated browsing of hydration_data.
+
+Filters: Gender, Age range, Initial_Weight_kg range (either document
+layout) and predicted risk (warning flag / percent_loss range of the
+batch-scored `predictions` for one model version).
+
+Pages are ordered by Subject_ID and continue with
+`Subject_ID > last id of the previous page` (seek pagination) instead of
+skip/limit: the server walks the index from the cursor, so page N costs
+the same as page 1. The compound indexes follow the equality, sort,
+range order:
+    hydration_data  browse_gender   Gender, Subject_ID, Age, weight (data / measurements)
+                    browse_subject  Subject_ID, Age, weight (data / measurements), Gender
+    predictions     browse_risk     model_version, warning_>2pct, Subject_ID, percent_loss
+                    browse_percent  model_version, Subject_ID, percent_loss
+so the range filters are checked on index keys and only matching
+documents are fetched. Queries project only the displayed fields.
+
+Risk filters walk `predictions` in Subject_ID order and fetch the page's
+subjects with one $in query; without them, hydration_data is walked
+directly and the page's predictions (if a model version is given) are
+joined the same way.
+
+Used by the dashboard's "Browse Subjects" tab and scripts/data_retirval.py:
+    python -m scripts.data_retirval --gender female --age 20 40 --page-size 20
+    python -m scripts.data_retirval --risk warning --weight 60 90 --after 1200
+"""
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+import pymongo
+
+from scripts.batch_scoring import COLL_HYDRATION, COLL_PREDICTIONS
+
+# ==== CONFIGURATION ====
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+RISK_SCAN_BATCH = 500     # predictions read per round when a risk filter drives the page
+RISK_LEVELS = ("warning", "normal")
+WEIGHT_PATHS = ("data.Initial_Weight_kg", "measurements.Initial_Weight_kg")
+SUBJECT_PROJECTION = {"_id": 0, "Subject_ID": 1, "Gender": 1, "Age": 1, **{p: 1 for p in WEIGHT_PATHS}}
+PREDICTION_PROJECTION = {"_id": 0, "Subject_ID": 1, "predicted_loss_kg": 1, "percent_loss": 1, "warning_>2pct": 1}
+COLUMNS = ["Subject_ID", "Gender", "Age", "Initial_Weight_kg", "predicted_loss_kg", "percent_loss", "warning_>2pct"]
+
+Range = Optional[Tuple[Optional[float], Optional[float]]]
+
+
+# ==== INDEXES ====
+_INDEXED = set()
+
+
+def ensure_browse_indexes(db, force=False):
+    """Compound indexes for every filter combination. Runs once per database per process unless force=True."""
+    key = (id(db.client), db.name)  # not db.client.address: it blocks on server selection
+    if key in _INDEXED and not force:
+        return
+    asc = pymongo.ASCENDING
+    weights = [(p, asc) for p in WEIGHT_PATHS]
+    db[COLL_HYDRATION].create_index([("Gender", asc), ("Subject_ID", asc), ("Age", asc)] + weights,
+                                    name="browse_gender")
+    db[COLL_HYDRATION].create_index([("Subject_ID", asc), ("Age", asc)] + weights + [("Gender", asc)],
+                                    name="browse_subject")
+    db[COLL_PREDICTIONS].create_index([("model_version", asc), ("warning_>2pct", asc), ("Subject_ID", asc),
+                                       ("percent_loss", asc)], name="browse_risk")
+    db[COLL_PREDICTIONS].create_index([("model_version", asc), ("Subject_ID", asc), ("percent_loss", asc)],
+                                      name="browse_percent")
+    _INDEXED.add(key)
+
+
+# ==== QUERIES ====
+def _range(bounds: Range) -> Optional[Dict[str, float]]:
+    if bounds is None:
+        return None
+    lo, hi = bounds
+    cond = {}
+    if lo is not None:
+        cond["$gte"] = lo
+    if hi is not None:
+        cond["$lte"] = hi
+    return cond or None
+
+
+def subject_query(gender: Optional[str] = None, age: Range = None, weight: Range = None) -> Dict[str, Any]:
+    """hydration_data filter; weight matches Initial_Weight_kg in either layout."""
+    query: Dict[str, Any] = {}
+    if gender:
+        query["Gender"] = gender
+    if _range(age):
+        query["Age"] = _range(age)
+    if _range(weight):
+        query["$or"] = [{p: _range(weight)} for p in WEIGHT_PATHS]
+    return query
+
+
+def risk_query(model_version: str, risk: Optional[str] = None, percent_loss: Range = None) -> Dict[str, Any]:
+    """predictions filter for one model version."""
+    if risk is not None and risk not in RISK_LEVELS:
+        raise ValueError(f"Unknown risk level '{risk}', expected one of {RISK_LEVELS}")
+    query: Dict[str, Any] = {"model_version": model_version}
+    if risk is not None:
+        query["warning_>2pct"] = risk == "warning"
+    if _range(percent_loss):
+        query["percent_loss"] = _range(percent_loss)
+    return query
+
+
+def _after(query: Dict[str, Any], after) -> Dict[str, Any]:
+    return dict(query, Subject_ID={"$gt": after}) if after is not None else query
+
+
+def _row(subject: Dict[str, Any], prediction: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    weight = None
+    for block in ("data", "measurements"):
+        if isinstance(subject.get(block), dict) and subject[block].get("Initial_Weight_kg") is not None:
+            weight = subject[block]["Initial_Weight_kg"]
+            break
+    prediction = prediction or {}
+    return {"Subject_ID": subject.get("Subject_ID"), "Gender": subject.get("Gender"), "Age": subject.get("Age"),
+            "Initial_Weight_kg": weight, "predicted_loss_kg": prediction.get("predicted_loss_kg"),
+            "percent_loss": prediction.get("percent_loss"), "warning_>2pct": prediction.get("warning_>2pct")}
+
+
+def _subjects_by_id(db, query: Dict[str, Any], subject_ids: List) -> Dict[Any, Dict[str, Any]]:
+    docs = db[COLL_HYDRATION].find(dict(query, Subject_ID={"$in": subject_ids}), SUBJECT_PROJECTION)
+    return {d["Subject_ID"]: d for d in docs}
+
+
+def _predictions_by_id(db, model_version: str, subject_ids: List) -> Dict[Any, Dict[str, Any]]:
+    docs = db[COLL_PREDICTIONS].find({"model_version": model_version, "Subject_ID": {"$in": subject_ids}},
+                                     PREDICTION_PROJECTION)
+    return {d["Subject_ID"]: d for d in docs}
+
+
+def _page_by_subject(db, query, model_version, after, limit) -> List[Dict[str, Any]]:
+    hint = "browse_gender" if "Gender" in query else "browse_subject"
+    subjects = list(db[COLL_HYDRATION].find(_after(query, after), SUBJECT_PROJECTION)
+                    .sort("Subject_ID", pymongo.ASCENDING).limit(limit).hint(hint))
+    predictions = {}
+    if model_version and subjects:
+        predictions = _predictions_by_id(db, model_version, [s["Subject_ID"] for s in subjects])
+    return [_row(s, predictions.get(s["Subject_ID"])) for s in subjects]
+
+
+def _page_by_risk(db, query, pred_query, after, limit) -> List[Dict[str, Any]]:
+    hint = "browse_risk" if "warning_>2pct" in pred_query else "browse_percent"
+    rows: List[Dict[str, Any]] = []
+    while len(rows) < limit:
+        predictions = list(db[COLL_PREDICTIONS].find(_after(pred_query, after), PREDICTION_PROJECTION)
+                           .sort("Subject_ID", pymongo.ASCENDING).limit(RISK_SCAN_BATCH).hint(hint))
+        if not predictions:
+            break
+        subjects = _subjects_by_id(db, query, [p["Subject_ID"] for p in predictions])
+        for prediction in predictions:
+            subject = subjects.get(prediction["Subject_ID"])
+            if subject is not None:
+                rows.append(_row(subject, prediction))
+                if len(rows) == limit:
+                    break
+        after = predictions[-1]["Subject_ID"]
+        if len(predictions) < RISK_SCAN_BATCH:
+            break
+    return rows
+
+
+def browse_subjects(db, gender: Optional[str] = None, age: Range = None, weight: Range = None,
+                    risk: Optional[str] = None, percent_loss: Range = None, model_version: Optional[str] = None,
+                    after=None, page_size: int = PAGE_SIZE) -> Dict[str, Any]:
+    """
+    One page of matching subjects in Subject_ID order, after the Subject_ID
+    `after` (None = first page). Returns {"rows": [...], "next_after": cursor
+    for the next page or None}. Risk filters need the model_version whose
+    batch predictions they filter; with a model_version and no risk filter
+    the rows still carry that version's predictions.
+    """
+    page_size = max(1, min(int(page_size), MAX_PAGE_SIZE))
+    query = subject_query(gender, age, weight)
+    if risk is not None or _range(percent_loss):
+        if not model_version:
+            raise ValueError("Filtering by predicted risk needs a model_version")
+        rows = _page_by_risk(db, query, risk_query(model_version, risk, percent_loss), after, page_size + 1)
+    else:
+        rows = _page_by_subject(db, query, model_version, after, page_size + 1)
+    # one extra row tells whether there is a next page
+    next_after = rows[page_size - 1]["Subject_ID"] if len(rows) > page_size else None
+    return {"rows": rows[:page_size], "next_after": next_after}
+
+
+def page_frame(page: Dict[str, Any]) -> pd.DataFrame:
+    """The page's rows as a table in display column order."""
+    return pd.DataFrame(page["rows"], columns=COLUMNS)
+
@@ -0,0 +1,468 @@
+# scripts/train_deeprnn.py
+"""
+Scripted DeepRNN training that streams its data (replaces the training
+cell of model/NoSQL_Project.ipynb).
+
+Rows stream from `hydration_data` (server-side feature pipeline, or
+client-side parsing on backends without it) or from sharded CSV files
+(formatted_hydration_data.csv columns) through an IterableDataset. The
+source is cut into shards (Subject_ID ranges / files); with --workers N
+every DataLoader worker reads, preprocesses and shuffles its own shards,
+so nothing is held in memory beyond a shuffle buffer.
+
+Subjects are assigned to train/val/test by a seeded hash of Subject_ID,
+so the split is stable across sources, reruns and worker counts. Seeds
+cover python, NumPy, torch, the per-epoch shuffle and dropout: a rerun
+with the same source, config and --workers reproduces the same weights.
+
+Training follows the notebook (DeepRNN 3x128, dropout 0.3, seq_len 4,
+Adam + MSE) with early stopping on validation RMSE; the best epoch's
+weights are kept. The output directory gets:
+    deep_rnn_state_dict.pt   checkpoint in the format load_model_and_preproc expects
+    preprocessor.pkl         ColumnTransformer fitted on a sample of the train split
+    metrics_table.csv        per-epoch train/val loss, val RMSE and samples/sec
+    test_metrics_table.csv   RMSE / MAE / R2 on the test split
+
+Usage:
+    python -m scripts.train_deeprnn --files "data/shards/*.csv" --workers 2 --out model/deeprnn_trained
+    python -m scripts.train_deeprnn --mongo --workers 4 --out model/deeprnn_trained
+"""
+import argparse
+import copy
+import glob
+import json
+import math
+import pickle
+import random
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+import torch
+import torch.nn as nn
+from torch.utils.data import DataLoader, IterableDataset, get_worker_info
+
+from scripts.batch_scoring import COLL_HYDRATION, SHARDS_PER_WORKER, subject_id_ranges
+from scripts.fast_preprocessor import compile_preprocessor
+from scripts.model_inference import DeepRNN, _to_sequences
+from scripts.mongo_client import get_client
+from scripts.mongo_ml_pipeline import (
+    DB_NAME,
+    FETCH_BATCH_SIZE,
+    NUMERIC_FEATURES,
+    TARGET,
+    iter_feature_batches,
+    parse_record_target,
+    parse_records_to_matrix,
+)
+
+# ==== CONFIGURATION ====
+# the notebook's hyperparameters, plus early stopping
+DEFAULT_CONFIG: Dict[str, Any] = {
+    "hidden_size": 128,
+    "num_layers": 3,
+    "dropout": 0.3,
+    "seq_len": 4,
+    "lr": 1e-3,
+    "batch_size": 16,
+    "epochs": 20,
+    "patience": 5,        # epochs without a val RMSE improvement before stopping
+    "min_delta": 0.0,
+    "seed": 42,
+}
+TEST_FRACTION = 0.2       # of all subjects, as the notebook's train_test_split
+VAL_FRACTION = 0.15       # of the remaining train subjects, as the notebook's validation split
+SPLITS = ("train", "val", "test")
+SHUFFLE_BUFFER = 20_000   # rows each worker shuffles at once
+BATCHES_PER_BLOCK = 64    # mini-batches per item handed from a worker to the trainer
+FIT_SAMPLE_ROWS = 200_000 # train rows the preprocessor is fitted on
+CSV_CHUNK_ROWS = 100_000
+
+CHECKPOINT_NAME = "deep_rnn_state_dict.pt"
+PREPROC_NAME = "preprocessor.pkl"
+METRICS_NAME = "metrics_table.csv"
+TEST_METRICS_NAME = "test_metrics_table.csv"
+CONFIG_NAME = "train_config.json"
+
+
+def seed_everything(seed: int):
+    random.seed(seed)
+    np.random.seed(seed)
+    torch.manual_seed(seed)
+
+
+# ==== SUBJECT SPLIT ====
+def _mix64(x: np.ndarray) -> np.ndarray:
+    """splitmix64 finalizer: a well-spread uint64 hash of every element."""
+    x = x.astype(np.uint64)
+    with np.errstate(over="ignore"):
+        x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return x ^ (x >> np.uint64(31))
+
+
+def _unit_hash(subject_ids: np.ndarray, seed: int, salt: int = 0) -> np.ndarray:
+    """Deterministic value in [0, 1) per Subject_ID."""
+    ids = np.asarray(subject_ids).astype(np.int64).astype(np.uint64)
+    key = np.uint64((seed * 0x9E3779B1 + salt) & 0xFFFFFFFFFFFFFFFF)
+    return (_mix64(ids ^ key) >> np.uint64(11)).astype(np.float64) / float(1 << 53)
+
+
+def split_of(subject_ids: np.ndarray, seed: int) -> np.ndarray:
+    """0 (train), 1 (val) or 2 (test) per Subject_ID."""
+    u = _unit_hash(subject_ids, seed)
+    val_end = TEST_FRACTION + (1 - TEST_FRACTION) * VAL_FRACTION
+    return np.where(u < TEST_FRACTION, 2, np.where(u < val_end, 1, 0)).astype(np.int8)
+
+
+# ==== SOURCES ====
+# A source lists its shards and reads one shard as (subject_ids, gender, X, y)
+# chunks: X holds NUMERIC_FEATURES (NaN where missing), y the TARGET.
+class CsvShardSource:
+    """CSV files with the formatted_hydration_data columns, one shard per file."""
+
+    def __init__(self, patterns: Sequence[str], chunk_rows: int = CSV_CHUNK_ROWS):
+        self.files = sorted({f for pattern in patterns for f in glob.glob(str(pattern))})
+        if not self.files:
+            raise FileNotFoundError(f"No CSV shards match {list(patterns)}")
+        self.chunk_rows = chunk_rows
+
+    def shards(self) -> List[str]:
+        return list(self.files)
+
+    def read(self, shard: str) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]]:
+        for df in pd.read_csv(shard, chunksize=self.chunk_rows):
+            if "Subject_ID" not in df.columns:
+                raise ValueError(f"{shard} has no Subject_ID column (needed for the train/val/test split)")
+            yield (df["Subject_ID"].to_numpy(), df["Gender"].to_numpy(dtype=object),
+                   df[NUMERIC_FEATURES].to_numpy(dtype=np.float64), df[TARGET].to_numpy(dtype=np.float64))
+
+
+class MongoSource:
+    """
+    hydration_data, one shard per Subject_ID range. Workers open their own
+    client (get_client is per process). server_side=False parses documents
+    on the client, for backends without the aggregation operators the
+    feature pipeline needs (mongomock); `db` passes an in-process database.
+    """
+
+    def __init__(self, mongo_uri: Optional[str] = None, n_shards: int = SHARDS_PER_WORKER, server_side: bool = True,
+                 db=None, batch_size: int = FETCH_BATCH_SIZE):
+        self.mongo_uri = mongo_uri
+        self.server_side = server_side
+        self.db = db
+        self.batch_size = batch_size
+        self.ranges = subject_id_ranges(self._collection(), n_shards)
+        if not self.ranges:
+            raise ValueError(f"{COLL_HYDRATION} is empty")
+
+    def _collection(self):
+        db = self.db if self.db is not None else get_client(self.mongo_uri)[DB_NAME]
+        return db[COLL_HYDRATION]
+
+    def shards(self) -> List[Tuple[int, int]]:
+        return list(self.ranges)
+
+    def read(self, shard: Tuple[int, int]) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]]:
+        match = {"Subject_ID": {"$gte": shard[0], "$lt": shard[1]}}
+        col = self._collection()
+        if self.server_side:
+            yield from iter_feature_batches(col, match, self.batch_size, with_target=True)
+            return
+        cursor = col.find(match, batch_size=self.batch_size).sort("Subject_ID", 1)
+        docs: List[Dict[str, Any]] = []
+        for doc in cursor:
+            docs.append(doc)
+            if len(docs) >= self.batch_size:
+                yield self._columns(docs)
+                docs = []
+        if docs:
+            yield self._columns(docs)
+
+    @staticmethod
+    def _columns(docs: List[Dict[str, Any]]):
+        gender, X = parse_records_to_matrix(docs)
+        y = np.array([parse_record_target(d) for d in docs], dtype=np.float64)
+        return np.array([d.get("Subject_ID") for d in docs]), gender, X, y
+
+
+def _iter_split(source, shards, split: int, seed: int):
+    """(gender, X, y) chunks of one split, rows without a target dropped."""
+    for shard in shards:
+        for subject_ids, gender, X, y in source.read(shard):
+            keep = (split_of(subject_ids, seed) == split) & np.isfinite(y)
+            if keep.any():
+                yield gender[keep], X[keep], y[keep]
+
+
+# ==== DATASET ====
+class HydrationStream(IterableDataset):
+    """
+    One split of a source as blocks of preprocessed (N, seq_len, feat_per_step)
+    sequences and targets. Each DataLoader worker takes every num_workers-th
+    shard; the train split is shuffled through a buffer seeded by
+    (seed, epoch, worker), val/test keep source order.
+    """
+
+    def __init__(self, source, split: str, preproc, feat_per_step: int, seq_len: int, batch_size: int,
+                 seed: int, shuffle_buffer: int = 0):
+        self.source = source
+        self.split = SPLITS.index(split)
+        self.preproc = preproc
+        self.feat_per_step = feat_per_step
+        self.seq_len = seq_len
+        self.block_rows = batch_size * BATCHES_PER_BLOCK
+        self.seed = seed
+        self.shuffle_buffer = shuffle_buffer
+        self.epoch = 0
+
+    def set_epoch(self, epoch: int):
+        self.epoch = epoch
+
+    def _cut(self, X: np.ndarray, y: np.ndarray, rng, final: bool):
+        """Shuffle the buffer and cut it into blocks; returns (blocks, rows carried into the next round)."""
+        if rng is not None:
+            perm = rng.permutation(len(y))
+            X, y = X[perm], y[perm]
+        full = len(y) if final else len(y) - len(y) % self.block_rows
+        blocks = [(X[i:i + self.block_rows], y[i:i + self.block_rows]) for i in range(0, full, self.block_rows)]
+        return blocks, (X[full:], y[full:])
+
+    def __iter__(self):
+        info = get_worker_info()
+        worker_id, num_workers = (info.id, info.num_workers) if info is not None else (0, 1)
+        shards = self.source.shards()[worker_id::num_workers]
+        rng = None
+        if self.shuffle_buffer:
+            rng = np.random.default_rng([self.seed, self.epoch, worker_id])
+            shards = [shards[i] for i in rng.permutation(len(shards))]
+        threshold = max(self.shuffle_buffer, self.block_rows)
+
+        X_parts, y_parts, buffered = [], [], 0
+        for gender, X, y in _iter_split(self.source, shards, self.split, self.seed):
+            Xpr = self.preproc.transform_arrays(X, gender)
+            X_parts.append(_to_sequences(Xpr, self.feat_per_step, self.seq_len).astype(np.float32))
+            y_parts.append(y.astype(np.float32))
+            buffered += len(y)
+            if buffered < threshold:
+                continue
+            blocks, (X_rest, y_rest) = self._cut(np.concatenate(X_parts), np.concatenate(y_parts), rng, final=False)
+            for Xb, yb in blocks:
+                yield torch.from_numpy(Xb), torch.from_numpy(yb)
+            X_parts, y_parts, buffered = [X_rest], [y_rest], len(y_rest)
+        if buffered:
+            blocks, _ = self._cut(np.concatenate(X_parts), np.concatenate(y_parts), rng, final=True)
+            for Xb, yb in blocks:
+                yield torch.from_numpy(Xb), torch.from_numpy(yb)
+
+
+def _init_worker(_worker_id: int):
+    # one intra-op thread per loader worker; the workers provide the parallelism
+    torch.set_num_threads(1)
+
+
+def _loader(dataset: HydrationStream, workers: int, seed: int) -> DataLoader:
+    # own generator: the loader's base seed does not consume the global (dropout) RNG
+    return DataLoader(dataset, batch_size=None, num_workers=workers,
+                      worker_init_fn=_init_worker if workers else None,
+                      generator=torch.Generator().manual_seed(seed))
+
+
+# ==== PREPROCESSOR ====
+def fit_preprocessor(source, seed: int, max_rows: int = FIT_SAMPLE_ROWS):
+    """
+    Fit the notebook's ColumnTransformer on a bounded sample of the train
+    split: the max_rows train rows with the smallest seeded Subject_ID hash,
+    independent of shard order.
+    """
+    from scripts.model_zoo import build_preprocessor
+
+    keys, genders, Xs = np.empty(0), np.empty(0, dtype=object), np.empty((0, len(NUMERIC_FEATURES)))
+    for shard in source.shards():
+        for subject_ids, gender, X, y in source.read(shard):
+            keep = (split_of(subject_ids, seed) == 0) & np.isfinite(y)
+            keys = np.concatenate([keys, _unit_hash(subject_ids[keep], seed, salt=1)])
+            genders = np.concatenate([genders, gender[keep]])
+            Xs = np.concatenate([Xs, X[keep]])
+            if len(keys) > max_rows:
+                top = np.argpartition(keys, max_rows)[:max_rows]
+                keys, genders, Xs = keys[top], genders[top], Xs[top]
+    if not len(keys):
+        raise ValueError("The train split is empty")
+    df = pd.DataFrame(Xs, columns=NUMERIC_FEATURES)
+    df.insert(0, "Gender", genders)
+    return build_preprocessor().fit(df)
+
+
+# ==== TRAINING ====
+def evaluate(model, dataset: HydrationStream, workers: int = 0, seed: int = 0) -> Dict[str, float]:
+    """MSE / RMSE / MAE / R2 of the model over one split, accumulated batch by batch."""
+    n, sse, sae, sum_y, sum_y2 = 0, 0.0, 0.0, 0.0, 0.0
+    model.eval()
+    with torch.no_grad():
+        for Xb, yb in _loader(dataset, workers, seed):
+            pred = model(Xb).reshape(-1).double()
+            y = yb.double()
+            n += len(y)
+            sse += float(((pred - y) ** 2).sum())
+            sae += float((pred - y).abs().sum())
+            sum_y += float(y.sum())
+            sum_y2 += float((y ** 2).sum())
+    if not n:
+        return {"n": 0, "MSE": float("nan"), "RMSE": float("nan"), "MAE": float("nan"), "R2": float("nan")}
+    ss_tot = sum_y2 - sum_y ** 2 / n
+    return {"n": n, "MSE": sse / n, "RMSE": math.sqrt(sse / n), "MAE": sae / n,
+            "R2": 1 - sse / ss_tot if ss_tot > 0 else float("nan")}
+
+
+def train(source, config: Optional[Dict[str, Any]] = None, out_dir=None, workers: int = 0,
+          on_epoch: Optional[Callable[[int, Dict[str, float]], bool]] = None,
+          verbose: bool = True) -> Dict[str, Any]:
+    """
+    Train a DeepRNN on a source and return the run summary (history,
+    best epoch, val/test metrics, samples/sec). Artifacts are written to
+    out_dir when given. on_epoch(epoch, row) is called after every epoch;
+    returning True stops the run (e.g. pruning in a hyperparameter search).
+    """
+    cfg = dict(DEFAULT_CONFIG, **(config or {}))
+    seed, seq_len, batch_size = cfg["seed"], cfg["seq_len"], cfg["batch_size"]
+    seed_everything(seed)
+    log = print if verbose else (lambda *a, **k: None)
+
+    preproc = fit_preprocessor(source, seed)
+    compiled = compile_preprocessor(preproc)
+    n_features = compiled.transform_arrays(np.zeros((1, len(NUMERIC_FEATURES))), np.array(["female"])).shape[1]
+    feat_per_step = math.ceil(n_features / seq_len)
+
+    def stream(split, shuffle_buffer=0):
+        return HydrationStream(source, split, compiled, feat_per_step, seq_len, batch_size, seed, shuffle_buffer)
+
+    train_ds, val_ds, test_ds = stream("train", SHUFFLE_BUFFER), stream("val"), stream("test")
+    model = DeepRNN(feat_per_step, cfg["hidden_size"], cfg["num_layers"], cfg["dropout"])
+    criterion = nn.MSELoss()
+    optimizer = torch.optim.Adam(model.parameters(), lr=cfg["lr"])
+
+    history: List[Dict[str, float]] = []
+    best_rmse, best_epoch, best_state, stale = float("inf"), 0, None, 0
+    stopped = "max_epochs"
+    total_samples, total_seconds = 0, 0.0
+    for epoch in range(1, cfg["epochs"] + 1):
+        train_ds.set_epoch(epoch)
+        model.train()
+        samples, loss_sum = 0, 0.0
+        start = time.perf_counter()
+        for Xb, yb in _loader(train_ds, workers, seed + epoch):
+            for i in range(0, len(yb), batch_size):
+                xb, tb = Xb[i:i + batch_size], yb[i:i + batch_size].unsqueeze(1)
+                optimizer.zero_grad()
+                loss = criterion(model(xb), tb)
+                loss.backward()
+                optimizer.step()
+                loss_sum += loss.item() * len(tb)
+                samples += len(tb)
+        seconds = time.perf_counter() - start
+        if not samples:
+            raise ValueError("The train split is empty")
+        total_samples += samples
+        total_seconds += seconds
+
+        val = evaluate(model, val_ds, workers, seed)
+        row = {"epoch": epoch, "train_loss": loss_sum / samples, "val_loss": val["MSE"], "val_rmse": val["RMSE"],
+               "samples_per_sec": samples / seconds}
+        history.append(row)
+        log(f"📈 epoch {epoch:3d}  train {row['train_loss']:.5f}  val {row['val_loss']:.5f}  "
+            f"val RMSE {row['val_rmse']:.4f}  {row['samples_per_sec']:,.0f} samples/s")
+
+        if val["RMSE"] < best_rmse - cfg["min_delta"]:
+            best_rmse, best_epoch, stale = val["RMSE"], epoch, 0
+            best_state = copy.deepcopy(model.state_dict())
+        else:
+            stale += 1
+        if on_epoch is not None and on_epoch(epoch, row):
+            stopped = "pruned"
+            break
+        if stale >= cfg["patience"]:
+            stopped = "early_stopping"
+            log(f"⏹️ No val RMSE improvement for {stale} epochs, stopping (best epoch {best_epoch})")
+            break
+
+    if best_state is not None:
+        model.load_state_dict(best_state)
+    test = evaluate(model, test_ds, workers, seed) if stopped != "pruned" else {}
+    result = {
+        "config": cfg,
+        "feat_per_step": feat_per_step,
+        "history": history,
+        "best_epoch": best_epoch,
+        "val_rmse": best_rmse,
+        "test": test,
+        "stopped": stopped,
+        "samples_per_sec": total_samples / total_seconds if total_seconds else 0.0,
+    }
+    if out_dir is not None:
+        save_artifacts(out_dir, model, preproc, result)
+        log(f"💾 Artifacts saved to {out_dir}")
+    return result
+
+
+def model_config_block(config: Dict[str, Any], feat_per_step: int) -> Dict[str, Any]:
+    """The checkpoint's model_config block for a training config."""
+    return {"hidden_size": config["hidden_size"], "num_layers": config["num_layers"],
+            "dropout": config["dropout"], "input_size": feat_per_step}
+
+
+def save_artifacts(out_dir, model, preproc, result: Dict[str, Any]):
+    """Checkpoint, preprocessor and metric tables laid out like model/deeprnn_artifacts."""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    cfg, feat_per_step = result["config"], result["feat_per_step"]
+    torch.save({
+        "model_state_dict": model.state_dict(),
+        "model_config": model_config_block(cfg, feat_per_step),
+        "feat_per_step": feat_per_step,
+        "seq_len": cfg["seq_len"],
+    }, out_dir / CHECKPOINT_NAME)
+    with open(out_dir / PREPROC_NAME, "wb") as f:
+        pickle.dump(preproc, f)
+    pd.DataFrame(result["history"]).to_csv(out_dir / METRICS_NAME, index=False)
+    test = result["test"]
+    pd.DataFrame({"metric": ["RMSE", "MAE", "R2"], "value": [test.get(k) for k in ("RMSE", "MAE", "R2")]}).to_csv(
+        out_dir / TEST_METRICS_NAME, index=False)
+    summary = {k: result[k] for k in ("config", "best_epoch", "val_rmse", "stopped", "samples_per_sec")}
+    (out_dir / CONFIG_NAME).write_text(json.dumps(dict(summary, test=test), indent=2))
+
+
+# ==== MAIN ====
+def main():
+    parser = argparse.ArgumentParser(description="Train the DeepRNN from streamed hydration_data or CSV shards.")
+    source_group = parser.add_mutually_exclusive_group(required=True)
+    source_group.add_argument("--files", nargs="+", help="CSV shard paths or glob patterns")
+    source_group.add_argument("--mongo", action="store_true", help=f"stream {COLL_HYDRATION}")
+    parser.add_argument("--mongo-uri", default=None, help="default: HYDRA_MONGO_URI")
+    parser.add_argument("--client-side", action="store_true",
+                        help="--mongo: parse documents on the client instead of the aggregation pipeline")
+    parser.add_argument("--workers", type=int, default=0, help="DataLoader worker processes (0 = in-process)")
+    parser.add_argument("--out", required=True, help="artifact directory (model/deeprnn_artifacts holds the shipped model)")
+    for key in ("hidden_size", "num_layers", "batch_size", "epochs", "patience", "seed"):
+        parser.add_argument(f"--{key.replace('_', '-')}", type=int, default=DEFAULT_CONFIG[key])
+    for key in ("dropout", "lr", "min_delta"):
+        parser.add_argument(f"--{key.replace('_', '-')}", type=float, default=DEFAULT_CONFIG[key])
+    args = parser.parse_args()
+
+    if args.files:
+        source = CsvShardSource(args.files)
+    else:
+        source = MongoSource(args.mongo_uri, n_shards=max(1, args.workers) * SHARDS_PER_WORKER,
+                             server_side=not args.client_side)
+    config = {k: getattr(args, k) for k in DEFAULT_CONFIG if k != "seq_len"}
+    result = train(source, config, args.out, workers=args.workers)
+    test = result["test"]
+    print(f"✅ Best epoch {result['best_epoch']} (val RMSE {result['val_rmse']:.4f}, {result['stopped']}); "
+          f"test RMSE {test['RMSE']:.4f}  MAE {test['MAE']:.4f}  R2 {test['R2']:.4f}")
+    print(f"⏱️ {result['samples_per_sec']:,.0f} training samples/sec")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,133 +1,227 @@
 import matplotlib.pyplot as plt
 import matplotlib.image as mpimg
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
 import numpy as np
+import io
 import os
 import base64
+import threading
+from PIL import Image
 
-def make_water_loss_viz(initial_weight_kg: float,
-                        predicted_loss_kg: float,
-                        age: int,
-                        gender: str,
-                        image_path: str = "assets/body_water_ref.png",
-                        save_path: str = "assets/hydration_viz.png",
-                        return_base64: bool = False) -> dict:
-    """
-    Generate a hydration visualization showing body composition and water loss percentage.
-    Displays a body image at the top and a summary table + hydration bar below it.
-    """
+from scripts.metrics import stage
+
+# percent of body weight lost above which a dehydration warning is raised
+WARNING_PCT_THRESHOLD = 2.25
+# zlib level for the in-memory PNG (1 = fastest, 9 = smallest)
+PNG_COMPRESS_LEVEL = 1
 
-    # --- Step 1: Define average body water percentage by life stage ---
+def avg_body_water_pct(age: int, gender: str) -> float:
+    """Average body water percentage by life stage."""
     if age < 2:
-        avg_water_pct = 80
+        return 80
     elif age < 12:
-        avg_water_pct = 70 if age < 5 else 65
+        return 70 if age < 5 else 65
     elif gender.lower() == "female":
-        avg_water_pct = 55
+        return 55
     elif age > 60:
-        avg_water_pct = 50
-    else:
-        avg_water_pct = 60
+        return 50
+    return 60
 
-    # --- Step 2: Compute percentages ---
+def hydration_metrics(initial_weight_kg: float, predicted_loss_kg: float, age: int, gender: str) -> dict:
+    """The numbers shown by the visualization (no rendering)."""
+    avg_water_pct = avg_body_water_pct(age, gender)
     percent_loss = (predicted_loss_kg / initial_weight_kg) * 100
-    remaining_water = avg_water_pct - percent_loss
-    warning = percent_loss > 2.25
-
-    # --- Step 3: Load image if available ---
-    img = mpimg.imread(image_path) if os.path.exists(image_path) else None
-
-    # --- Step 4: Create figure ---
-    fig = plt.figure(figsize=(5, 8))
-    gs = fig.add_gridspec(2, 1, height_ratios=[2, 1.8])  # top: image, bottom: table + bar
-
-    # --- Top subplot: image ---
-    ax_img = fig.add_subplot(gs[0])
-    ax_img.axis("off")
-    if img is not None:
-        ax_img.imshow(img, aspect='equal')
-        ax_img.set_anchor('C')
-        ax_img.set_position([0.15, 0.55, 0.7, 0.35])  # x, y, width, height
-    else:
-        ax_img.text(0.5, 0.5, "Image not found", ha="center", va="center", fontsize=12, color="gray")
-
-    # --- Bottom subplot: summary + neat horizontal bar ---
-    ax = fig.add_subplot(gs[1])
-    ax.axis("off")
-
-    # Create table data
-    table_data = [
-        ["Initial weight (kg)", f"{initial_weight_kg:.2f}"],
-        ["Predicted water loss (kg)", f"{predicted_loss_kg:.3f}"],
-        ["% Body weight lost", f"{percent_loss:.2f}%"],
-        ["Avg body water %", f"{avg_water_pct:.1f}%"],
-        ["Remaining water %", f"{remaining_water:.2f}%"],
-    ]
-
-    # Add table
-    table = ax.table(cellText=table_data,
-                     colLabels=["Metric", "Value"],
-                     loc="upper center",
-                     colWidths=[0.6, 0.4])
-    table.auto_set_font_size(False)
-    table.set_fontsize(9.5)
-    table.scale(1, 1.4)
-
-    # Style the header
-    for (row, col), cell in table.get_celld().items():
-        if row == 0:
-            cell.set_text_props(weight="bold", color="white")
-            cell.set_facecolor("#007acc")
-        else:
-            cell.set_facecolor("#f2f8fd")
-
-    # --- Alert message ---
-    alert_y = 1.09
-    if warning:
-        ax.text(0.02, alert_y, "⚠️ Predicted water loss exceeds 2.25% — dehydration risk!",
-                color="red", fontsize=11, fontweight="bold", va="top", transform=ax.transAxes)
-    else:
-        ax.text(0.02, alert_y, "Hydration levels within safe range.",
-                color="green", fontsize=11, fontweight="bold", va="top", transform=ax.transAxes)
-
-    # --- Clean horizontal hydration bar ---
-    bar_y = 0.25   # lowered to appear below the table
-    bar_height = 0.12
-
-    # Background (100% total body water)
-    ax.barh(bar_y, 100, color="#e0e0e0", height=bar_height, edgecolor="gray", zorder=1)
-
-    # Average body water (light blue)
-    ax.barh(bar_y, avg_water_pct, color="#64bae5", height=bar_height, edgecolor="none", zorder=2)
-
-    # Predicted loss overlay (bright blue)
-    ax.barh(bar_y, percent_loss, color="#fb2626", height=bar_height, edgecolor="none", zorder=3)
+    return {
+        "percent_loss": percent_loss,
+        "avg_water_pct": avg_water_pct,
+        "remaining_water_pct": avg_water_pct - percent_loss,
+        "warning_>2pct": percent_loss > WARNING_PCT_THRESHOLD,
+    }
 
-    # Labels
-    ax.text(avg_water_pct + 1.5, bar_y, f"Avg {avg_water_pct:.1f}%", va="center", fontsize=9, zorder=4)
-    ax.text(percent_loss + 1.5, bar_y + 0.09, f"Lost {percent_loss:.2f}%", va="center", fontsize=9, color="#fb2626", zorder=4)
-    ax.text(101, bar_y, "100%", va="center", fontsize=9, color="gray", zorder=4)
 
-    ax.set_xlim(0, max(105, avg_water_pct + 10))
-    ax.set_ylim(0, 1.0)   # ensures the bar stays fully visible below the table
+class WaterLossVizRenderer:
+    """
+    Render-once template for the hydration visualization.
+
+    The reference image, table, background bar and layout are drawn once
+    into a cached raster. A render restores that raster, draws only the
+    dynamic artists (table values, alert, bars and their labels) on top
+    and encodes the PNG in memory. The canvas is sized to the tight
+    bounding box once, at construction. One renderer is shared per image path; renders are serialized
+    by a lock, PNG encoding runs outside it.
+    """
 
-    # Remove ticks and spines
-    ax.set_xticks([])
-    ax.set_yticks([])
-    for spine in ax.spines.values():
-        spine.set_visible(False)
+    TABLE_ROWS = ["Initial weight (kg)", "Predicted water loss (kg)", "% Body weight lost",
+                  "Avg body water %", "Remaining water %"]
+    BAR_Y = 0.25   # lowered to appear below the table
+    BAR_HEIGHT = 0.12
+    # avg body water is at most 80%, so max(105, avg + 10) is always 105
+    XLIM = (0, 105)
+
+    def __init__(self, image_path: str = "assets/body_water_ref.png", dpi: int = 150):
+        self.image_path = image_path
+        self.dpi = dpi
+        self._lock = threading.Lock()
+        img = mpimg.imread(image_path) if os.path.exists(image_path) else None
+
+        fig = Figure(figsize=(5, 8), dpi=dpi)
+        FigureCanvasAgg(fig)
+        gs = fig.add_gridspec(2, 1, height_ratios=[2, 1.8])  # top: image, bottom: table + bar
+
+        # --- Top subplot: image ---
+        ax_img = fig.add_subplot(gs[0])
+        ax_img.axis("off")
+        if img is not None:
+            ax_img.imshow(img, aspect='equal')
+            ax_img.set_anchor('C')
+            ax_img.set_position([0.15, 0.55, 0.7, 0.35])  # x, y, width, height
+        else:
+            ax_img.text(0.5, 0.5, "Image not found", ha="center", va="center", fontsize=12, color="gray")
+
+        # --- Bottom subplot: summary + neat horizontal bar ---
+        ax = fig.add_subplot(gs[1])
+        ax.axis("off")
+
+        table = ax.table(cellText=[[label, ""] for label in self.TABLE_ROWS],
+                         colLabels=["Metric", "Value"],
+                         loc="upper center",
+                         colWidths=[0.6, 0.4])
+        table.auto_set_font_size(False)
+        table.set_fontsize(9.5)
+        table.scale(1, 1.4)
+        for (row, col), cell in table.get_celld().items():
+            if row == 0:
+                cell.set_text_props(weight="bold", color="white")
+                cell.set_facecolor("#007acc")
+            else:
+                cell.set_facecolor("#f2f8fd")
+        self._values = [table[row, 1].get_text() for row in range(1, len(self.TABLE_ROWS) + 1)]
+
+        # --- Alert message ---
+        self._alert = ax.text(0.02, 1.09, "", fontsize=11, fontweight="bold", va="top", transform=ax.transAxes)
+
+        # --- Clean horizontal hydration bar ---
+        ax.barh(self.BAR_Y, 100, color="#e0e0e0", height=self.BAR_HEIGHT, edgecolor="gray", zorder=1)
+        self._avg_bar = ax.barh(self.BAR_Y, 0, color="#64bae5", height=self.BAR_HEIGHT, edgecolor="none", zorder=2)[0]
+        self._loss_bar = ax.barh(self.BAR_Y, 0, color="#fb2626", height=self.BAR_HEIGHT, edgecolor="none", zorder=3)[0]
+        self._avg_label = ax.text(0, self.BAR_Y, "", va="center", fontsize=9, zorder=4)
+        self._loss_label = ax.text(0, self.BAR_Y + 0.09, "", va="center", fontsize=9, color="#fb2626", zorder=4)
+        ax.text(101, self.BAR_Y, "100%", va="center", fontsize=9, color="gray", zorder=4)
+
+        ax.set_xlim(*self.XLIM)
+        ax.set_ylim(0, 1.0)   # ensures the bar stays fully visible below the table
+        ax.set_xticks([])
+        ax.set_yticks([])
+        for spine in ax.spines.values():
+            spine.set_visible(False)
+        self.fig = fig
+
+        # dynamic artists in draw order (the table value texts are drawn by their cells in the static pass)
+        self._dynamic = [self._avg_bar, self._loss_bar, self._avg_label, self._loss_label, self._alert]
+
+        # static layout: computed once for a representative (widest) state
+        self._update(70.0, 1.0, {"percent_loss": 3.43, "avg_water_pct": 60, "remaining_water_pct": 56.57,
+                                 "warning_>2pct": True})
+        fig.subplots_adjust(hspace=0.6)
+        fig.tight_layout()
+        # what savefig(bbox_inches="tight") does on every call, done once: grow/shrink the
+        # canvas to the tight bounding box (the alert may overhang) and shift the axes
+        bbox = fig.get_tightbbox(fig.canvas.get_renderer()).padded(plt.rcParams["savefig.pad_inches"])
+        width, height = fig.get_size_inches()
+        positions = [(axes, axes.get_position(original=False)) for axes in fig.axes]
+        fig.set_size_inches(bbox.width, bbox.height)
+        for axes, pos in positions:
+            axes.set_position([(pos.x0 * width - bbox.x0) / bbox.width, (pos.y0 * height - bbox.y0) / bbox.height,
+                               pos.width * width / bbox.width, pos.height * height / bbox.height])
+
+        # cached raster of everything static
+        for text in self._values:
+            text.set_text("")
+        for artist in self._dynamic:
+            artist.set_animated(True)
+        fig.canvas.draw()
+        self._background = fig.canvas.copy_from_bbox(fig.bbox)
+
+    def _update(self, initial_weight_kg: float, predicted_loss_kg: float, metrics: dict):
+        percent_loss = metrics["percent_loss"]
+        avg_water_pct = metrics["avg_water_pct"]
+        values = [f"{initial_weight_kg:.2f}", f"{predicted_loss_kg:.3f}", f"{percent_loss:.2f}%",
+                  f"{avg_water_pct:.1f}%", f"{metrics['remaining_water_pct']:.2f}%"]
+        for text, value in zip(self._values, values):
+            text.set_text(value)
+
+        if metrics["warning_>2pct"]:
+            self._alert.set_text(f"⚠️ Predicted water loss exceeds {WARNING_PCT_THRESHOLD}% — dehydration risk!")
+            self._alert.set_color("red")
+        else:
+            self._alert.set_text("Hydration levels within safe range.")
+            self._alert.set_color("green")
+
+        self._avg_bar.set_width(avg_water_pct)
+        self._loss_bar.set_width(percent_loss)
+        self._avg_label.set_x(avg_water_pct + 1.5)
+        self._avg_label.set_text(f"Avg {avg_water_pct:.1f}%")
+        self._loss_label.set_x(percent_loss + 1.5)
+        self._loss_label.set_text(f"Lost {percent_loss:.2f}%")
+
+    def render(self, initial_weight_kg: float, predicted_loss_kg: float, age: int, gender: str):
+        """Returns (png_bytes, metrics)."""
+        metrics = hydration_metrics(initial_weight_kg, predicted_loss_kg, age, gender)
+        canvas = self.fig.canvas
+        with self._lock:
+            self._update(initial_weight_kg, predicted_loss_kg, metrics)
+            canvas.restore_region(self._background)
+            for artist in self._dynamic + self._values:
+                self.fig.draw_artist(artist)
+            # the figure is opaque: encode RGB (a quarter less data than RGBA)
+            rgb = np.array(np.asarray(canvas.buffer_rgba())[..., :3])
+        buf = io.BytesIO()
+        Image.fromarray(rgb, "RGB").save(buf, format="png", compress_level=PNG_COMPRESS_LEVEL)
+        return buf.getvalue(), metrics
+
+
+_RENDERERS = {}
+_RENDERERS_LOCK = threading.Lock()
+
+def get_viz_renderer(image_path: str = "assets/body_water_ref.png") -> WaterLossVizRenderer:
+    """Shared renderer for image_path (rebuilt when the reference image changes on disk)."""
+    stamp = os.stat(image_path).st_mtime_ns if os.path.exists(image_path) else None
+    with _RENDERERS_LOCK:
+        entry = _RENDERERS.get(image_path)
+        if entry is None or entry[0] != stamp:
+            entry = (stamp, WaterLossVizRenderer(image_path))
+            _RENDERERS[image_path] = entry
+        return entry[1]
 
-    # Add padding between table and bar
-    plt.subplots_adjust(hspace=0.6)
+def make_water_loss_viz(initial_weight_kg: float,
+                        predicted_loss_kg: float,
+                        age: int,
+                        gender: str,
+                        image_path: str = "assets/body_water_ref.png",
+                        save_path: str = "assets/hydration_viz.png",
+                        return_base64: bool = False) -> dict:
+    """
+    Generate a hydration visualization showing body composition and water loss percentage.
+    Displays a body image at the top and a summary table + hydration bar below it.
+    The PNG is returned in memory as "png_bytes"; it is also written to
+    save_path unless save_path is None.
+    """
+    with stage("viz"):
+        png_bytes, metrics = get_viz_renderer(image_path).render(initial_weight_kg, predicted_loss_kg, age, gender)
 
-    # --- Step 5: Save visualization ---
-    plt.tight_layout()
-    fig.savefig(save_path, bbox_inches="tight", dpi=150)
-    plt.close(fig)
+    if save_path is not None:
+        with open(save_path, "wb") as f:
+            f.write(png_bytes)
 
-    return {
+    result = {
         "viz_path": save_path,
-        "percent_loss": percent_loss,
-        "avg_water_pct": avg_water_pct,
-        "remaining_water_pct": remaining_water,
-        "warning_>2pct": warning,
+        "png_bytes": png_bytes,
+        "percent_loss": metrics["percent_loss"],
+        "avg_water_pct": metrics["avg_water_pct"],
+        "remaining_water_pct": metrics["remaining_water_pct"],
+        "warning_>2pct": metrics["warning_>2pct"],
     }
+    if return_base64:
+        result["base64"] = base64.b64encode(png_bytes).decode("ascii")
+    return result